@@ -0,0 +1,99 @@
+"""Who is asking: a cached user snapshot and role checks for views.
+
+Django's AuthenticationMiddleware loads the whole User row from the database
+on every request. SnapshotAuthenticationMiddleware keeps a small snapshot
+per user in the default cache instead. It holds the fields views and
+templates read on every request, plus the session auth hash so a password
+change still logs other sessions out. request.user is rebuilt from it as a
+User with every other field deferred; reading one of those fields loads it
+on first use. core.signals drops the snapshot whenever the user is saved or
+deleted, and the next request rebuilds it through django.contrib.auth.
+
+role_required() replaces the role check each view used to start with.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import User
+
+# In User's field order, which Model.from_db() expects.
+SNAPSHOT_FIELDS = ('id', 'is_superuser', 'username', 'is_staff', 'is_active', 'role', 'latitude', 'longitude')
+SNAPSHOT_TTL = 60 * 60
+
+
+def snapshot_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(snapshot_key(user_id))
+
+
+def _from_snapshot(snapshot):
+    user = User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, snapshot['values'])
+    user.backend = snapshot['backend']
+    return user
+
+
+def _load_user(request):
+    try:
+        user_id = User._meta.pk.to_python(request.session[auth.SESSION_KEY])
+        backend = request.session[auth.BACKEND_SESSION_KEY]
+    except (KeyError, ValueError):
+        return AnonymousUser()
+
+    key = snapshot_key(user_id)
+    snapshot = cache.get(key)
+    if snapshot is not None and snapshot['backend'] == backend:
+        if constant_time_compare(request.session.get(auth.HASH_SESSION_KEY, ''), snapshot['session_hash']):
+            return _from_snapshot(snapshot)
+
+    # Miss or stale hash: let Django verify the session the long way.
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, {
+            'values':       tuple(getattr(user, field) for field in SNAPSHOT_FIELDS),
+            'backend':      backend,
+            'session_hash': user.get_session_auth_hash(),
+        }, getattr(settings, 'AUTH_SNAPSHOT_TTL', SNAPSHOT_TTL))
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = _load_user(request)
+    return request._cached_user
+
+
+async def aget_user(request):
+    return await sync_to_async(get_user)(request)
+
+
+class SnapshotAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)  # keeps the session-middleware check
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = lambda: aget_user(request)
+
+
+def role_required(*roles, message='Access denied.'):
+    """login_required, then 403 unless request.user.role is one of roles."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.role not in roles:
+                return HttpResponseForbidden(message)
+            return view(request, *args, **kwargs)
+        return login_required(wrapper)
+    return decorator
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, WasteCategory, PickupRequest, Transaction, RecyclingImpact
+from .models import User, WasteCategory, WasteCategoryRate, PickupRequest, Transaction, PaymentEvent, RecyclingImpact
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -9,15 +9,29 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('username', 'email', 'phone')
     
     fieldsets = UserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('role', 'phone', 'address')}),
+        ('Additional Info', {'fields': ('role', 'phone', 'address', 'latitude', 'longitude')}),
     )
 
+class WasteCategoryRateInline(admin.TabularInline):
+    model = WasteCategoryRate
+    fields = ('version', 'rate_per_kg', 'effective_from')
+    readonly_fields = fields
+    extra = 0
+
+    # Rate history is written by core.signals whenever rate_per_kg changes.
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(WasteCategory)
 class WasteCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'rate_per_kg', 'is_active', 'created_at')
     list_filter = ('is_active', 'created_at')
     search_fields = ('name',)
     list_editable = ('rate_per_kg', 'is_active')
+    inlines = [WasteCategoryRateInline]
 
 @admin.register(PickupRequest)
 class PickupRequestAdmin(admin.ModelAdmin):
@@ -25,16 +39,36 @@ class PickupRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'pickup_date', 'waste_category', 'created_at')
     search_fields = ('customer__username', 'address', 'collector__username')
     date_hierarchy = 'pickup_date'
-    readonly_fields = ('estimated_price', 'actual_price', 'created_at')
+    readonly_fields = ('rate_per_kg', 'price', 'estimated_price', 'actual_price', 'created_at')
+    list_select_related = ('customer', 'waste_category')
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ('pickup_request', 'amount', 'payment_method', 'is_paid', 'transaction_date')
-    list_filter = ('is_paid', 'payment_method', 'transaction_date')
-    search_fields = ('pickup_request__customer__username',)
+    list_display = ('pickup_request', 'amount', 'payment_method', 'payment_status', 'is_paid', 'transaction_date')
+    list_filter = ('is_paid', 'payment_status', 'payment_method', 'payment_gateway', 'transaction_date')
+    search_fields = ('pickup_request__customer__username', 'gateway_transaction_id')
+    list_select_related = ('pickup_request__customer', 'pickup_request__waste_category')
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('received_at', 'gateway', 'gateway_transaction_id', 'event', 'outcome', 'transaction')
+    list_filter = ('gateway', 'event', 'outcome', 'received_at')
+    search_fields = ('gateway_transaction_id',)
+    list_select_related = ('transaction__pickup_request__customer', 'transaction__pickup_request__waste_category')
+
+    # The log is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(RecyclingImpact)
 class RecyclingImpactAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_weight_recycled', 'trees_saved', 'co2_reduced', 'water_saved', 'last_updated')
     search_fields = ('user__username',)
     readonly_fields = ('last_updated',)
+    list_select_related = ('user',)
@@ -0,0 +1,390 @@
+"""Admin trend reports from a columnar snapshot instead of the live tables.
+
+build_snapshot() reads every pickup and its transaction in one pass. It
+writes each column as its own .npy file in a new directory under
+ANALYTICS_SNAPSHOT_DIR:
+- dates become day numbers;
+- weights and money become float64, with NaN for missing values;
+- status, category and collector are dictionary-encoded as small integer
+  codes, and the value lists go in meta.json.
+The CURRENT file is then switched to the new directory in one rename.
+Requests memory-map the current snapshot read-only. The operating system's
+page cache shares it between workers, and a report never touches the
+database.
+
+The reports are NumPy group-bys: a combined integer key per row, then
+bincount() over it. The orm_* functions compute the same reports with the
+ORM. Tests check the two against each other, and bench_analytics times
+them at scale.
+
+Run `manage.py build_analytics_snapshot` from cron; reports are as fresh as
+the last run.
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import PickupRequest, User, WasteCategory
+
+DEFAULT_WEEKS = 12
+MAX_WEEKS = 104
+DEFAULT_KEPT = 2
+CHUNK_SIZE = 50_000
+EPOCH = date(1970, 1, 1).toordinal()
+NO_DAY = -1
+NO_COLLECTOR = -1
+
+COLUMNS = {
+    'created_day':   np.int32,    # days since 1970-01-01, local time
+    'completed_day': np.int32,    # NO_DAY when not completed
+    'status':        np.uint8,    # code into meta['status']
+    'category':      np.uint16,   # code into meta['category']
+    'collector':     np.int32,    # code into meta['collector'], NO_COLLECTOR when unassigned
+    'actual_kg':     np.float64,
+    'price':         np.float64,
+    'paid_amount':   np.float64,  # NaN without a transaction or while unpaid
+}
+STATUSES = [status for status, _ in PickupRequest.STATUS_CHOICES]
+
+
+def _snapshot_root():
+    return Path(getattr(settings, 'ANALYTICS_SNAPSHOT_DIR', settings.BASE_DIR / 'analytics'))
+
+
+def _day(value):
+    return NO_DAY if value is None else value.toordinal() - EPOCH
+
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+
+def _week(day):
+    """Monday-based week number of a day number (1970-01-01 was a Thursday)."""
+    return (day + 3) // 7
+
+
+def _week_start(week):
+    return date.fromordinal(EPOCH + week * 7 - 3)
+
+
+# ────────────────────────────────────────────────────────────
+# SNAPSHOTS
+# ────────────────────────────────────────────────────────────
+def build_snapshot(chunk_size=CHUNK_SIZE):
+    """Export pickups and transactions to a new snapshot, make it current and return it."""
+    categories = dict(WasteCategory.objects.order_by('id').values_list('id', 'name'))
+    collectors = dict(User.objects.filter(role='collector').order_by('id').values_list('id', 'username'))
+    category_codes = {pk: code for code, pk in enumerate(categories)}
+    collector_codes = {pk: code for code, pk in enumerate(collectors)}
+    status_codes = {status: code for code, status in enumerate(STATUSES)}
+
+    rows = (
+        PickupRequest.objects.order_by()
+        .annotate(created_day=TruncDate('created_at'), completed_day=TruncDate('completed_at'))
+        .values_list(
+            'created_day', 'completed_day', 'status', 'waste_category_id', 'collector_id',
+            'actual_weight_kg', 'price', 'transaction__amount', 'transaction__is_paid',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    parts = {name: [] for name in COLUMNS}
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            _encode(chunk, parts, status_codes, category_codes, collector_codes)
+            chunk = []
+    _encode(chunk, parts, status_codes, category_codes, collector_codes)
+
+    created = timezone.now()
+    root = _snapshot_root()
+    path = root / f"snapshot-{created.strftime('%Y%m%dT%H%M%S%f')}"
+    path.mkdir(parents=True)
+    for name, dtype in COLUMNS.items():
+        np.save(path / f'{name}.npy', np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype))
+    meta = {
+        'created':   created.isoformat(),
+        'as_of':     _day(timezone.localdate(created)),
+        'rows':      sum(len(part) for part in parts['status']),
+        'status':    STATUSES,
+        'category':  list(categories.values()),
+        'collector': list(collectors.values()),
+    }
+    (path / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+
+    pointer = root / f'{path.name}.pointer'
+    pointer.write_text(path.name, encoding='utf-8')
+    os.replace(pointer, root / 'CURRENT')
+    _prune(root, path.name)
+    return Snapshot(path)
+
+
+def _encode(chunk, parts, status_codes, category_codes, collector_codes):
+    if not chunk:
+        return
+    created, completed, status, category, collector, actual, price, amount, paid = zip(*chunk)
+    n = len(chunk)
+    parts['created_day'].append(np.fromiter(map(_day, created), np.int32, n))
+    parts['completed_day'].append(np.fromiter(map(_day, completed), np.int32, n))
+    parts['status'].append(np.fromiter(map(status_codes.__getitem__, status), np.uint8, n))
+    parts['category'].append(np.fromiter(map(category_codes.__getitem__, category), np.uint16, n))
+    parts['collector'].append(np.fromiter(
+        (NO_COLLECTOR if pk is None else collector_codes.get(pk, NO_COLLECTOR) for pk in collector),
+        np.int32, n,
+    ))
+    parts['actual_kg'].append(np.fromiter(map(_number, actual), np.float64, n))
+    parts['price'].append(np.fromiter(map(_number, price), np.float64, n))
+    parts['paid_amount'].append(np.fromiter(
+        (_number(value) if is_paid else np.nan for value, is_paid in zip(amount, paid)), np.float64, n,
+    ))
+
+
+def _prune(root, current):
+    kept = getattr(settings, 'ANALYTICS_SNAPSHOTS_KEPT', DEFAULT_KEPT)
+    snapshots = sorted((p for p in root.glob('snapshot-*') if p.is_dir()), reverse=True)
+    for path in snapshots[max(kept, 1):]:
+        if path.name != current:
+            # Readers that still have the old files mapped keep them until they let go.
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class Snapshot:
+    """One snapshot directory, every column memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text(encoding='utf-8'))
+        self.columns = {
+            name: np.load(self.path / f'{name}.npy', mmap_mode='r') for name in COLUMNS
+        }
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return self.meta['rows']
+
+    @property
+    def as_of(self):
+        return self.meta['as_of']
+
+    def code(self, column, value):
+        return self.meta[column].index(value)
+
+    def describe(self):
+        return {'created': self.meta['created'], 'rows': self.meta['rows']}
+
+
+_current = None
+_lock = threading.Lock()
+
+
+def current_snapshot():
+    """The snapshot CURRENT points at, loaded once per process; None before the first build."""
+    global _current
+    try:
+        name = (_snapshot_root() / 'CURRENT').read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return None
+    path = _snapshot_root() / name
+    snapshot = _current
+    if snapshot is not None and snapshot.path == path:
+        return snapshot
+    with _lock:
+        if _current is None or _current.path != path:
+            _current = Snapshot(path)
+        return _current
+
+
+# ────────────────────────────────────────────────────────────
+# REPORTS (NumPy)
+# ────────────────────────────────────────────────────────────
+def _window(snapshot, weeks):
+    last = _week(snapshot.as_of)
+    return last - weeks + 1, last
+
+
+def weekly_category_weight(snapshot, weeks=DEFAULT_WEEKS):
+    """Recycled kg per category per week of completion, for the last `weeks` weeks."""
+    first, last = _window(snapshot, weeks)
+    week = _week(snapshot['completed_day'].astype(np.int64))
+    mask = (
+        (snapshot['status'] == snapshot.code('status', 'completed'))
+        & (snapshot['completed_day'] != NO_DAY) & (week >= first) & (week <= last)
+    )
+    names = snapshot.meta['category']
+    key = (week[mask] - first) * len(names) + snapshot['category'][mask]
+    size = weeks * len(names)
+    counts = np.bincount(key, minlength=size).reshape(weeks, len(names))
+    weight = np.bincount(key, weights=np.nan_to_num(snapshot['actual_kg'][mask]), minlength=size)
+    weight = weight.reshape(weeks, len(names))
+    return {
+        'weeks':      [_week_start(w).isoformat() for w in range(first, last + 1)],
+        'categories': {
+            name: [round(float(kg), 2) for kg in weight[:, code]]
+            for code, name in enumerate(names) if counts[:, code].any()
+        },
+    }
+
+
+def collector_productivity(snapshot, weeks=DEFAULT_WEEKS):
+    """Per collector, over pickups created in the window: assigned, completed, kg and earnings."""
+    first, last = _window(snapshot, weeks)
+    week = _week(snapshot['created_day'].astype(np.int64))
+    collector = snapshot['collector']
+    mask = (collector != NO_COLLECTOR) & (week >= first) & (week <= last)
+    done = mask & (snapshot['status'] == snapshot.code('status', 'completed'))
+    size = len(snapshot.meta['collector'])
+    assigned = np.bincount(collector[mask], minlength=size)
+    completed = np.bincount(collector[done], minlength=size)
+    weight = np.bincount(collector[done], weights=np.nan_to_num(snapshot['actual_kg'][done]), minlength=size)
+    value = np.bincount(collector[done], weights=np.nan_to_num(snapshot['price'][done]), minlength=size)
+    rows = [
+        {
+            'collector':       name,
+            'assigned':        int(assigned[code]),
+            'completed':       int(completed[code]),
+            'completion_rate': round(float(completed[code] / assigned[code]), 4),
+            'weight_kg':       round(float(weight[code]), 2),
+            'value':           round(float(value[code]), 2),
+        }
+        for code, name in enumerate(snapshot.meta['collector']) if assigned[code]
+    ]
+    rows.sort(key=lambda row: (-row['completed'], row['collector']))
+    return {'collectors': rows}
+
+
+def cancellation_rates(snapshot, weeks=DEFAULT_WEEKS):
+    """Share of pickups created each week, and in each category, that were cancelled."""
+    first, last = _window(snapshot, weeks)
+    week = _week(snapshot['created_day'].astype(np.int64))
+    mask = (week >= first) & (week <= last)
+    cancelled = mask & (snapshot['status'] == snapshot.code('status', 'cancelled'))
+    names = snapshot.meta['category']
+
+    def rates(keys, size, labels):
+        total = np.bincount(keys[mask], minlength=size)
+        lost = np.bincount(keys[cancelled], minlength=size)
+        return [
+            {'key': label, 'total': int(total[i]), 'cancelled': int(lost[i]),
+             'rate': round(float(lost[i] / total[i]), 4)}
+            for i, label in enumerate(labels) if total[i]
+        ]
+
+    return {
+        'weeks':      rates(week - first, weeks,
+                            [_week_start(w).isoformat() for w in range(first, last + 1)]),
+        'categories': rates(snapshot['category'].astype(np.int64), len(names), names),
+    }
+
+
+REPORTS = {
+    'weekly_category_weight': weekly_category_weight,
+    'collector_productivity': collector_productivity,
+    'cancellation_rates':     cancellation_rates,
+}
+
+
+# ────────────────────────────────────────────────────────────
+# THE SAME REPORTS WITH THE ORM (tests and bench_analytics)
+# ────────────────────────────────────────────────────────────
+def _orm_window(as_of, weeks):
+    """(start, end, week start dates) of the `weeks` weeks ending with as_of's, in local time."""
+    first = _week_start(_week(_day(as_of)) - weeks + 1)
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(first + timedelta(weeks=weeks), time.min))
+    return start, end, [(first + timedelta(weeks=n)).isoformat() for n in range(weeks)]
+
+
+def orm_weekly_category_weight(as_of, weeks=DEFAULT_WEEKS):
+    start, end, week_list = _orm_window(as_of, weeks)
+    rows = (
+        PickupRequest.objects
+        .filter(status='completed', completed_at__gte=start, completed_at__lt=end)
+        .annotate(week=TruncWeek('completed_at'))
+        .values_list('week', 'waste_category__name')
+        .annotate(weight=Sum('actual_weight_kg'))
+        .order_by()
+    )
+    categories = {}
+    for week, name, weight in rows:
+        series = categories.setdefault(name, [0.0] * weeks)
+        series[week_list.index(timezone.localdate(week).isoformat())] = round(float(weight or 0), 2)
+    return {'weeks': week_list, 'categories': categories}
+
+
+def orm_collector_productivity(as_of, weeks=DEFAULT_WEEKS):
+    start, end, _ = _orm_window(as_of, weeks)
+    completed = Q(status='completed')
+    rows = (
+        PickupRequest.objects
+        .filter(collector__role='collector', created_at__gte=start, created_at__lt=end)
+        .values_list('collector__username')
+        .annotate(
+            assigned=Count('id'),
+            completed=Count('id', filter=completed),
+            weight=Sum('actual_weight_kg', filter=completed),
+            value=Sum('price', filter=completed),
+        )
+        .order_by()
+    )
+    result = [
+        {
+            'collector':       name,
+            'assigned':        assigned,
+            'completed':       done,
+            'completion_rate': round(done / assigned, 4),
+            'weight_kg':       round(float(weight or 0), 2),
+            'value':           round(float(value or 0), 2),
+        }
+        for name, assigned, done, weight, value in rows
+    ]
+    result.sort(key=lambda row: (-row['completed'], row['collector']))
+    return {'collectors': result}
+
+
+def orm_cancellation_rates(as_of, weeks=DEFAULT_WEEKS):
+    start, end, week_list = _orm_window(as_of, weeks)
+    window = PickupRequest.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+    counts = {'total': Count('id'), 'cancelled': Count('id', filter=Q(status='cancelled'))}
+
+    def rates(rows):
+        return [
+            {'key': key, 'total': total, 'cancelled': lost, 'rate': round(lost / total, 4)}
+            for key, total, lost in rows
+        ]
+
+    by_week = {
+        timezone.localdate(week).isoformat(): (total, lost)
+        for week, total, lost in window.annotate(week=TruncWeek('created_at'))
+        .values_list('week').annotate(**counts)
+    }
+    by_category = {
+        name: (total, lost)
+        for name, total, lost in window.values_list('waste_category__name').annotate(**counts)
+    }
+    return {
+        'weeks':      rates((week, *by_week[week]) for week in week_list if week in by_week),
+        'categories': rates(
+            (name, *by_category[name])
+            for name in WasteCategory.objects.order_by('id').values_list('name', flat=True)
+            if name in by_category
+        ),
+    }
+
+
+ORM_REPORTS = {
+    'weekly_category_weight': orm_weekly_category_weight,
+    'collector_productivity': orm_collector_productivity,
+    'cancellation_rates':     orm_cancellation_rates,
+}
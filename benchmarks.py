@@ -0,0 +1,194 @@
+"""View benchmarks at increasing data sizes, written as JSON for comparison.
+
+run_benchmarks() tops the database up with core.synthetic data to each
+scale, then drives every read-only view through Django's test client as a
+user of the right role. Per view it records latency percentiles and the
+queries one request runs. compare() diffs two result files so a slower or
+chattier view shows up between commits.
+
+Views that change data (claim, cancel, complete, payment callbacks, ingest)
+are left out; so are the exports, which stream whole tables and have their
+own rows/second figures.
+"""
+import math
+import platform
+import subprocess
+import time
+from pathlib import Path
+from statistics import mean
+
+import django
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .metrics import RequestStats
+from .models import PickupRequest, User
+from .synthetic import generate
+
+DEFAULT_SCALES = (1_000, 100_000, 1_000_000)
+DEFAULT_REQUESTS = 30
+DEFAULT_WARMUP = 3
+
+# (url name, role of the requesting user or None for anonymous, query string)
+BENCH_VIEWS = [
+    ('home', None, ''),
+    ('login', None, ''),
+    ('register', None, ''),
+    ('waste_categories_api', None, ''),
+    ('dashboard', 'customer', ''),
+    ('customer_dashboard', 'customer', ''),
+    ('request_pickup', 'customer', ''),
+    ('pickup_history', 'customer', ''),
+    ('pickup_history_api', 'customer', ''),
+    ('customer_stats_api', 'customer', ''),
+    ('collector_dashboard', 'collector', ''),
+    ('collector_pickups_api', 'collector', ''),
+    ('nearby_pickups_api', 'collector', ''),
+    ('collector_stats_api', 'collector', ''),
+    ('admin_dashboard', 'admin', ''),
+    ('admin_stats_api', 'admin', ''),
+]
+
+# Users per pickup at each scale: about 20 pickups per customer and 500 per collector.
+PICKUPS_PER_CUSTOMER = 20
+PICKUPS_PER_COLLECTOR = 500
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def populate(scale, seed=0):
+    """Add synthetic data until there are scale pickups; return how many were added."""
+    missing = scale - PickupRequest.objects.count()
+    if missing <= 0:
+        return 0
+    synthetic = User.objects.filter(username__startswith='syn-')
+    wanted = {
+        'customer': max(20, scale // PICKUPS_PER_CUSTOMER),
+        'collector': max(5, scale // PICKUPS_PER_COLLECTOR),
+        'admin': 2,
+    }
+    have = {role: synthetic.filter(role=role).count() for role in wanted}
+    generate(
+        customers=max(0, wanted['customer'] - have['customer']),
+        collectors=max(0, wanted['collector'] - have['collector']),
+        admins=max(0, wanted['admin'] - have['admin']),
+        pickups=missing,
+        seed=seed + scale,
+    )
+    return missing
+
+
+def _clients():
+    clients = {None: Client()}
+    for role in ('customer', 'collector', 'admin'):
+        client = Client()
+        client.force_login(User.objects.get(username=f'syn-{role}-0'))
+        clients[role] = client
+    return clients
+
+
+def bench_view(client, url, requests=DEFAULT_REQUESTS, warmup=DEFAULT_WARMUP):
+    try:
+        for _ in range(warmup or 1):
+            client.get(url)
+    except Exception as exc:
+        # A broken view is a result too; keep benchmarking the rest.
+        return {'status': 500, 'error': f'{type(exc).__name__}: {exc}'}
+    latencies, db_times, queries = [], [], []
+    for _ in range(requests):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        db_times.append(stats.db_seconds * 1000)
+        queries.append(stats.queries)
+    return {
+        'status':    response.status_code,
+        'p50_ms':    round(percentile(latencies, 50), 3),
+        'p95_ms':    round(percentile(latencies, 95), 3),
+        'mean_ms':   round(mean(latencies), 3),
+        'max_ms':    round(max(latencies), 3),
+        'db_p50_ms': round(percentile(db_times, 50), 3),
+        'queries':   max(queries),
+    }
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, requests=DEFAULT_REQUESTS, warmup=DEFAULT_WARMUP,
+                   seed=0, views=None, progress=None):
+    """Benchmark each view at each scale (total pickups); return the results document."""
+    wanted = set(views or ())
+    results = {}
+    for scale in sorted(scales):
+        started = time.perf_counter()
+        added = populate(scale, seed)
+        if progress:
+            progress(f'{scale} pickups: generated {added} in {time.perf_counter() - started:.1f}s')
+        clients = _clients()
+        timings = {}
+        for name, role, query in BENCH_VIEWS:
+            if wanted and name not in wanted:
+                continue
+            url = reverse(name) + (f'?{query}' if query else '')
+            timings[name] = bench_view(clients[role], url, requests, warmup)
+            if progress:
+                row = timings[name]
+                if 'error' in row:
+                    progress(f"  {name:<24} failed: {row['error']}")
+                else:
+                    progress(f"  {name:<24} p50 {row['p50_ms']:>9.2f} ms  p95 {row['p95_ms']:>9.2f} ms  "
+                             f"{row['queries']:>3} queries")
+        results[str(scale)] = timings
+    return {
+        'meta': {
+            'commit':   _git_commit(),
+            'created':  timezone.now().isoformat(),
+            'python':   platform.python_version(),
+            'django':   django.get_version(),
+            'database': connection.vendor,
+            'requests': requests,
+            'warmup':   warmup,
+            'seed':     seed,
+        },
+        'scales': results,
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """[(scale, view, metric, before, after)] where current is worse than baseline.
+
+    Latency counts as worse beyond tolerance (0.2 = 20% slower p50/p95);
+    any extra query is worse.
+    """
+    regressions = []
+    for scale, views in current['scales'].items():
+        for view, now in views.items():
+            before = baseline.get('scales', {}).get(scale, {}).get(view)
+            if before is None or 'error' in before:
+                continue
+            if 'error' in now:
+                regressions.append((scale, view, 'status', before['status'], now['status']))
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                if now[metric] > before[metric] * (1 + tolerance):
+                    regressions.append((scale, view, metric, before[metric], now[metric]))
+            if now['queries'] > before['queries']:
+                regressions.append((scale, view, 'queries', before['queries'], now['queries']))
+    return regressions
@@ -0,0 +1,78 @@
+"""Process-local cache of the serialized active waste category list.
+
+Each process keeps one pre-serialized copy tagged with the shared
+'rate_table' version. Saving or deleting a WasteCategory bumps that version,
+so every process rebuilds its copy on its next request. The Last-Modified
+time of each version is stored next to it in the shared cache by whichever
+process builds it first, so every worker sends the same one.
+"""
+import json
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import WasteCategory
+from .versions import bump_version, get_version
+
+Catalog = namedtuple('Catalog', 'version body etag last_modified category_ids rates')
+
+_catalog = None
+_lock = threading.Lock()
+MODIFIED_KEY = 'core:rate_table_modified:'
+
+
+def rate_table_version():
+    return get_version('rate_table')
+
+
+def _last_modified(version, previous):
+    def first_seen():
+        now = timezone.now().replace(microsecond=0)
+        # HTTP dates have one-second resolution; a change must never share its predecessor's.
+        if previous is not None and now <= previous.last_modified:
+            now = previous.last_modified + timedelta(seconds=1)
+        return now
+    return cache.get_or_set(MODIFIED_KEY + str(version), first_seen, None)
+
+
+def category_catalog():
+    global _catalog
+    version = rate_table_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            rows = list(
+                WasteCategory.objects.filter(is_active=True).values(
+                    'id', 'name', 'rate_per_kg', 'description'
+                )
+            )
+            _catalog = Catalog(
+                version=version,
+                body=json.dumps(rows, cls=DjangoJSONEncoder).encode(),
+                etag=f'rates-{version}',
+                last_modified=_last_modified(version, _catalog),
+                category_ids=frozenset(row['id'] for row in rows),
+                rates={row['id']: row['rate_per_kg'] for row in rows},
+            )
+        return _catalog
+
+
+def active_category_ids():
+    return category_catalog().category_ids
+
+
+def active_category_rates():
+    return category_catalog().rates
+
+
+def invalidate_catalog():
+    global _catalog
+    _catalog = None
+    bump_version('rate_table')
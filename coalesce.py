@@ -0,0 +1,115 @@
+"""Write-behind batching for frequent, non-critical counter updates.
+
+Each pickup completion used to run its own UPDATE of the customer's
+RecyclingImpact row, touching last_updated, in its own transaction. On
+SQLite every one of those is a separate commit on the single writer lock.
+With IMPACT_WRITE_COALESCING on, committed deltas are summed per customer in
+memory instead. A background thread writes them every IMPACT_FLUSH_INTERVAL
+seconds, one UPDATE per customer, all in one transaction.
+
+The cost is lag and durability. Impact figures trail the pickup by up to
+one interval; the flush bumps each customer's version so ETag'd stats pick
+the new figures up on the next poll. A worker killed mid-interval loses its
+pending deltas. The impact ledger is
+derived data: `manage.py rebuild_impact` recomputes it from pickups, and a
+clean exit flushes first.
+"""
+import atexit
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import RecyclingImpact
+from .versions import bump_version, user_scope
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 1000
+
+
+class WriteCoalescer:
+    """Sums values per key and hands them to flush_batch({key: total}) in one call."""
+
+    def __init__(self, flush_batch, interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        self.flush_batch = flush_batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, value):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + value
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write everything pending now; return how many keys were written."""
+        with self._flushing:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self.flush_batch(batch)
+            except Exception:
+                # Keep the batch for the next attempt rather than dropping it.
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + value
+                raise
+            return len(batch)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Coalesced write failed; will retry')
+
+
+def flush_impact_deltas(batch):
+    with transaction.atomic():
+        for user_id, delta in batch.items():
+            if not RecyclingImpact.apply_delta(user_id, delta):
+                RecyclingImpact.objects.get_or_create(user_id=user_id)[0].update_impact()
+    # The pickups' own commits already bumped these, before the impact changed.
+    bump_version(*(user_scope(user_id) for user_id in batch))
+
+
+impact_writes = WriteCoalescer(
+    flush_impact_deltas,
+    interval=getattr(settings, 'IMPACT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+)
+atexit.register(impact_writes.flush)
+
+
+def record_impact_delta(user_id, delta):
+    """Shift a customer's impact by delta kg, now or (when coalescing) after commit.
+
+    Returns the rows updated like RecyclingImpact.apply_delta(): 0 means the
+    customer has no impact row yet and the caller should create it. Queued
+    deltas report 1; the flush creates any missing row itself.
+    """
+    if not getattr(settings, 'IMPACT_WRITE_COALESCING', False):
+        return RecyclingImpact.apply_delta(user_id, delta)
+    if delta:
+        delta = Decimal(delta)
+        transaction.on_commit(lambda: impact_writes.add(user_id, delta))
+    return 1
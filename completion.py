@@ -0,0 +1,131 @@
+"""Completing pickups: status, weight, payout transaction and impact together.
+
+complete_pickup() handles one pickup. It does one UPDATE of the pickup and
+lets core.signals move the impact ledger and rollups by delta, then makes
+one write to its Transaction. complete_pickups() closes out many pickups
+with a single bulk_update(). That skips signals, so it does the ledger,
+rollup, version and event bookkeeping itself, the way claim() does.
+Both run inside transaction.atomic(), and every notification waits for
+on_commit.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .coalesce import record_impact_delta
+from .events import publish_pickup_event
+from .models import DailyPickupRollup, PickupRequest, RecyclingImpact, Transaction
+from .versions import PICKUPS_SCOPE, bump_version, user_scope
+
+COMPLETABLE_STATUSES = ('assigned', 'in_progress')
+COMPLETION_FIELDS = ['status', 'actual_weight_kg', 'completed_at', 'rate_per_kg', 'price']
+
+
+class CompletionError(ValueError):
+    pass
+
+
+def _settle_transactions(pickups):
+    """One write per pickup's payout Transaction: update it, or create it if missing."""
+    existing = {
+        txn.pickup_request_id: txn
+        for txn in Transaction.objects.filter(pickup_request__in=pickups)
+    }
+    changed, created = [], []
+    for pickup in pickups:
+        txn = existing.get(pickup.pk)
+        if txn is None:
+            created.append(Transaction(pickup_request=pickup, amount=pickup.actual_price(), is_paid=True))
+        else:
+            txn.amount, txn.is_paid = pickup.actual_price(), True
+            changed.append(txn)
+    Transaction.objects.bulk_update(changed, ['amount', 'is_paid'])
+    Transaction.objects.bulk_create(created)
+
+
+def complete_pickup(pickup, actual_weight_kg=None):
+    """Mark one pickup completed (using its current actual_weight_kg unless given)."""
+    if actual_weight_kg is not None:
+        pickup.actual_weight_kg = actual_weight_kg
+    if not pickup.actual_weight_kg or pickup.actual_weight_kg <= 0:
+        raise CompletionError('A completed pickup needs its actual weight.')
+    with transaction.atomic():
+        pickup.status = 'completed'
+        pickup.completed_at = timezone.now()
+        pickup.save()
+        _settle_transactions([pickup])
+    return pickup
+
+
+def complete_pickups(collector, weights):
+    """Complete many of collector's pickups at once.
+
+    weights maps pickup id to actual weight in kg (Decimal). Returns (completed ids,
+    {pickup id: error message}) for the ones that could not be completed.
+    """
+    errors = {}
+    for pickup_id, weight in weights.items():
+        if weight is None or not weight.is_finite() or weight <= 0:
+            errors[pickup_id] = 'Weight must be greater than zero.'
+    wanted = [pickup_id for pickup_id in weights if pickup_id not in errors]
+
+    with transaction.atomic():
+        pickups = list(
+            PickupRequest.objects.select_for_update(of=('self',))
+            .select_related('waste_category')
+            .filter(id__in=wanted, collector=collector, status__in=COMPLETABLE_STATUSES)
+        )
+        found = {pickup.pk for pickup in pickups}
+        for pickup_id in wanted:
+            if pickup_id not in found:
+                errors[pickup_id] = 'Not one of your open pickups.'
+        if not pickups:
+            return [], errors
+
+        now = timezone.now()
+        before = {
+            pickup.pk: (pickup.status, pickup.actual_weight_kg or Decimal('0.00'),
+                        pickup.price or Decimal('0.00'), pickup.impact_weight())
+            for pickup in pickups
+        }
+        for pickup in pickups:
+            pickup.status = 'completed'
+            pickup.actual_weight_kg = weights[pickup.pk]
+            pickup.completed_at = now
+            pickup.set_price()
+        PickupRequest.objects.bulk_update(pickups, COMPLETION_FIELDS)
+
+        # What the post_save handlers would have done, one statement per row touched.
+        impact = defaultdict(Decimal)
+        rollups = defaultdict(lambda: [0, Decimal('0.00'), Decimal('0.00')])
+        for pickup in pickups:
+            old_status, old_weight, old_value, old_impact = before[pickup.pk]
+            impact[pickup.customer_id] += pickup.impact_weight() - old_impact
+            day = timezone.localdate(pickup.created_at)
+            for status, count, weight, value in ((old_status, -1, -old_weight, -old_value),
+                                                 ('completed', 1, pickup.actual_weight_kg, pickup.price)):
+                bucket = rollups[(day, status, pickup.waste_category_id)]
+                bucket[0] += count
+                bucket[1] += weight
+                bucket[2] += value
+        for (day, status, category_id), (count, weight, value) in rollups.items():
+            key = {'date': day, 'status': status, 'waste_category_id': category_id}
+            DailyPickupRollup.bump(key, create=count > 0, pickup_count=count, weight_kg=weight, value=value)
+        for customer_id, delta in impact.items():
+            if not record_impact_delta(customer_id, delta):
+                RecyclingImpact.objects.get_or_create(user_id=customer_id)[0].update_impact()
+
+        _settle_transactions(pickups)
+
+        scopes = {user_scope(collector.pk), PICKUPS_SCOPE} | {user_scope(p.customer_id) for p in pickups}
+        changes = [(p.pk, p.customer_id, before[p.pk][0]) for p in pickups]
+        transaction.on_commit(lambda: bump_version(*scopes))
+        transaction.on_commit(lambda: _publish_completed(collector.pk, changes))
+    return sorted(found), errors
+
+
+def _publish_completed(collector_id, changes):
+    for pickup_id, customer_id, previous in changes:
+        publish_pickup_event('status_changed', pickup_id, customer_id, collector_id, 'completed', previous)
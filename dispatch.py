@@ -0,0 +1,140 @@
+"""Batch assignment of open pickups to collectors.
+
+One pass loads every open pickup with coordinates and every active collector
+with a location and spare capacity, scores all pairs with a NumPy distance
+matrix and assigns greedily, shortest pair first. The assignments are then
+applied in one transaction through PickupRequest.objects.claim_many(), one
+conditional UPDATE per collector that skips anything grabbed by hand meanwhile.
+"""
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import PickupRequest, User
+from .routes import distance_matrix
+
+DEFAULT_CAPACITY = 20
+DEFAULT_MAX_KM = 15
+OPEN_STATUSES = ('assigned', 'in_progress')
+
+
+class DispatchReport:
+    def __init__(self):
+        self.pickups = 0
+        self.collectors = 0
+        self.planned = []  # (pickup_id, collector_id, distance_km)
+        self.assigned = 0
+        self.conflicts = 0
+        self.skipped = Counter()
+        self.solve_seconds = 0.0
+        self.apply_seconds = 0.0
+
+    def as_dict(self):
+        distances = [distance for _, _, distance in self.planned]
+        seconds = self.solve_seconds + self.apply_seconds
+        return {
+            'pickups':            self.pickups,
+            'collectors':         self.collectors,
+            'planned':            len(self.planned),
+            'assigned':           self.assigned,
+            'conflicts':          self.conflicts,
+            'skipped':            dict(self.skipped),
+            'mean_km':            round(float(np.mean(distances)), 2) if distances else 0.0,
+            'max_km':             round(max(distances), 2) if distances else 0.0,
+            'total_km':           round(sum(distances), 2),
+            'solve_seconds':      round(self.solve_seconds, 3),
+            'apply_seconds':      round(self.apply_seconds, 3),
+            'pickups_per_second': round(self.pickups / seconds, 1) if seconds else 0.0,
+        }
+
+
+def _collector_capacity(capacity):
+    """(id, lat, lng, free slots) for active collectors with a location and room."""
+    collectors = (
+        User.objects.filter(role='collector', is_active=True,
+                            latitude__isnull=False, longitude__isnull=False)
+        .annotate(load=Count('assigned_pickups', filter=Q(assigned_pickups__status__in=OPEN_STATUSES)))
+        .values_list('id', 'latitude', 'longitude', 'load')
+    )
+    return [(cid, lat, lng, capacity - load) for cid, lat, lng, load in collectors if load < capacity]
+
+
+def plan_assignments(pickups, collectors, max_km):
+    """Greedy shortest-first matching.
+
+    pickups are (id, lat, lng); collectors are (id, lat, lng, free slots).
+    Returns [(pickup_id, collector_id, distance_km)] and the pickup ids left
+    over because no collector in range had room.
+    """
+    if not pickups or not collectors:
+        return [], [p[0] for p in pickups]
+
+    _, p_lats, p_lngs = zip(*pickups)
+    _, c_lats, c_lngs, free = zip(*collectors)
+    dist = distance_matrix(p_lats, p_lngs, c_lats, c_lngs)
+
+    # Only pairs within range are candidates, visited shortest first.
+    rows, cols = np.nonzero(dist <= max_km)
+    by_length = np.argsort(dist[rows, cols], kind='stable')
+    free = list(free)
+    remaining = sum(free)
+    taken = [False] * len(pickups)
+    plan = []
+    for p, c in zip(rows[by_length].tolist(), cols[by_length].tolist()):
+        if taken[p] or not free[c]:
+            continue
+        taken[p] = True
+        free[c] -= 1
+        remaining -= 1
+        plan.append((pickups[p][0], collectors[c][0], float(dist[p, c])))
+        if not remaining:
+            break
+    leftover = [pickup[0] for pickup, done in zip(pickups, taken) if not done]
+    return plan, leftover
+
+
+def dispatch(dry_run=False, capacity=None, max_km=None, pickup_date=None):
+    """Plan, and unless dry_run apply, one round of assignments; return a DispatchReport."""
+    if capacity is None:
+        capacity = getattr(settings, 'DISPATCH_COLLECTOR_CAPACITY', DEFAULT_CAPACITY)
+    if max_km is None:
+        max_km = getattr(settings, 'DISPATCH_MAX_KM', DEFAULT_MAX_KM)
+    report = DispatchReport()
+
+    started = time.perf_counter()
+    open_pickups = PickupRequest.objects.unclaimed()
+    if pickup_date:
+        open_pickups = open_pickups.filter(pickup_date=pickup_date)
+    pickups = list(
+        open_pickups.filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    report.skipped['no_location'] = open_pickups.filter(
+        Q(latitude__isnull=True) | Q(longitude__isnull=True)
+    ).count()
+    collectors = _collector_capacity(capacity)
+    report.pickups, report.collectors = len(pickups), len(collectors)
+
+    report.planned, leftover = plan_assignments(pickups, collectors, max_km)
+    report.skipped['unmatched'] = len(leftover)
+    report.solve_seconds = time.perf_counter() - started
+
+    if dry_run or not report.planned:
+        return report
+
+    started = time.perf_counter()
+    by_collector = defaultdict(list)
+    for pickup_id, collector_id, _ in report.planned:
+        by_collector[collector_id].append(pickup_id)
+    with transaction.atomic():
+        for collector in User.objects.filter(id__in=by_collector):
+            wanted = by_collector[collector.pk]
+            won = PickupRequest.objects.claim_many(wanted, collector)
+            report.assigned += len(won)
+            report.conflicts += len(wanted) - len(won)
+    report.apply_seconds = time.perf_counter() - started
+    return report
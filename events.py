@@ -0,0 +1,109 @@
+"""In-process pub/sub that feeds the server-sent pickup event stream.
+
+Publishers are ordinary (sync) views and signal handlers; subscribers are the
+async SSE responses served through asgi.py. LocalBroker keeps everything in
+this process, which is enough for a single ASGI worker and for tests. A
+multi-worker deployment can point PICKUP_EVENTS_BROKER at a class with the
+same subscribe/unsubscribe/publish interface backed by a shared bus.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+COLLECTORS_CHANNEL = 'collectors'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One listener's queue, bound to the event loop that reads it."""
+
+    def __init__(self, channels, loop, maxsize=100):
+        self.channels = tuple(channels)
+        self.loop = loop
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def _deliver(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A stalled client only loses live hints; its next poll resyncs it.
+            pass
+
+    def put(self, message):
+        """Thread-safe: may be called from any thread."""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._deliver, message)
+
+    async def get(self, timeout=None):
+        """Next message, or None if timeout seconds pass first."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channels, loop=None):
+        subscription = Subscription(channels, loop or asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                listeners = self._subscribers.get(channel)
+                if listeners is not None:
+                    listeners.discard(subscription)
+                    if not listeners:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            listeners = list(self._subscribers.get(channel, ()))
+        for subscription in listeners:
+            subscription.put(message)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'PICKUP_EVENTS_BROKER', 'core.events.LocalBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_pickup_event(event, pickup_id, customer_id, collector_id, status, previous_status=None):
+    """Tell the customer, the collector and (when the open pool changed) all collectors."""
+    message = {
+        'event': event,
+        'pickup_id': pickup_id,
+        'status': status,
+        'previous_status': previous_status,
+    }
+    channels = {user_channel(customer_id)}
+    if collector_id:
+        channels.add(user_channel(collector_id))
+    if 'pending' in (status, previous_status):
+        channels.add(COLLECTORS_CHANNEL)
+
+    broker = get_broker()
+    for channel in channels:
+        broker.publish(channel, message)
@@ -0,0 +1,113 @@
+"""Streaming finance exports of pickups and transactions.
+
+Rows come from a single joined values_list() read through iterator(), so
+neither the view nor the management commands ever hold more than one chunk
+of plain tuples in memory, however many rows match.
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import PickupRequest, Transaction
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (column header, lookup) pairs, in output order.
+PICKUP_COLUMNS = (
+    ('pickup_id',              'id'),
+    ('created_at',             'created_at'),
+    ('pickup_date',            'pickup_date'),
+    ('status',                 'status'),
+    ('customer',               'customer__username'),
+    ('collector',              'collector__username'),
+    ('waste_category',         'waste_category__name'),
+    ('rate_per_kg',            'rate_per_kg'),
+    ('price',                  'price'),
+    ('estimated_weight_kg',    'estimated_weight_kg'),
+    ('actual_weight_kg',       'actual_weight_kg'),
+    ('completed_at',           'completed_at'),
+    ('transaction_id',         'transaction__id'),
+    ('amount',                 'transaction__amount'),
+    ('is_paid',                'transaction__is_paid'),
+    ('payment_status',         'transaction__payment_status'),
+)
+
+TRANSACTION_COLUMNS = (
+    ('transaction_id',         'id'),
+    ('transaction_date',       'transaction_date'),
+    ('pickup_id',              'pickup_request_id'),
+    ('pickup_status',          'pickup_request__status'),
+    ('customer',               'pickup_request__customer__username'),
+    ('collector',              'pickup_request__collector__username'),
+    ('waste_category',         'pickup_request__waste_category__name'),
+    ('actual_weight_kg',       'pickup_request__actual_weight_kg'),
+    ('amount',                 'amount'),
+    ('payment_method',         'payment_method'),
+    ('payment_gateway',        'payment_gateway'),
+    ('gateway_transaction_id', 'gateway_transaction_id'),
+    ('is_paid',                'is_paid'),
+    ('payment_status',         'payment_status'),
+)
+
+# kind -> (model, columns, date field filtered by start/end, path to the pickup)
+EXPORTS = {
+    'pickups':      (PickupRequest, PICKUP_COLUMNS, 'created_at', ''),
+    'transactions': (Transaction, TRANSACTION_COLUMNS, 'transaction_date', 'pickup_request__'),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(kind, start=None, end=None, status=None, collector=None):
+    """values_list() for one export kind; start/end are inclusive dates."""
+    model, columns, date_field, pickup = EXPORTS[kind]
+    queryset = model.objects.all()
+    # Plain datetime ranges rather than __date, so an index on the column applies.
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': _day_start(start)})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lt': _day_start(end + timedelta(days=1))})
+    if status:
+        queryset = queryset.filter(**{f'{pickup}status': status})
+    if collector:
+        queryset = queryset.filter(**{f'{pickup}collector': collector})
+    return queryset.order_by('id').values_list(*(lookup for _, lookup in columns))
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(columns, rows):
+    headers = [header for header, _ in columns]
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+FORMATS = {
+    'csv':    (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
+
+
+def export_lines(kind, fmt, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Yield the formatted text lines of an export."""
+    render, _ = FORMATS[fmt]
+    columns = EXPORTS[kind][1]
+    rows = export_queryset(kind, **filters).iterator(chunk_size=chunk_size)
+    return render(columns, rows)
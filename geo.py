@@ -0,0 +1,176 @@
+"""In-process spatial index over open (pending, unclaimed) pickups.
+
+Points are bucketed into a uniform lat/lng grid; a nearest-N query scans
+rings of cells outward from the query point and stops once no unscanned cell
+can hold anything closer than what it already has. The index is only a
+candidate filter: callers confirm the ids against the database, so entries
+made stale by another worker cost a little recall, never a wrong answer.
+Each process rebuilds its copy every GEO_INDEX_MAX_AGE seconds to pick up
+such changes, and applies its own changes immediately through core.signals.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_CELL_DEGREES = 0.002  # roughly 220 m north-south
+DEFAULT_RADIUS_KM = 10
+# Scan cost grows with (radius / cell)², all under the index lock.
+MAX_RADIUS_KM = 25
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    def __init__(self, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.cell = cell_degrees
+        self._cells = defaultdict(dict)
+        self._points = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _key(self, lat, lng):
+        return math.floor(lat / self.cell), math.floor(lng / self.cell)
+
+    def add(self, item_id, lat, lng):
+        key = self._key(lat, lng)
+        with self._lock:
+            self._discard(item_id)
+            self._cells[key][item_id] = (lat, lng)
+            self._points[item_id] = key
+
+    def discard(self, item_id):
+        with self._lock:
+            self._discard(item_id)
+
+    def _discard(self, item_id):
+        key = self._points.pop(item_id, None)
+        if key is not None:
+            cell = self._cells[key]
+            cell.pop(item_id, None)
+            if not cell:
+                del self._cells[key]
+
+    def nearest(self, lat, lng, limit, radius_km=DEFAULT_RADIUS_KM):
+        """Up to limit (distance_km, item_id) pairs within radius_km, closest first.
+
+        radius_km is capped at MAX_RADIUS_KM.
+        """
+        radius_km = min(radius_km, MAX_RADIUS_KM)
+        ci, cj = self._key(lat, lng)
+        cell_km = self.cell * KM_PER_DEGREE
+        # A degree of longitude shrinks towards the poles.
+        cell_km_lng = cell_km * max(math.cos(math.radians(lat)), 1e-6)
+        reach_i = math.ceil(radius_km / cell_km)
+        reach_j = math.ceil(radius_km / cell_km_lng)
+        nearest_cell_km = min(cell_km, cell_km_lng)
+
+        found = []
+        with self._lock:
+            for ring in range(max(reach_i, reach_j) + 1):
+                for di, dj in _ring(ring):
+                    if abs(di) > reach_i or abs(dj) > reach_j:
+                        continue
+                    cell = self._cells.get((ci + di, cj + dj))
+                    if not cell:
+                        continue
+                    for item_id, (plat, plng) in cell.items():
+                        distance = haversine_km(lat, lng, plat, plng)
+                        if distance <= radius_km:
+                            found.append((distance, item_id))
+                # Anything beyond this ring is at least ring cells away.
+                if len(found) >= limit:
+                    kth = heapq.nsmallest(limit, found)[-1][0]
+                    if kth <= ring * nearest_cell_km:
+                        break
+        return heapq.nsmallest(limit, found)
+
+
+def _ring(radius):
+    """Grid offsets whose Chebyshev distance from (0, 0) is exactly radius."""
+    if radius == 0:
+        yield 0, 0
+        return
+    for d in range(-radius, radius + 1):
+        yield -radius, d
+        yield radius, d
+    for d in range(-radius + 1, radius):
+        yield d, -radius
+        yield d, radius
+
+
+# ────────────────────────────────────────────────────────────
+# Process-wide open pickup index
+# ────────────────────────────────────────────────────────────
+_index = None
+_index_built = 0.0
+_index_lock = threading.Lock()
+
+
+def _build_index():
+    # Imported here: core.models itself calls back into this module.
+    from .models import PickupRequest
+
+    index = GridIndex(getattr(settings, 'GEO_INDEX_CELL_DEGREES', DEFAULT_CELL_DEGREES))
+    rows = (
+        PickupRequest.objects.unclaimed()
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+        .iterator(chunk_size=5000)
+    )
+    for pickup_id, lat, lng in rows:
+        index.add(pickup_id, lat, lng)
+    return index
+
+
+def open_pickup_index():
+    global _index, _index_built
+    max_age = getattr(settings, 'GEO_INDEX_MAX_AGE', 30)
+    if _index is None or time.monotonic() - _index_built > max_age:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_built > max_age:
+                _index = _build_index()
+                _index_built = time.monotonic()
+    return _index
+
+
+def sync_open_pickup(pickup_id, lat, lng, is_open):
+    """Add or drop one pickup in this process's index, if it has been built."""
+    if _index is None:
+        return
+    if is_open and lat is not None and lng is not None:
+        _index.add(pickup_id, lat, lng)
+    else:
+        _index.discard(pickup_id)
+
+
+def reset_open_pickup_index():
+    global _index
+    _index = None
+
+
+def nearest_open_pickups(lat, lng, limit=10, radius_km=DEFAULT_RADIUS_KM, queryset=None):
+    """The closest open pickups as a list of model instances with .distance_km set."""
+    from .models import PickupRequest
+
+    # Over-fetch a little: entries claimed by other workers drop out below.
+    candidates = open_pickup_index().nearest(lat, lng, limit * 2, radius_km)
+    distances = {pickup_id: distance for distance, pickup_id in candidates}
+    queryset = queryset if queryset is not None else PickupRequest.objects.all()
+    pickups = list(queryset.unclaimed().filter(id__in=distances))
+    for pickup in pickups:
+        pickup.distance_km = round(distances[pickup.id], 2)
+    pickups.sort(key=lambda pickup: pickup.distance_km)
+    return pickups[:limit]
@@ -0,0 +1,171 @@
+"""Bulk pickup ingestion for partner and kiosk uploads.
+
+Rows stream in one at a time, are validated against the cached active
+category list and inserted with bulk_create, one transaction per batch.
+bulk_create skips pre_save and post_save, so each batch does the signal work
+itself: pricing, rollup counts, data versions, live events and the geo index. New pickups
+are pending and carry no actual weight, so the impact ledger is unaffected.
+"""
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import active_category_ids, active_category_rates
+from .events import publish_pickup_event
+from .geo import sync_open_pickup
+from .models import DailyPickupRollup, PickupRequest, User
+from .versions import PICKUPS_SCOPE, bump_version, user_scope
+
+DEFAULT_BATCH_SIZE = 500
+ROW_FIELDS = (
+    'estimated_weight_kg', 'pickup_date', 'pickup_time', 'address', 'special_instructions',
+    'latitude', 'longitude',
+)
+
+
+class IngestResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows(self):
+        return self.created + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'created':         self.created,
+            'failed':          len(self.errors),
+            'errors':          self.errors,
+            'seconds':         round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def iter_ndjson(lines):
+    """Yield one parsed object per non-blank line; bad JSON yields the error instead."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValidationError(f'Invalid JSON: {exc}')
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _clean_row(raw, category_ids, customer):
+    """Return (PickupRequest, None) or (None, {field: message})."""
+    if isinstance(raw, ValidationError):
+        return None, {'row': raw.messages}
+    if not isinstance(raw, dict):
+        return None, {'row': ['Expected an object.']}
+
+    values, errors = {}, {}
+    for name in ROW_FIELDS:
+        field = PickupRequest._meta.get_field(name)
+        try:
+            values[name] = field.clean(raw.get(name, '' if field.blank and not field.null else None), None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if 'estimated_weight_kg' in values and values['estimated_weight_kg'] <= Decimal('0'):
+        errors['estimated_weight_kg'] = ['Weight must be greater than zero.']
+
+    category_id = _as_id(raw.get('waste_category'))
+    if category_id not in category_ids:
+        errors['waste_category'] = ['Unknown or inactive waste category.']
+
+    customer_id = customer.pk if customer is not None else _as_id(raw.get('customer'))
+    if customer_id is None:
+        errors['customer'] = ['A customer id is required.']
+
+    if errors:
+        return None, errors
+    return PickupRequest(customer_id=customer_id, waste_category_id=category_id, **values), None
+
+
+def _publish_created(pickups):
+    for pickup in pickups:
+        publish_pickup_event('created', pickup.pk, pickup.customer_id, None, 'pending')
+        sync_open_pickup(pickup.pk, pickup.latitude, pickup.longitude, True)
+
+
+def _insert_batch(batch, result):
+    known = set(
+        User.objects.filter(id__in={p.customer_id for p, _ in batch}, role='customer')
+        .values_list('id', flat=True)
+    )
+    pickups = []
+    for pickup, number in batch:
+        if pickup.customer_id in known:
+            pickups.append(pickup)
+        else:
+            result.errors.append({'row': number, 'errors': {'customer': ['Unknown customer.']}})
+    if not pickups:
+        return
+
+    rates = active_category_rates()
+    for pickup in pickups:
+        pickup.set_price(rates.get(pickup.waste_category_id))
+
+    with transaction.atomic():
+        PickupRequest.objects.bulk_create(pickups)
+        buckets = defaultdict(lambda: [0, Decimal('0.00')])
+        for p in pickups:
+            bucket = buckets[(timezone.localdate(p.created_at), p.waste_category_id)]
+            bucket[0] += 1
+            bucket[1] += p.price
+        for (day, category_id), (count, value) in buckets.items():
+            key = {'date': day, 'status': 'pending', 'waste_category_id': category_id}
+            DailyPickupRollup.bump(key, pickup_count=count, weight_kg=Decimal('0.00'), value=value)
+
+        scopes = {user_scope(p.customer_id) for p in pickups} | {'pool', PICKUPS_SCOPE}
+        transaction.on_commit(lambda: bump_version(*scopes))
+        transaction.on_commit(lambda: _publish_created(pickups))
+    result.created += len(pickups)
+
+
+def ingest_pickups(rows, customer=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and insert an iterable of row dicts; return an IngestResult.
+
+    When customer is given every row is booked for them and any 'customer'
+    key in the input is ignored; otherwise each row names a customer id.
+    Rows are numbered from 1 in the reported errors.
+    """
+    result = IngestResult()
+    category_ids = active_category_ids()
+    batch = []
+    for number, raw in enumerate(rows, start=1):
+        pickup, errors = _clean_row(raw, category_ids, customer)
+        if errors:
+            result.errors.append({'row': number, 'errors': errors})
+            continue
+        batch.append((pickup, number))
+        if len(batch) >= batch_size:
+            _insert_batch(batch, result)
+            batch = []
+    if batch:
+        _insert_batch(batch, result)
+    result.errors.sort(key=lambda error: error['row'])
+    result.elapsed = time.perf_counter() - result.started
+    return result
@@ -135,9 +135,12 @@ function initializePriceCalculator() {
     }
 }
 
-// Load waste category rates from Django API
+// Load waste category rates from Django API. The page's rate-table version is
+// part of the URL, so the browser cache is reused until an admin edits a rate.
 function loadWasteCategoryRates() {
-    fetch('/api/waste-categories/')
+    const versioned = document.querySelector('[data-rate-version]');
+    const version = versioned ? versioned.dataset.rateVersion : '';
+    fetch('/api/waste-categories/' + (version ? `?v=${encodeURIComponent(version)}` : ''))
         .then(response => {
             if (!response.ok) {
                 throw new Error('Network response was not ok');
@@ -337,7 +340,15 @@ function initializeDashboardFeatures() {
 }
 
 function startDashboardAutoRefresh() {
+    if (!document.querySelector('[data-stats-url]')) {
+        return;
+    }
+    const liveEvents = connectPickupEvents();
     setInterval(() => {
+        // Polling is only a fallback while the live event stream is down
+        if (liveEvents && liveEvents.readyState === EventSource.OPEN) {
+            return;
+        }
         // Only refresh if user is still on dashboard and tab is active
         if (!document.hidden && 
             (window.location.pathname.includes('dashboard') || window.location.pathname.includes('customer'))) {
@@ -346,32 +357,72 @@ function startDashboardAutoRefresh() {
     }, 30000); // Refresh every 30 seconds
 }
 
+// Subscribe to server-pushed pickup changes; EventSource reconnects on its own
+function connectPickupEvents() {
+    const container = document.querySelector('[data-events-url]');
+    if (!container || typeof EventSource === 'undefined') {
+        return null;
+    }
+
+    const source = new EventSource(container.dataset.eventsUrl);
+    source.addEventListener('pickup', refreshDashboardStats);
+    // Catch up on anything missed while the stream was reconnecting
+    source.addEventListener('open', refreshDashboardStats);
+    return source;
+}
+
+// ETag of the last stats payload; lets the server answer unchanged polls with 304
+let dashboardStatsEtag = null;
+
 function refreshDashboardStats() {
-    fetch(window.location.href, {
-        headers: {
-            'X-Requested-With': 'XMLHttpRequest'
+    const container = document.querySelector('[data-stats-url]');
+    if (!container) {
+        return;
+    }
+
+    const headers = { 'Accept': 'application/json' };
+    if (dashboardStatsEtag) {
+        headers['If-None-Match'] = dashboardStatsEtag;
+    }
+
+    fetch(container.dataset.statsUrl, { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+    .then(response => {
+        if (response.status === 304) {
+            return null;  // nothing changed since the last poll
+        }
+        if (!response.ok) {
+            throw new Error('Stats request failed with status ' + response.status);
         }
+        dashboardStatsEtag = response.headers.get('ETag');
+        return response.json();
     })
-    .then(response => response.text())
-    .then(html => {
-        // Update only stat cards without full page reload
-        const parser = new DOMParser();
-        const newDoc = parser.parseFromString(html, 'text/html');
-        
-        const statCards = document.querySelectorAll('.card.bg-primary, .card.bg-success, .card.bg-info, .card.bg-warning');
-        const newStatCards = newDoc.querySelectorAll('.card.bg-primary, .card.bg-success, .card.bg-info, .card.bg-warning');
-        
-        statCards.forEach((card, index) => {
-            if (newStatCards[index]) {
-                card.innerHTML = newStatCards[index].innerHTML;
-            }
-        });
+    .then(stats => {
+        if (stats) {
+            updateStatElements(stats);
+        }
     })
     .catch(error => {
         console.log('Error refreshing dashboard:', error);
     });
 }
 
+// Write values into elements marked data-stat="path.to.value" (optional data-decimals)
+function updateStatElements(stats) {
+    document.querySelectorAll('[data-stat]').forEach(element => {
+        const value = element.dataset.stat.split('.').reduce(
+            (obj, key) => (obj === null || obj === undefined) ? undefined : obj[key],
+            stats
+        );
+        if (value === null || value === undefined) {
+            return;
+        }
+        const decimals = element.dataset.decimals;
+        element.textContent = decimals !== undefined
+            ? parseFloat(value).toFixed(parseInt(decimals, 10))
+            : value;
+    });
+}
+
 function loadChartJS() {
     const script = document.createElement('script');
     script.src = 'https://cdn.jsdelivr.net/npm/chart.js';
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import DEFAULT_CHUNK_SIZE, FORMATS, export_lines
+from core.forms import ExportFilterForm
+
+
+class ExportCommand(BaseCommand):
+    """Shared options for export_pickups and export_transactions."""
+    kind = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write.')
+        parser.add_argument('--format', choices=tuple(FORMATS),
+                            help='Output format (default: from the file extension, else csv).')
+        parser.add_argument('--start', help='First day to include (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Last day to include (YYYY-MM-DD).')
+        parser.add_argument('--status', help='Only pickups in this status.')
+        parser.add_argument('--collector', help='Only pickups handled by this collector username.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('ndjson' if output.endswith('.ndjson') else 'csv')
+
+        form = ExportFilterForm({
+            key: options[key] for key in ('start', 'end', 'status', 'collector') if options[key]
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        started = time.perf_counter()
+        rows = -1 if fmt == 'csv' else 0  # the CSV header is not a row
+        with open(output, 'w', encoding='utf-8', newline='') as handle:
+            for line in export_lines(self.kind, fmt, options['chunk_size'], **form.filters()):
+                handle.write(line)
+                rows += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} {self.kind} to {output} in {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,76 @@
+from bisect import bisect_right
+from collections import defaultdict
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import PickupRequest, WasteCategory, WasteCategoryRate
+from core.reports import ADMIN_METRICS_CACHE_KEY
+from core.versions import PICKUPS_SCOPE, bump_version, user_scope
+
+PRICE_FIELDS = ('rate_per_kg', 'price')
+
+
+class Command(BaseCommand):
+    help = ('Seed the waste category rate history and price pickups that have no stored rate '
+            'at the rate in effect when they were created.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            # Categories from before rate history existed start it at their current rate.
+            unseeded = WasteCategory.objects.filter(rates__isnull=True)
+            seeded = [
+                WasteCategoryRate(waste_category=category, version=1,
+                                  rate_per_kg=category.rate_per_kg, effective_from=category.created_at)
+                for category in unseeded
+            ]
+            if not options['dry_run']:
+                WasteCategoryRate.objects.bulk_create(seeded)
+
+            history = defaultdict(lambda: ([], []))
+            for category_id, effective_from, rate in (
+                WasteCategoryRate.objects.order_by('waste_category', 'version')
+                .values_list('waste_category', 'effective_from', 'rate_per_kg')
+            ):
+                history[category_id][0].append(effective_from)
+                history[category_id][1].append(rate)
+            if options['dry_run']:
+                for rate in seeded:
+                    history[rate.waste_category_id][0].append(rate.effective_from)
+                    history[rate.waste_category_id][1].append(rate.rate_per_kg)
+
+            # Keyset batches: priced rows drop out of the filter as they are written.
+            priced, last_id, users = 0, 0, set()
+            unpriced = PickupRequest.objects.filter(rate_per_kg__isnull=True).order_by('pk')
+            while batch := list(unpriced.filter(pk__gt=last_id)[:batch_size]):
+                for pickup in batch:
+                    starts, rates = history[pickup.waste_category_id]
+                    # Rate in effect at creation; pickups older than the history get its first rate.
+                    pickup.set_price(rates[max(bisect_right(starts, pickup.created_at) - 1, 0)])
+                    users.update(filter(None, (pickup.customer_id, pickup.collector_id)))
+                if not options['dry_run']:
+                    PickupRequest.objects.bulk_update(batch, PRICE_FIELDS)
+                priced += len(batch)
+                last_id = batch[-1].pk
+
+        if priced and not options['dry_run']:
+            # The rollups sum the stored prices, which bulk_update changed under them.
+            call_command('backfill_rollups', stdout=StringIO())
+            # Earnings are read through stats ETags and cached admin figures; drop what predates the prices.
+            bump_version(PICKUPS_SCOPE, *(user_scope(user_id) for user_id in users))
+            cache.delete(ADMIN_METRICS_CACHE_KEY)
+
+        verb = 'Would price' if options['dry_run'] else 'Priced'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {priced} pickups; seeded rate history for {len(seeded)} categories.'
+        ))
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+from core.models import DailyPickupRollup, DailyUserRollup, PickupRequest, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily pickup and user rollup tables from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        pickup_rows = (
+            PickupRequest.objects
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'status', 'waste_category_id')
+            .annotate(
+                pickups=Count('id'),
+                weight=Coalesce(Sum('actual_weight_kg'), Value(Decimal('0.00'))),
+                value=Coalesce(Sum('price'), Value(Decimal('0.00'))),
+            )
+            .order_by()
+        )
+        user_rows = (
+            User.objects
+            .annotate(day=TruncDate('date_joined'))
+            .values('day', 'role')
+            .annotate(users=Count('id'))
+            .order_by()
+        )
+
+        with transaction.atomic():
+            DailyPickupRollup.objects.all().delete()
+            DailyUserRollup.objects.all().delete()
+            pickups = DailyPickupRollup.objects.bulk_create(
+                (
+                    DailyPickupRollup(
+                        date=row['day'],
+                        status=row['status'],
+                        waste_category_id=row['waste_category_id'],
+                        pickup_count=row['pickups'],
+                        weight_kg=row['weight'],
+                        value=row['value'],
+                    )
+                    for row in pickup_rows.iterator()
+                ),
+                batch_size=batch_size,
+            )
+            users = DailyUserRollup.objects.bulk_create(
+                (
+                    DailyUserRollup(date=row['day'], role=row['role'], new_users=row['users'])
+                    for row in user_rows.iterator()
+                ),
+                batch_size=batch_size,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(pickups)} pickup and {len(users)} user rollup rows.'
+        ))
@@ -0,0 +1,77 @@
+import json
+import tempfile
+import time
+from functools import partial
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from core.analytics import DEFAULT_WEEKS, ORM_REPORTS, REPORTS, Snapshot, build_snapshot
+from core.benchmarks import populate
+
+
+def _timed(function, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return median(timings), result
+
+
+class Command(BaseCommand):
+    help = ('Time the admin analytics reports from a columnar snapshot against the same '
+            'queries through the ORM, in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Pickups to generate.')
+        parser.add_argument('--weeks', type=int, default=DEFAULT_WEEKS)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per report (median kept).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print the results as one JSON line.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(ANALYTICS_SNAPSHOT_DIR=directory):
+                report = self.run(options)
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+
+    def run(self, options):
+        started = time.perf_counter()
+        populate(options['rows'], options['seed'])
+        self.stdout.write(f"Generated {options['rows']} pickups in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        path = build_snapshot().path
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(f'Built the snapshot in {build_seconds:.1f}s')
+
+        # Map it afresh, as a worker would after the snapshot job switched CURRENT.
+        snapshot = Snapshot(path)
+        as_of, weeks, repeat = timezone.localdate(), options['weeks'], options['repeat']
+        results = {'rows': options['rows'], 'snapshot_build_s': round(build_seconds, 2), 'reports': {}}
+        for name, numpy_report in REPORTS.items():
+            orm_ms, expected = _timed(partial(ORM_REPORTS[name], as_of, weeks), repeat)
+            numpy_ms, actual = _timed(partial(numpy_report, snapshot, weeks), repeat)
+            results['reports'][name] = row = {
+                'orm_ms':   round(orm_ms, 2),
+                'numpy_ms': round(numpy_ms, 2),
+                'speedup':  round(orm_ms / numpy_ms, 1) if numpy_ms else None,
+                'matches':  actual == expected,
+            }
+            self.stdout.write(
+                f"{name:<24} ORM {row['orm_ms']:>10,.1f} ms   NumPy {row['numpy_ms']:>8,.1f} ms   "
+                f"{row['speedup']}x" + ('' if row['matches'] else '   RESULTS DIFFER')
+            )
+        return results
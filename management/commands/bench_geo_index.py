@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.geo import DEFAULT_CELL_DEGREES, DEFAULT_RADIUS_KM, GridIndex
+
+# Kathmandu valley, roughly.
+BOUNDS = ((27.60, 27.80), (85.20, 85.45))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark nearest-pickup queries against an in-memory GridIndex of random points.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pickups', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=2_000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--radius-km', type=float, default=DEFAULT_RADIUS_KM)
+        parser.add_argument('--cell-degrees', type=float, default=DEFAULT_CELL_DEGREES)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        (lat_lo, lat_hi), (lng_lo, lng_hi) = BOUNDS
+
+        def point():
+            return rng.uniform(lat_lo, lat_hi), rng.uniform(lng_lo, lng_hi)
+
+        index = GridIndex(options['cell_degrees'])
+        started = time.perf_counter()
+        for pickup_id in range(options['pickups']):
+            index.add(pickup_id, *point())
+        build = time.perf_counter() - started
+
+        queries = [point() for _ in range(options['queries'])]
+        started = time.perf_counter()
+        for lat, lng in queries:
+            index.nearest(lat, lng, options['limit'], options['radius_km'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Indexed {len(index)} pickups in {build:.2f}s; "
+            f"{len(queries)} nearest-{options['limit']} queries in {elapsed:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(queries) / elapsed:,.0f} queries/s ({elapsed / len(queries) * 1000:.3f} ms each)'
+        ))
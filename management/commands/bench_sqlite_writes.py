@@ -0,0 +1,175 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.sqlite import DEFAULT_PRAGMAS, pragma_statements
+
+USERS = 500
+PICKUPS = 20_000
+COMPLETE_SQL = "UPDATE pickup SET status = 'completed', weight = ? WHERE id = ?"
+IMPACT_SQL = 'UPDATE impact SET total = total + ?, last_updated = ? WHERE user_id = ?'
+
+# name -> (pragmas, BEGIN statement, completions per impact write). With 1 the
+# impact UPDATE rides in each completion's transaction, as the signal does;
+# with N they are summed and written in one transaction per N, as core.coalesce does.
+PROFILES = {
+    'default':   ({}, 'BEGIN', 1),
+    'tuned':     (DEFAULT_PRAGMAS, 'BEGIN IMMEDIATE', 1),
+    'coalesced': (DEFAULT_PRAGMAS, 'BEGIN IMMEDIATE', 50),
+}
+
+
+def _connect(path, pragmas):
+    # isolation_level=None: transactions are only the ones the workload opens.
+    db = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for statement in pragma_statements(pragmas):
+        db.execute(statement)
+    return db
+
+
+def _create(path):
+    db = sqlite3.connect(path)
+    db.executescript('''
+        CREATE TABLE impact (user_id INTEGER PRIMARY KEY, total REAL NOT NULL, last_updated REAL);
+        CREATE TABLE pickup (id INTEGER PRIMARY KEY, customer_id INTEGER, status TEXT, weight REAL);
+        CREATE INDEX pickup_status ON pickup (status);
+    ''')
+    db.executemany('INSERT INTO impact VALUES (?, 0, 0)', [(u,) for u in range(USERS)])
+    db.executemany('INSERT INTO pickup VALUES (?, ?, ?, NULL)',
+                   [(p, p % USERS, 'assigned') for p in range(PICKUPS)])
+    db.commit()
+    db.close()
+
+
+def _transaction(db, begin, statements):
+    db.execute(begin)
+    try:
+        for sql, rows in statements:
+            db.executemany(sql, rows)
+        db.execute('COMMIT')
+    except sqlite3.OperationalError:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+
+
+def _writer(path, profile, seconds, seed, start, results):
+    """Complete pickups one per transaction as fast as possible; count commits and lock errors."""
+    pragmas, begin, impact_every = PROFILES[profile]
+    db = _connect(path, pragmas)
+    rng = random.Random(seed)
+    writes = errors = 0
+    pending = {}
+    start.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pickup_id, weight = rng.randrange(PICKUPS), round(rng.uniform(0.5, 10), 2)
+        customer = pickup_id % USERS
+        statements = [(COMPLETE_SQL, [(weight, pickup_id)])]
+        if impact_every == 1:
+            statements.append((IMPACT_SQL, [(weight, time.time(), customer)]))
+        try:
+            _transaction(db, begin, statements)
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        writes += 1
+        if impact_every > 1:
+            pending[customer] = pending.get(customer, 0) + weight
+            if writes % impact_every == 0:
+                try:
+                    rows = [(delta, time.time(), user) for user, delta in pending.items()]
+                    _transaction(db, begin, [(IMPACT_SQL, rows)])
+                    pending.clear()
+                except sqlite3.OperationalError:
+                    errors += 1
+    db.close()
+    results.put(('writer', writes, errors))
+
+
+def _reader(path, profile, seconds, start, results):
+    """Dashboard-style polling: status counts and recycled weight, back to back."""
+    db = _connect(path, PROFILES[profile][0])
+    reads = errors = 0
+    start.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            db.execute('BEGIN')
+            db.execute('SELECT status, COUNT(*), SUM(weight) FROM pickup GROUP BY status').fetchall()
+            db.execute('SELECT SUM(total) FROM impact').fetchone()
+            db.execute('COMMIT')
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+    db.close()
+    results.put(('reader', reads, errors))
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent write throughput on a scratch SQLite file with the default '
+            'settings, the production pragmas, and the pragmas plus batched writes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Writer processes.')
+        parser.add_argument('--readers', type=int, default=2, help='Polling reader processes.')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Run time per profile.')
+        parser.add_argument('--profile', action='append', choices=list(PROFILES), dest='profiles',
+                            help='Only this profile (repeatable).')
+        parser.add_argument('--json', action='store_true', help='Print the results as one JSON line.')
+
+    def run_profile(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            _create(path)
+            start, results = multiprocessing.Event(), multiprocessing.Queue()
+            seconds = options['seconds']
+            workers = [
+                multiprocessing.Process(target=_writer, args=(path, profile, seconds, n, start, results))
+                for n in range(options['writers'])
+            ] + [
+                multiprocessing.Process(target=_reader, args=(path, profile, seconds, start, results))
+                for _ in range(options['readers'])
+            ]
+            for worker in workers:
+                worker.start()
+            start.set()
+            outcome = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+
+        # A write is one completed pickup, however its impact update was batched.
+        writes = sum(count for kind, count, _ in outcome if kind == 'writer')
+        reads = sum(count for kind, count, _ in outcome if kind == 'reader')
+        return {
+            'writes_per_second': round(writes / options['seconds'], 1),
+            'reads_per_second':  round(reads / options['seconds'], 1),
+            'write_errors':      sum(errors for kind, _, errors in outcome if kind == 'writer'),
+            'read_errors':       sum(errors for kind, _, errors in outcome if kind == 'reader'),
+        }
+
+    def handle(self, *args, **options):
+        report = {}
+        for profile in options['profiles'] or list(PROFILES):
+            report[profile] = row = self.run_profile(profile, options)
+            self.stdout.write(
+                f"{profile:<10} {row['writes_per_second']:>10,.1f} writes/s "
+                f"{row['reads_per_second']:>9,.1f} reads/s  "
+                f"locked: {row['write_errors']} writes, {row['read_errors']} reads"
+            )
+        baseline = report.get('default', {}).get('writes_per_second')
+        for profile, row in report.items():
+            if baseline and profile != 'default':
+                self.stdout.write(self.style.SUCCESS(
+                    f"{profile}: {row['writes_per_second'] / baseline:.1f}x the default write throughput"
+                ))
+        if options['json']:
+            self.stdout.write(json.dumps(report))
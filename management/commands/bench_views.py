@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from core.benchmarks import (
+    BENCH_VIEWS, DEFAULT_REQUESTS, DEFAULT_SCALES, DEFAULT_WARMUP, compare, run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every read-only view at growing data sizes in a throwaway test database '
+            'and write p50/p95 latency and query counts as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                            help='Comma-separated pickup counts (default: %(default)s).')
+        parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS,
+                            help='Timed requests per view and scale.')
+        parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--view', action='append', dest='views',
+                            choices=[name for name, _, _ in BENCH_VIEWS],
+                            help='Only this view (repeatable).')
+        parser.add_argument('--output', default='bench-views.json')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='Earlier results file to report regressions against.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed latency growth before it counts as a regression.')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',') if scale.strip()]
+        except ValueError:
+            raise CommandError('--scales must be comma-separated integers.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+
+        # A fresh test database, so the benchmark never touches real data.
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_benchmarks(
+                scales, options['requests'], options['warmup'], options['seed'],
+                views=options['views'], progress=self.stdout.write,
+            )
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['tolerance'])
+            for scale, view, metric, before, after in regressions:
+                self.stdout.write(self.style.WARNING(f'{scale} pickups {view} {metric}: {before} -> {after}'))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(
+                    f"No regressions against {baseline['meta'].get('commit') or options['compare']}."
+                ))
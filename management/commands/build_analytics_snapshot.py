@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.analytics import CHUNK_SIZE, build_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Export pickups and transactions to a new columnar analytics snapshot and make it '
+            'the one the admin reports read. Run it periodically, e.g. from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        snapshot = build_snapshot(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(snapshot)} pickups to {snapshot.path} in {time.perf_counter() - started:.1f}s.'
+        ))
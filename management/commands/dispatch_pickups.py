@@ -0,0 +1,41 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dispatch import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Assign open pickups to the nearest collectors with spare capacity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Plan and report without assigning anything.')
+        parser.add_argument('--capacity', type=int,
+                            help='Open pickups a collector may hold (default: DISPATCH_COLLECTOR_CAPACITY).')
+        parser.add_argument('--max-km', type=float,
+                            help='Longest distance to assign over (default: DISPATCH_MAX_KM).')
+        parser.add_argument('--date', help='Only dispatch pickups scheduled for this day (YYYY-MM-DD).')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep dispatching, sleeping this long between rounds.')
+
+    def handle(self, *args, **options):
+        while True:
+            report = dispatch(
+                dry_run=options['dry_run'],
+                capacity=options['capacity'],
+                max_km=options['max_km'],
+                pickup_date=options['date'],
+            ).as_dict()
+            verb = 'Would assign' if options['dry_run'] else 'Assigned'
+            count = report['planned'] if options['dry_run'] else report['assigned']
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {count} of {report['pickups']} pickups to {report['collectors']} collectors "
+                f"(mean {report['mean_km']} km, max {report['max_km']} km, "
+                f"{report['pickups_per_second']} pickups/s)."
+            ))
+            self.stdout.write(json.dumps(report))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
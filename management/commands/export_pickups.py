@@ -0,0 +1,6 @@
+from ._export import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Stream pickups joined with their category and transaction to a CSV or NDJSON file.'
+    kind = 'pickups'
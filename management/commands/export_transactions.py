@@ -0,0 +1,6 @@
+from ._export import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Stream transactions joined with their pickup to a CSV or NDJSON file.'
+    kind = 'transactions'
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import DEFAULT_BATCH_SIZE, PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic customers, collectors, admins, pickups and transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=100)
+        parser.add_argument('--collectors', type=int, default=10)
+        parser.add_argument('--admins', type=int, default=1)
+        parser.add_argument('--pickups', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            created = generate(
+                customers=options['customers'],
+                collectors=options['collectors'],
+                admins=options['admins'],
+                pickups=options['pickups'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users and {created['pickups']} pickups in {elapsed:.1f}s "
+            f"({created['pickups'] / elapsed:,.0f} pickups/s). Password for all: {PASSWORD!r}."
+        ))
@@ -0,0 +1,58 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ingest import DEFAULT_BATCH_SIZE, ingest_pickups, iter_ndjson
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create pickups from an NDJSON (one object per line) or JSON array file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=('ndjson', 'json'),
+                            help='Input format (default: from the file extension, else ndjson).')
+        parser.add_argument('--customer', help='Book every row for this customer username.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--show-errors', type=int, default=20,
+                            help='How many row errors to print.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.endswith('.json') else 'ndjson')
+
+        customer = None
+        if options['customer']:
+            try:
+                customer = User.objects.get(username=options['customer'], role='customer')
+            except User.DoesNotExist:
+                raise CommandError(f"No customer named {options['customer']!r}.")
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            if fmt == 'json':
+                try:
+                    rows = json.load(stream)
+                except ValueError as exc:
+                    raise CommandError(f'Invalid JSON: {exc}')
+                if not isinstance(rows, list):
+                    raise CommandError('Expected a JSON array of pickups.')
+            else:
+                rows = iter_ndjson(stream)
+            result = ingest_pickups(rows, customer=customer, batch_size=options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        shown = options['show_errors']
+        for error in result.errors[:shown]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if len(result.errors) > shown:
+            self.stderr.write(f'... and {len(result.errors) - shown} more')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created} pickups, rejected {len(result.errors)} rows '
+            f'in {result.elapsed:.2f}s ({result.rows_per_second} rows/s).'
+        ))
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from core.models import PickupRequest, RecyclingImpact, User
+
+CENT = Decimal('0.01')
+IMPACT_FIELDS = ('total_weight_recycled', 'trees_saved', 'co2_reduced', 'water_saved')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild RecyclingImpact rows from completed pickups and reconcile any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted rows without writing them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # One grouped query for every customer's recycled weight.
+        totals = dict(
+            PickupRequest.objects
+            .filter(status='completed', actual_weight_kg__isnull=False)
+            .values_list('customer')
+            .annotate(total=Sum('actual_weight_kg'))
+            .order_by()
+        )
+
+        with transaction.atomic():
+            drifted = []
+            seen = set()
+            for impact in RecyclingImpact.objects.select_for_update().iterator(chunk_size=batch_size):
+                seen.add(impact.user_id)
+                before = [getattr(impact, f) for f in IMPACT_FIELDS]
+                impact.set_total_weight(totals.get(impact.user_id, Decimal('0.00')))
+                after = [getattr(impact, f).quantize(CENT) for f in IMPACT_FIELDS]
+                if before != after:
+                    drifted.append(impact)
+
+            missing_ids = set(totals) | set(
+                User.objects.filter(role='customer').values_list('id', flat=True)
+            )
+            missing = []
+            for user_id in missing_ids - seen:
+                impact = RecyclingImpact(user_id=user_id)
+                impact.set_total_weight(totals.get(user_id, Decimal('0.00')))
+                missing.append(impact)
+
+            if not options['dry_run']:
+                RecyclingImpact.objects.bulk_update(drifted, IMPACT_FIELDS, batch_size=batch_size)
+                RecyclingImpact.objects.bulk_create(missing, batch_size=batch_size)
+
+        verb = 'Would reconcile' if options['dry_run'] else 'Reconciled'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(drifted)} drifted and {len(missing)} missing impact rows '
+            f'({len(seen)} checked).'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.verification import DEFAULT_BATCH_SIZE, verify_pending
+
+
+class Command(BaseCommand):
+    help = 'Ask the payment gateways about pending digital transactions and settle them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            help='Parallel gateway lookups (default: PAYMENT_VERIFY_CONCURRENCY).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep verifying, sleeping this long between passes.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            totals = verify_pending(options['concurrency'], options['batch_size'])
+            elapsed = time.perf_counter() - started
+            summary = ', '.join(f'{key}={count}' for key, count in sorted(totals.items())) or 'nothing pending'
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {sum(totals.values())} transactions in {elapsed:.2f}s: {summary}'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
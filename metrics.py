@@ -0,0 +1,293 @@
+"""Per-request performance metrics, served in Prometheus text format at /metrics.
+
+MetricsMiddleware times every request and, through a database execute
+wrapper, counts its queries and the time spent in them. Template rendering
+is timed by TimedDjangoTemplates, the template backend in settings. Each
+observation lands in an in-process histogram labelled with the URL name, so
+a multi-process deployment has one /metrics per worker (scrape each, or sum
+them in Prometheus).
+
+Views listed in METRICS_N_PLUS_ONE_VIEWS also keep a count per SQL statement.
+A SELECT that runs METRICS_N_PLUS_ONE_THRESHOLD or more times in one request
+is almost always a lazy relation read inside a loop. It is logged and counted
+as n_plus_one_total.
+
+The work per request is a few perf_counter() calls, one dict update per query
+on the watched views, and one short lock per histogram observation.
+
+The middleware works in both sync and async stacks, so under ASGI it does not
+push every request onto a worker thread. There the view's queries run on
+sync_to_async threads, not the one serving the request. A wrapper installed
+on every new connection counts them instead, against the request in the
+current context.
+"""
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'kawadiwala'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+DEFAULT_N_PLUS_ONE_VIEWS = ('customer_dashboard', 'pickup_history', 'collector_dashboard', 'admin_dashboard')
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+_current = ContextVar('request_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class CounterMetric:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name, self.help_text = f'{PREFIX}_{name}', help_text
+        self._lock = Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name + _labels(key), value
+
+
+class HistogramMetric:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text = f'{PREFIX}_{name}', help_text
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (counts[:], total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket' + _labels(key + (('le', bound),)), cumulative
+            yield f'{self.name}_sum' + _labels(key), round(total, 6)
+            yield f'{self.name}_count' + _labels(key), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.requests = CounterMetric('requests_total', 'Requests served, by view, method and status.')
+        self.latency = HistogramMetric(
+            'request_duration_seconds', 'Time spent producing the response.', LATENCY_BUCKETS)
+        self.queries = HistogramMetric('db_queries', 'Database queries per request.', QUERY_BUCKETS)
+        self.db_time = HistogramMetric(
+            'db_duration_seconds', 'Time per request spent in the database.', LATENCY_BUCKETS)
+        self.template_time = HistogramMetric(
+            'template_render_seconds', 'Time per request spent rendering templates.', LATENCY_BUCKETS)
+        self.n_plus_one = CounterMetric(
+            'n_plus_one_total', 'Requests that repeated one SELECT past the threshold.')
+        self.page_cache = CounterMetric(
+            'page_cache_total', 'Anonymous page cache lookups, by page and result (fresh, stale, miss).')
+        self.metrics = [self.requests, self.latency, self.queries, self.db_time, self.template_time,
+                        self.n_plus_one, self.page_cache]
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name} {value}' for name, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        self.__init__()
+
+
+REGISTRY = Registry()
+
+
+class RequestStats:
+    """What one request did; filled in by the query wrapper and the template backend."""
+
+    def __init__(self, track_statements=False):
+        # Set by the async path: queries are counted by count_context_query, not a per-request wrapper.
+        self.from_context = False
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = Counter() if track_statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            if self.statements is not None:
+                self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """[(sql, count)] for SELECTs run at least threshold times, most repeated first."""
+        if not self.statements:
+            return []
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold and sql.lstrip()[:6].upper() == 'SELECT'
+        ]
+
+
+class TimedTemplate:
+    """Wraps a backend template so render() time is added to the current request."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def count_context_query(execute, sql, params, many, context):
+    """Connection-wide wrapper: charge a query to the async request in the current context."""
+    stats = _current.get()
+    if stats is None or not stats.from_context:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def wrap_new_connection(sender, connection, **kwargs):
+    if count_context_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_context_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    # Unmatched paths share one label so scanners can't blow up cardinality.
+    return match.view_name if match else '<unresolved>'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.watched = set(getattr(settings, 'METRICS_N_PLUS_ONE_VIEWS', DEFAULT_N_PLUS_ONE_VIEWS))
+        self.threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', False)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        self.record(request, response, stats, elapsed)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        stats.from_context = True
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        self.record(request, response, stats, elapsed)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # URL resolution has happened; from here on only watched views pay for per-statement counts.
+        stats = _current.get()
+        if stats is not None and request.resolver_match.url_name in self.watched:
+            stats.statements = Counter()
+
+    def record(self, request, response, stats, elapsed):
+        view = _view_name(request)
+        REGISTRY.requests.inc(view=view, method=request.method, status=response.status_code)
+        REGISTRY.latency.observe(elapsed, view=view)
+        REGISTRY.queries.observe(stats.queries, view=view)
+        REGISTRY.db_time.observe(stats.db_seconds, view=view)
+        if stats.template_seconds:
+            REGISTRY.template_time.observe(stats.template_seconds, view=view)
+
+        repeated = stats.repeated(self.threshold)
+        if repeated:
+            REGISTRY.n_plus_one.inc(view=view)
+            sql, count = repeated[0]
+            logger.warning('Possible N+1 in %s: %d runs of %s', view, count, sql[:200])
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={elapsed * 1000:.1f}',
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+                f'tpl;dur={stats.template_seconds * 1000:.1f}',
+            ])
@@ -1,122 +1,439 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.utils import timezone
-from decimal import Decimal
-
-class User(AbstractUser):
-    ROLE_CHOICES = (
-        ('customer', 'Customer'),
-        ('collector', 'Collector'),
-        ('admin', 'Admin'),
-    )
-    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='customer')
-    phone = models.CharField(max_length=15, blank=True)
-    address = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"{self.username} ({self.get_role_display()})"
-
-class WasteCategory(models.Model):
-    name = models.CharField(max_length=50, unique=True)
-    rate_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
-    description = models.TextField(blank=True)
-    is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    class Meta:
-        verbose_name_plural = "Waste Categories"
-        ordering = ['name']
-
-    def __str__(self):
-        return f"{self.name} - Rs.{self.rate_per_kg}/kg"
-
-class PickupRequest(models.Model):
-    STATUS_CHOICES = (
-        ('pending', 'Pending'),
-        ('assigned', 'Assigned to Collector'),
-        ('in_progress', 'In Progress'),
-        ('completed', 'Completed'),
-        ('cancelled', 'Cancelled'),
-        ('failed', 'Failed'),
-        ('rescheduled', 'Rescheduled'),
-    )
-    
-    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pickup_requests')
-    collector = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
-                                related_name='assigned_pickups')
-    waste_category = models.ForeignKey(WasteCategory, on_delete=models.CASCADE)
-    estimated_weight_kg = models.DecimalField(max_digits=8, decimal_places=2)
-    actual_weight_kg = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
-    pickup_date = models.DateField()
-    pickup_time = models.TimeField()
-    address = models.TextField()
-    special_instructions = models.TextField(blank=True)
-    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
-    created_at = models.DateTimeField(auto_now_add=True)
-    completed_at = models.DateTimeField(null=True, blank=True)
-
-    class Meta:
-        ordering = ['-created_at']
-
-    def estimated_price(self):
-        return self.estimated_weight_kg * self.waste_category.rate_per_kg
-
-    def actual_price(self):
-        if self.actual_weight_kg:
-            return self.actual_weight_kg * self.waste_category.rate_per_kg
-        return Decimal('0.00')
-
-    def __str__(self):
-        return f"{self.customer.username} - {self.waste_category.name} - {self.status}"
-
-class Transaction(models.Model):
-    pickup_request = models.OneToOneField(PickupRequest, on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
-    payment_method = models.CharField(max_length=20, default='cash')
-    transaction_date = models.DateTimeField(auto_now_add=True)
-    is_paid = models.BooleanField(default=False)
-
-    def __str__(self):
-        return f"Transaction for {self.pickup_request} - Rs.{self.amount}"
-
-class RecyclingImpact(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
-    total_weight_recycled = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    trees_saved = models.DecimalField(max_digits=8, decimal_places=2, default=0)
-    co2_reduced = models.DecimalField(max_digits=8, decimal_places=2, default=0)  # in kg
-    water_saved = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # in liters
-    last_updated = models.DateTimeField(auto_now=True)
-
-    def update_impact(self):
-        """Calculate environmental impact based on completed pickups"""
-        completed_pickups = PickupRequest.objects.filter(
-            customer=self.user, 
-            status='completed',
-            actual_weight_kg__isnull=False
-        )
-        
-        total_weight = sum(pickup.actual_weight_kg for pickup in completed_pickups)
-        self.total_weight_recycled = total_weight
-        
-        # Environmental impact calculations (approximate formulas)
-        self.trees_saved = total_weight * Decimal('0.017')  # 1kg paper = 0.017 trees saved
-        self.co2_reduced = total_weight * Decimal('0.82')   # 1kg recycled = 0.82kg CO2 saved
-        self.water_saved = total_weight * Decimal('13.2')   # 1kg recycled = 13.2L water saved
-        
-        self.save()
-
-    def __str__(self):
-        return f"Environmental Impact for {self.user.username}"
-class Transaction(models.Model):
-    pickup_request = models.OneToOneField(PickupRequest, on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
-    payment_method = models.CharField(max_length=20, default='cash')
-    payment_gateway = models.CharField(max_length=20, blank=True)  # New field
-    gateway_transaction_id = models.CharField(max_length=100, blank=True)  # New field
-    transaction_date = models.DateTimeField(auto_now_add=True)
-    is_paid = models.BooleanField(default=False)
-    
-    # Add these new fields
-    gateway_response = models.JSONField(blank=True, null=True)  # Store gateway response
-    payment_status = models.CharField(max_length=20, default='pending')  # pending, success, failed
+from collections import defaultdict
+
+from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_init
+from django.utils import timezone
+from decimal import Decimal
+
+from .events import publish_pickup_event
+from .geo import sync_open_pickup
+from .versions import PICKUPS_SCOPE, bump_version, user_scope
+
+LATITUDE_VALIDATORS = [MinValueValidator(-90), MaxValueValidator(90)]
+LONGITUDE_VALIDATORS = [MinValueValidator(-180), MaxValueValidator(180)]
+CENT = Decimal('0.01')
+
+class User(AbstractUser):
+    ROLE_CHOICES = (
+        ('customer', 'Customer'),
+        ('collector', 'Collector'),
+        ('admin', 'Admin'),
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='customer')
+    phone = models.CharField(max_length=15, blank=True)
+    address = models.TextField(blank=True)
+    latitude = models.FloatField(null=True, blank=True, validators=LATITUDE_VALIDATORS)
+    longitude = models.FloatField(null=True, blank=True, validators=LONGITUDE_VALIDATORS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # admin_dashboard "recent users"
+            models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
+        ]
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Re-take the "last saved state" snapshots kept by core.signals.
+        post_init.send(sender=type(self), instance=self)
+
+    def __str__(self):
+        return f"{self.username} ({self.get_role_display()})"
+
+class WasteCategory(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    rate_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Waste Categories"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} - Rs.{self.rate_per_kg}/kg"
+
+class WasteCategoryRate(models.Model):
+    """Every rate a waste category has had, numbered per category; the newest is live"""
+    waste_category = models.ForeignKey(WasteCategory, on_delete=models.CASCADE, related_name='rates')
+    version = models.PositiveIntegerField()
+    rate_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['waste_category', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['waste_category', 'version'], name='category_rate_version_uniq'),
+        ]
+
+    @classmethod
+    def record(cls, category, effective_from=None):
+        """Append category's current rate as its next version"""
+        latest = cls.objects.filter(waste_category=category).aggregate(v=models.Max('version'))['v']
+        return cls.objects.create(
+            waste_category=category,
+            version=(latest or 0) + 1,
+            rate_per_kg=category.rate_per_kg,
+            effective_from=effective_from or timezone.now(),
+        )
+
+    def __str__(self):
+        return f"{self.waste_category_id} v{self.version}: Rs.{self.rate_per_kg}/kg from {self.effective_from}"
+
+class PickupRequestQuerySet(models.QuerySet):
+    def stats(self):
+        """Status counts, recycled weight and earnings in one aggregate query"""
+        completed = Q(status='completed', actual_weight_kg__isnull=False)
+        aggregates = {
+            status: Count('id', filter=Q(status=status))
+            for status, _ in PickupRequest.STATUS_CHOICES
+        }
+        aggregates['total'] = Count('id')
+        aggregates['total_weight'] = Sum('actual_weight_kg', filter=completed)
+        aggregates['total_earnings'] = Sum('price', filter=completed)
+        stats = self.order_by().aggregate(**aggregates)
+        for key in ('total_weight', 'total_earnings'):
+            stats[key] = (stats[key] or Decimal('0')).quantize(Decimal('0.01'))
+        return stats
+
+    def unclaimed(self):
+        return self.filter(status='pending', collector__isnull=True)
+
+    def claim(self, pickup_id, collector):
+        """Assign one pending pickup to collector if nobody else has it yet.
+
+        The check and the write are a single conditional UPDATE, so when several
+        collectors race for the same pickup exactly one of them gets True.
+        """
+        with transaction.atomic():
+            won = self.unclaimed().filter(id=pickup_id).update(
+                collector=collector, status='assigned'
+            )
+            if won:
+                *rollup_row, customer_id = self.filter(id=pickup_id).values_list(
+                    'created_at', 'waste_category_id', 'actual_weight_kg', 'price', 'customer_id'
+                ).get()
+                DailyPickupRollup.move([rollup_row], 'pending', 'assigned')
+                scopes = (user_scope(customer_id), user_scope(collector.pk), 'pool', PICKUPS_SCOPE)
+                transaction.on_commit(lambda: bump_version(*scopes))
+                transaction.on_commit(lambda: publish_pickup_event(
+                    'status_changed', pickup_id, customer_id, collector.pk, 'assigned', 'pending'
+                ))
+                transaction.on_commit(lambda: sync_open_pickup(pickup_id, None, None, False))
+        return bool(won)
+
+    def claim_many(self, pickup_ids, collector):
+        """Assign every still-unclaimed pickup in pickup_ids to collector; return the ids won.
+
+        One conditional UPDATE for the lot, then claim()'s rollup, version,
+        event and geo bookkeeping in bulk, so a batch holds the write lock for
+        a handful of statements rather than a few per pickup.
+        """
+        with transaction.atomic():
+            rows = list(
+                self.unclaimed().select_for_update().filter(id__in=pickup_ids).values_list(
+                    'id', 'created_at', 'waste_category_id', 'actual_weight_kg', 'price', 'customer_id'
+                )
+            )
+            if not rows:
+                return []
+            ids = [row[0] for row in rows]
+            updated = self.unclaimed().filter(id__in=ids).update(collector=collector, status='assigned')
+            if updated != len(rows):
+                # Without row locks (SQLite) another claim can land between the read and the write.
+                won = set(self.filter(id__in=ids, collector=collector, status='assigned').values_list('id', flat=True))
+                rows = [row for row in rows if row[0] in won]
+            DailyPickupRollup.move([row[1:5] for row in rows], 'pending', 'assigned')
+            scopes = {user_scope(row[5]) for row in rows} | {user_scope(collector.pk), 'pool', PICKUPS_SCOPE}
+            transaction.on_commit(lambda: bump_version(*scopes))
+
+            def announce():
+                for pickup_id, *_, customer_id in rows:
+                    publish_pickup_event('status_changed', pickup_id, customer_id, collector.pk, 'assigned', 'pending')
+                    sync_open_pickup(pickup_id, None, None, False)
+            transaction.on_commit(announce)
+        return [row[0] for row in rows]
+
+    def claim_next(self, collector, count):
+        """Claim up to count of the earliest unclaimed pickups; return the ids won."""
+        won, tried = [], set()
+        while len(won) < count:
+            candidates = list(
+                self.unclaimed()
+                .exclude(id__in=tried)
+                .order_by('pickup_date', 'pickup_time', 'id')
+                .values_list('id', flat=True)[:count - len(won)]
+            )
+            if not candidates:
+                break
+            for pickup_id in candidates:
+                tried.add(pickup_id)
+                if self.claim(pickup_id, collector):
+                    won.append(pickup_id)
+        return won
+
+class PickupRequest(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('assigned', 'Assigned to Collector'),
+        ('in_progress', 'In Progress'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+        ('failed', 'Failed'),
+        ('rescheduled', 'Rescheduled'),
+    )
+    
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pickup_requests')
+    collector = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
+                                related_name='assigned_pickups')
+    waste_category = models.ForeignKey(WasteCategory, on_delete=models.CASCADE)
+    estimated_weight_kg = models.DecimalField(max_digits=8, decimal_places=2)
+    actual_weight_kg = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    pickup_date = models.DateField()
+    pickup_time = models.TimeField()
+    address = models.TextField()
+    latitude = models.FloatField(null=True, blank=True, validators=LATITUDE_VALIDATORS)
+    longitude = models.FloatField(null=True, blank=True, validators=LONGITUDE_VALIDATORS)
+    special_instructions = models.TextField(blank=True)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Locked in when the pickup is created, so later rate edits never reprice it.
+    # price is at the estimated weight until completion, then at the actual weight.
+    rate_per_kg = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    objects = PickupRequestQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # customer_dashboard / pickup_history, with and without a status filter
+            models.Index(fields=['customer', 'status', '-created_at'], name='pickup_customer_status_idx'),
+            models.Index(fields=['customer', '-created_at'], name='pickup_customer_created_idx'),
+            # collector_dashboard assigned / today lists
+            models.Index(fields=['collector', 'pickup_date'], name='pickup_collector_date_idx'),
+            # collector_dashboard available list and assign_pickup
+            models.Index(
+                fields=['pickup_date'],
+                name='pickup_unassigned_idx',
+                condition=Q(status='pending', collector__isnull=True),
+            ),
+            # admin_dashboard "recent pickups"
+            models.Index(fields=['-created_at'], name='pickup_created_idx'),
+        ]
+
+    def applied_rate(self):
+        """The rate stored on the pickup; the category's live rate only until it is priced"""
+        if self.rate_per_kg is not None:
+            return self.rate_per_kg
+        return self.waste_category.rate_per_kg
+
+    def set_price(self, rate=None):
+        """Lock in rate_per_kg (rate, else the live one) if unset, then recompute price"""
+        if self.rate_per_kg is None:
+            self.rate_per_kg = self.waste_category.rate_per_kg if rate is None else rate
+        if self.status == 'completed' and self.actual_weight_kg:
+            self.price = self.actual_price()
+        else:
+            self.price = self.estimated_price()
+
+    def estimated_price(self):
+        return (self.estimated_weight_kg * self.applied_rate()).quantize(CENT)
+
+    def actual_price(self):
+        if self.actual_weight_kg:
+            return (self.actual_weight_kg * self.applied_rate()).quantize(CENT)
+        return Decimal('0.00')
+
+    def impact_weight(self):
+        """Weight this pickup contributes to the customer's recycling impact"""
+        if self.status == 'completed' and self.actual_weight_kg:
+            return self.actual_weight_kg
+        return Decimal('0.00')
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Re-take the "last saved state" snapshots kept by core.signals.
+        post_init.send(sender=type(self), instance=self)
+
+    def __str__(self):
+        return f"{self.customer.username} - {self.waste_category.name} - {self.status}"
+
+class Transaction(models.Model):
+    PAYMENT_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    )
+
+    pickup_request = models.OneToOneField(PickupRequest, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=20, default='cash')
+    payment_gateway = models.CharField(max_length=20, blank=True)
+    gateway_transaction_id = models.CharField(max_length=100, blank=True)
+    transaction_date = models.DateTimeField(auto_now_add=True)
+    is_paid = models.BooleanField(default=False)
+    gateway_response = models.JSONField(blank=True, null=True)  # last applied callback payload
+    payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
+
+    class Meta:
+        constraints = [
+            # A gateway reference settles at most one transaction; also the callback lookup index.
+            models.UniqueConstraint(
+                fields=['payment_gateway', 'gateway_transaction_id'],
+                condition=~Q(gateway_transaction_id=''),
+                name='transaction_gateway_ref_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Transaction for {self.pickup_request} - Rs.{self.amount}"
+
+class PaymentEvent(models.Model):
+    """Append-only log of every gateway callback received, duplicates included"""
+    OUTCOME_CHOICES = (
+        ('applied', 'Applied'),
+        ('duplicate', 'Duplicate'),
+        ('rejected', 'Rejected'),
+    )
+
+    transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='events')
+    gateway = models.CharField(max_length=20)
+    gateway_transaction_id = models.CharField(max_length=100, blank=True)
+    event = models.CharField(max_length=20)  # success, failure
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    detail = models.CharField(max_length=200, blank=True)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gateway', 'gateway_transaction_id'], name='payment_event_ref_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.gateway} {self.event} {self.gateway_transaction_id or '-'}: {self.outcome}"
+
+class RecyclingImpact(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    total_weight_recycled = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    trees_saved = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    co2_reduced = models.DecimalField(max_digits=8, decimal_places=2, default=0)  # in kg
+    water_saved = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # in liters
+    last_updated = models.DateTimeField(auto_now=True)
+
+    # Environmental impact factors (approximate formulas)
+    TREES_PER_KG = Decimal('0.017')  # 1kg paper = 0.017 trees saved
+    CO2_PER_KG = Decimal('0.82')     # 1kg recycled = 0.82kg CO2 saved
+    WATER_PER_KG = Decimal('13.2')   # 1kg recycled = 13.2L water saved
+
+    def set_total_weight(self, total_weight):
+        """Set the recycled weight and every figure derived from it"""
+        self.total_weight_recycled = total_weight
+        self.trees_saved = total_weight * self.TREES_PER_KG
+        self.co2_reduced = total_weight * self.CO2_PER_KG
+        self.water_saved = total_weight * self.WATER_PER_KG
+
+    @classmethod
+    def apply_delta(cls, user_id, weight_delta):
+        """Atomically shift a user's impact by weight_delta kg.
+
+        The derived columns are recomputed from the new total inside the same
+        UPDATE, so repeated deltas never accumulate rounding drift. Returns the
+        number of rows touched (0 when the user has no impact row yet).
+        """
+        if not weight_delta:
+            return 1
+        new_total = F('total_weight_recycled') + weight_delta
+        return cls.objects.filter(user_id=user_id).update(
+            total_weight_recycled=new_total,
+            trees_saved=new_total * cls.TREES_PER_KG,
+            co2_reduced=new_total * cls.CO2_PER_KG,
+            water_saved=new_total * cls.WATER_PER_KG,
+            last_updated=timezone.now(),
+        )
+
+    def update_impact(self):
+        """Recalculate environmental impact from all completed pickups"""
+        total_weight = PickupRequest.objects.filter(
+            customer_id=self.user_id,
+            status='completed',
+            actual_weight_kg__isnull=False
+        ).aggregate(total=Sum('actual_weight_kg'))['total'] or Decimal('0.00')
+
+        self.set_total_weight(total_weight)
+        self.save()
+
+    def __str__(self):
+        return f"Environmental Impact for {self.user.username}"
+
+class Rollup(models.Model):
+    """Base for pre-aggregated counter tables maintained by signals"""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def bump(cls, key, create=True, **deltas):
+        """Add deltas to the row identified by key, creating it on first use"""
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        if cls.objects.filter(**key).update(**changes) or not create:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(**key, **deltas)
+        except IntegrityError:
+            # Another request created the row between our UPDATE and INSERT.
+            cls.objects.filter(**key).update(**changes)
+
+class DailyPickupRollup(Rollup):
+    """Pickup counts, recycled weight and value per creation day, status and category"""
+    date = models.DateField()
+    status = models.CharField(max_length=15, choices=PickupRequest.STATUS_CHOICES)
+    waste_category = models.ForeignKey(WasteCategory, on_delete=models.CASCADE)
+    pickup_count = models.IntegerField(default=0)
+    weight_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Sum of the pickups' stored price, so rate edits never rewrite past totals.
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'status', 'waste_category')
+
+    @classmethod
+    def move(cls, rows, old_status, new_status):
+        """Shift pickups between status buckets after a bulk UPDATE skipped signals.
+
+        rows are (created_at, waste_category_id, actual_weight_kg, price) tuples.
+        """
+        buckets = defaultdict(lambda: [0, Decimal('0.00'), Decimal('0.00')])
+        for created_at, category_id, weight, price in rows:
+            bucket = buckets[(timezone.localdate(created_at), category_id)]
+            bucket[0] += 1
+            bucket[1] += weight or 0
+            bucket[2] += price or 0
+        for (day, category_id), (count, weight, value) in buckets.items():
+            key = {'date': day, 'waste_category_id': category_id}
+            cls.bump({**key, 'status': old_status}, create=False,
+                     pickup_count=-count, weight_kg=-weight, value=-value)
+            cls.bump({**key, 'status': new_status}, pickup_count=count, weight_kg=weight, value=value)
+
+    def __str__(self):
+        return f"{self.date} - {self.waste_category_id} - {self.status}: {self.pickup_count}"
+
+class DailyUserRollup(Rollup):
+    """New users per join day and role"""
+    date = models.DateField()
+    role = models.CharField(max_length=10, choices=User.ROLE_CHOICES)
+    new_users = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'role')
+
+    def __str__(self):
+        return f"{self.date} - {self.role}: {self.new_users}"
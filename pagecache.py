@@ -0,0 +1,94 @@
+"""Whole-page caching for anonymous visitors, stale-while-revalidate.
+
+A cached page is fresh for PAGE_CACHE_SECONDS. After that it is stale and is
+kept for PAGE_CACHE_STALE_SECONDS more. The first request to find it stale
+takes a short lock in the default cache and renders the page again. Every
+other request keeps getting the stale copy until the new one is stored.
+Only the lock holder reaches the view, so a cached page costs at most one
+render (and its queries) per interval, whatever the traffic. A cold cache
+works the same way: the lock holder renders and the rest wait briefly for it.
+
+Signed-in users, non-GET requests and requests with pending flash messages
+always go to the view.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .metrics import REGISTRY
+
+KEY_PREFIX = 'core:page:'
+DEFAULT_FRESH_SECONDS = 60
+DEFAULT_STALE_SECONDS = 10 * 60
+LOCK_TIMEOUT = 30
+COLD_WAIT = 2.0
+COLD_POLL = 0.05
+
+
+def _rebuild(key, build, fresh, stale):
+    """Render under the lock and store the page; the lock is always released."""
+    try:
+        response = build()
+        if response.status_code == 200 and not response.streaming:
+            entry = (response.content, response['Content-Type'], time.time() + fresh)
+            cache.set(key, entry, fresh + stale)
+        return response
+    finally:
+        cache.delete(key + ':lock')
+
+
+def _wait_for_page(key):
+    """Cold cache: take the lock (None) or wait for its holder's page (the entry)."""
+    deadline = time.monotonic() + COLD_WAIT
+    while not cache.add(key + ':lock', 1, LOCK_TIMEOUT):
+        time.sleep(COLD_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if time.monotonic() > deadline:
+            # The holder is stuck or failed; don't make this visitor wait any longer.
+            return False
+    return None
+
+
+def stale_while_revalidate(key, build, fresh, stale):
+    """(response, result) for the page cached under key; result is fresh, stale or miss."""
+    key = KEY_PREFIX + key
+    entry = cache.get(key)
+    if entry is None:
+        entry = _wait_for_page(key)
+        if entry is None:
+            return _rebuild(key, build, fresh, stale), 'miss'
+        if entry is False:
+            return build(), 'miss'
+    content, content_type, fresh_until = entry
+    if fresh_until > time.time():
+        result = 'fresh'
+    elif cache.add(key + ':lock', 1, LOCK_TIMEOUT):
+        return _rebuild(key, build, fresh, stale), 'miss'
+    else:
+        result = 'stale'
+    return HttpResponse(content, content_type=content_type), result
+
+
+def cache_anonymous_page(name):
+    """Serve anonymous GETs of the decorated view through stale_while_revalidate()."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or len(get_messages(request))):
+                return view(request, *args, **kwargs)
+            response, result = stale_while_revalidate(
+                name, lambda: view(request, *args, **kwargs),
+                getattr(settings, 'PAGE_CACHE_SECONDS', DEFAULT_FRESH_SECONDS),
+                getattr(settings, 'PAGE_CACHE_STALE_SECONDS', DEFAULT_STALE_SECONDS),
+            )
+            REGISTRY.page_cache.inc(page=name, result=result)
+            return response
+        return wrapper
+    return decorator
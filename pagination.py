@@ -0,0 +1,104 @@
+"""Keyset (cursor) pagination.
+
+Instead of COUNT(*) plus OFFSET, each page seeks past the last row of the
+previous one using the ordering columns, so page N costs the same as page 1.
+Cursors are signed, opaque tokens holding the boundary row's key values.
+"""
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _split(order):
+    return (order[1:], True) if order.startswith('-') else (order, False)
+
+
+def _encode(model, ordering, direction, obj):
+    values = [
+        model._meta.get_field(name).value_to_string(obj)
+        for name, _ in map(_split, ordering)
+    ]
+    return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+
+def _decode(model, ordering, cursor):
+    try:
+        direction, raw = signing.loads(cursor, salt=CURSOR_SALT)
+        if direction not in ('next', 'prev') or len(raw) != len(ordering):
+            raise ValueError(cursor)
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for (name, _), value in zip(map(_split, ordering), raw)
+        ]
+    except (signing.BadSignature, ValueError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    return direction, values
+
+
+def _seek(ordering, values, forward):
+    """Rows strictly after (forward) or before the boundary in ``ordering``."""
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(map(_split, ordering), values):
+        lookup = 'lt' if descending == forward else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=10):
+    """Return a KeysetPage of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique column (normally ``id``) so that every
+    row has a distinct position. Raises InvalidCursor for forged or stale
+    tokens.
+    """
+    model = queryset.model
+    direction, values = ('next', None) if not cursor else _decode(model, ordering, cursor)
+    forward = direction == 'next'
+
+    order_by = ordering if forward else [
+        name if descending else f'-{name}' for name, descending in map(_split, ordering)
+    ]
+    rows = queryset.order_by(*order_by)
+    if values is not None:
+        rows = rows.filter(_seek(ordering, values, forward))
+    rows = list(rows[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    has_next = has_more if forward else True
+    has_previous = values is not None if forward else has_more
+    return KeysetPage(
+        rows,
+        next_cursor=_encode(model, ordering, 'next', rows[-1]) if rows and has_next else None,
+        previous_cursor=_encode(model, ordering, 'prev', rows[0]) if rows and has_previous else None,
+    )
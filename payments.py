@@ -0,0 +1,148 @@
+"""Idempotent processing of payment gateway callbacks.
+
+Gateways retry callbacks, and a user can reload the return page, so the same
+payment notification may arrive many times, possibly at once. Each delivery
+is appended to PaymentEvent. Only the first one moves the Transaction: the
+write is a conditional UPDATE on is_paid=False, and the unique
+(payment_gateway, gateway_transaction_id) constraint stops one gateway
+reference from settling two transactions. Later deliveries are logged as
+duplicates and change nothing.
+
+Only server-side deliveries (POSTed callbacks, core.verification lookups)
+reach process_callback(). The browser's GET return from a gateway carries
+nothing we can trust, so it never changes a transaction.
+"""
+import uuid
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from .models import PaymentEvent, Transaction
+
+Callback = namedtuple('Callback', 'gateway event order_id reference amount')
+
+
+class InvalidCallback(ValueError):
+    pass
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise InvalidCallback(f'Invalid amount {value!r}.')
+
+
+def parse_esewa(params, event):
+    """eSewa returns oid (our transaction id), refId and amt."""
+    return Callback('esewa', event, params.get('oid'), params.get('refId', ''),
+                    _decimal(params['amt']) if 'amt' in params else None)
+
+
+def parse_khalti(params, event):
+    """Khalti returns purchase_order_id, transaction_id, amount in paisa and a status."""
+    if params.get('status', 'Completed') != 'Completed':
+        event = 'failure'
+    amount = params.get('amount') or params.get('total_amount')
+    return Callback('khalti', event, params.get('purchase_order_id'),
+                    params.get('transaction_id') or params.get('pidx', ''),
+                    _decimal(amount) / 100 if amount else None)
+
+
+PARSERS = {
+    'esewa': parse_esewa,
+    'khalti': parse_khalti,
+}
+
+
+def parse_callback(params, event='success'):
+    """Build a Callback from a gateway's query/form parameters."""
+    gateway = params.get('gateway') or ('khalti' if 'purchase_order_id' in params else 'esewa')
+    if gateway not in PARSERS:
+        raise InvalidCallback(f'Unknown gateway {gateway!r}.')
+    callback = PARSERS[gateway](params, event)
+    try:
+        int(callback.order_id)
+    except (TypeError, ValueError):
+        raise InvalidCallback('Missing or invalid order id.')
+    return callback
+
+
+def _settle(callback):
+    """Apply callback to its transaction; return (outcome, transaction, detail)."""
+    txn = Transaction.objects.select_for_update().filter(id=callback.order_id).first()
+    if txn is None:
+        return 'rejected', None, 'Unknown transaction.'
+
+    if callback.event == 'failure':
+        failed = Transaction.objects.filter(pk=txn.pk, is_paid=False).exclude(
+            payment_status='failed'
+        ).update(payment_status='failed')
+        if failed:
+            return 'applied', txn, ''
+        return ('rejected' if txn.is_paid else 'duplicate'), txn, 'Already settled.'
+
+    if not callback.reference:
+        return 'rejected', txn, 'Missing gateway reference.'
+    if callback.amount is None:
+        return 'rejected', txn, 'Missing amount.'
+    if callback.amount != txn.amount:
+        return 'rejected', txn, f'Amount {callback.amount} does not match {txn.amount}.'
+
+    try:
+        with transaction.atomic():
+            paid = Transaction.objects.filter(pk=txn.pk, is_paid=False).update(
+                is_paid=True,
+                payment_status='success',
+                payment_gateway=callback.gateway,
+                gateway_transaction_id=callback.reference,
+            )
+    except IntegrityError:
+        return 'rejected', txn, 'Gateway reference already used by another transaction.'
+    if paid:
+        return 'applied', txn, ''
+
+    txn.refresh_from_db(fields=['payment_gateway', 'gateway_transaction_id'])
+    if (txn.payment_gateway, txn.gateway_transaction_id) == (callback.gateway, callback.reference):
+        return 'duplicate', txn, ''
+    return 'rejected', txn, 'Already paid under a different reference.'
+
+
+def process_callback(callback, payload):
+    """Log one callback delivery and apply it at most once; return the PaymentEvent."""
+    with transaction.atomic():
+        outcome, txn, detail = _settle(callback)
+        if outcome == 'applied' and callback.event == 'success':
+            Transaction.objects.filter(pk=txn.pk).update(gateway_response=payload)
+        return PaymentEvent.objects.create(
+            transaction=txn,
+            gateway=callback.gateway,
+            gateway_transaction_id=callback.reference,
+            event=callback.event,
+            outcome=outcome,
+            detail=detail,
+            payload=payload,
+        )
+
+
+class FakeGateway:
+    """Local stand-in for eSewa/Khalti that produces the callbacks they would send."""
+
+    def __init__(self, gateway='esewa'):
+        if gateway not in PARSERS:
+            raise ValueError(f'Unknown gateway {gateway!r}.')
+        self.gateway = gateway
+
+    def callback(self, txn, reference=None, amount=None, status='Completed'):
+        reference = reference or f'FAKE-{uuid.uuid4().hex[:12].upper()}'
+        amount = txn.amount if amount is None else amount
+        if self.gateway == 'esewa':
+            return {'gateway': 'esewa', 'oid': str(txn.pk), 'refId': reference, 'amt': str(amount)}
+        return {
+            'gateway': 'khalti',
+            'purchase_order_id': str(txn.pk),
+            'transaction_id': reference,
+            'amount': str(int(amount * 100)),
+            'status': status,
+        }
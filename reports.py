@@ -0,0 +1,75 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DailyPickupRollup, DailyUserRollup
+
+ADMIN_METRICS_CACHE_KEY = 'core:admin_metrics'
+
+
+def _month_start(today):
+    return today.replace(day=1)
+
+
+def compute_admin_metrics():
+    """Platform-wide counters read from the daily rollup tables."""
+    today = timezone.localdate()
+
+    users_by_role = dict(
+        DailyUserRollup.objects
+        .values_list('role')
+        .annotate(total=Sum('new_users'))
+        .order_by()
+    )
+    user_stats = {
+        'total':      sum(users_by_role.values()),
+        'customers':  users_by_role.get('customer', 0),
+        'collectors': users_by_role.get('collector', 0),
+        'admins':     users_by_role.get('admin', 0),
+    }
+
+    pickups_by_status = dict(
+        DailyPickupRollup.objects
+        .values_list('status')
+        .annotate(total=Sum('pickup_count'))
+        .order_by()
+    )
+    this_month = DailyPickupRollup.objects.filter(
+        date__gte=_month_start(today),
+        date__lt=_month_start(today + timedelta(days=32 - today.day)),
+    ).aggregate(total=Sum('pickup_count'))['total'] or 0
+    pickup_stats = {
+        'total':      sum(pickups_by_status.values()),
+        'pending':    pickups_by_status.get('pending', 0),
+        'completed':  pickups_by_status.get('completed', 0),
+        'this_month': this_month,
+    }
+
+    categories = list(
+        DailyPickupRollup.objects
+        .filter(status='completed')
+        .values('waste_category_id', 'waste_category__name')
+        .annotate(
+            pickups=Sum('pickup_count'),
+            weight=Sum('weight_kg'),
+            value=Sum('value'),
+        )
+        .order_by('waste_category__name')
+    )
+
+    return {
+        'user_stats':         user_stats,
+        'pickup_stats':       pickup_stats,
+        'total_transactions': sum((c['weight'] for c in categories), Decimal('0.00')),
+        'category_stats':     categories,
+    }
+
+
+def admin_metrics():
+    """compute_admin_metrics() behind a short-TTL cache shared by all admins."""
+    ttl = getattr(settings, 'ADMIN_METRICS_CACHE_TTL', 30)
+    return cache.get_or_set(ADMIN_METRICS_CACHE_KEY, compute_admin_metrics, ttl)
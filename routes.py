@@ -0,0 +1,135 @@
+"""Visit order for a collector's assigned pickups on one day.
+
+Stops are grouped by their pickup_time slot and the slots are visited in
+time order. Inside a slot the order is nearest-neighbour from wherever the
+previous slot ended, then improved with 2-opt. Distances come from one
+NumPy haversine matrix, and each 2-opt pass scores every candidate
+reversal for a given start position as a single vector operation.
+
+Plans are cached under the collector's data version, which moves whenever
+one of their pickups changes, so a page load only re-plans after the
+assignment set does.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.core.cache import cache
+
+from .geo import EARTH_RADIUS_KM
+from .versions import get_version, user_scope
+
+ROUTE_CACHE_TTL = 24 * 60 * 60
+
+Stop = namedtuple('Stop', 'id latitude longitude pickup_time')
+RoutePlan = namedtuple('RoutePlan', 'order distance_km legs_km unrouted')
+
+
+def distance_matrix(lats, lngs, to_lats=None, to_lngs=None):
+    """Great-circle distances in km from every point to every to_ point (default: the same points)."""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    to_lat = lat if to_lats is None else np.radians(np.asarray(to_lats, dtype=float))
+    to_lng = lng if to_lngs is None else np.radians(np.asarray(to_lngs, dtype=float))
+    dlat = lat[:, None] - to_lat[None, :]
+    dlng = lng[:, None] - to_lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(to_lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def nearest_neighbour(dist, start, nodes):
+    """Greedy path over nodes (matrix indices) beginning next to start."""
+    path, current = [], start
+    remaining = np.array(nodes)
+    while remaining.size:
+        nxt = int(remaining[np.argmin(dist[current, remaining])])
+        path.append(nxt)
+        remaining = remaining[remaining != nxt]
+        current = nxt
+    return path
+
+
+def two_opt(dist, start, path):
+    """Improve an open path from fixed start by reversing segments until no gain is left."""
+    route = np.array([start] + path)
+    n = len(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            j = np.arange(i + 1, n)
+            before, first, last = route[i - 1], route[i], route[j]
+            after = route[np.minimum(j + 1, n - 1)]
+            tail = j + 1 < n  # reversing up to the last stop leaves no edge after it
+            gain = (
+                dist[before, first] + np.where(tail, dist[last, after], 0)
+                - dist[before, last] - np.where(tail, dist[first, after], 0)
+            )
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                k = int(j[best])
+                route[i:k + 1] = route[i:k + 1][::-1]
+                improved = True
+    return [int(node) for node in route[1:]]
+
+
+def plan_route(stops, origin=None):
+    """Order stops (Stop tuples); origin is an optional (lat, lng) start point.
+
+    Stops without coordinates can't be routed; they come back in
+    ``unrouted`` in time order.
+    """
+    routable = [s for s in stops if s.latitude is not None and s.longitude is not None]
+    unrouted = [
+        s.id for s in sorted(stops, key=lambda s: s.pickup_time)
+        if s.latitude is None or s.longitude is None
+    ]
+    if not routable:
+        return RoutePlan([], 0.0, [], unrouted)
+
+    points = ([origin] if origin else []) + [(s.latitude, s.longitude) for s in routable]
+    dist = distance_matrix(*zip(*points))
+    offset = 1 if origin else 0
+
+    slots = {}
+    for index, stop in enumerate(routable, start=offset):
+        slots.setdefault(stop.pickup_time, []).append(index)
+
+    order, current = [], 0 if origin else None
+    for slot in sorted(slots):
+        nodes = slots[slot]
+        if current is None:
+            # No origin: start the day at the slot's westernmost stop.
+            current = min(nodes, key=lambda node: points[node][1])
+            order.append(current)
+            nodes = [node for node in nodes if node != current]
+            if not nodes:
+                continue
+        path = two_opt(dist, current, nearest_neighbour(dist, current, nodes))
+        order.extend(path)
+        current = path[-1]
+
+    sequence = ([0] if origin else []) + order
+    legs = [float(dist[a, b]) for a, b in zip(sequence, sequence[1:])]
+    return RoutePlan(
+        order=[routable[node - offset].id for node in order],
+        distance_km=round(sum(legs), 2),
+        # legs_km[k] is the drive to order[k]; the first stop has none without an origin.
+        legs_km=([] if origin else [None]) + [round(leg, 2) for leg in legs],
+        unrouted=unrouted,
+    )
+
+
+def collector_route(collector, day, pickups):
+    """Cached plan for a collector's pickups on day (the PickupRequest rows to visit)."""
+    origin, start = None, '-'
+    if collector.latitude is not None and collector.longitude is not None:
+        origin = (collector.latitude, collector.longitude)
+        start = '{:.5f},{:.5f}'.format(*origin)
+    version = get_version(user_scope(collector.pk))
+    key = f'route:{collector.pk}:{day.isoformat()}:{version}:{start}'
+    plan = cache.get(key)
+    if plan is None:
+        stops = [Stop(p.id, p.latitude, p.longitude, p.pickup_time) for p in pickups]
+        plan = plan_route(stops, origin)
+        cache.set(key, plan, ROUTE_CACHE_TTL)
+    return plan
@@ -1,97 +1,175 @@
-import os
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-SECRET_KEY = 'django-insecure-your-secret-key-here-change-in-production'
-DEBUG = True
-ALLOWED_HOSTS = ['localhost', '127.0.0.1']
-
-INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
-    'core',
-]
-
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',  # Must come before CSRF
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',  # CSRF middleware
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
-
-ROOT_URLCONF = 'kawadiwala.urls'
-
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
-
-WSGI_APPLICATION = 'kawadiwala.wsgi.application'
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
-
-AUTH_PASSWORD_VALIDATORS = [
-    {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
-    },
-]
-
-LANGUAGE_CODE = 'en-us'
-TIME_ZONE = 'Asia/Kathmandu'
-USE_I18N = True
-USE_TZ = True
-
-STATIC_URL = '/static/'
-STATICFILES_DIRS = [
-    BASE_DIR / "core/static",
-]
-
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-AUTH_USER_MODEL = 'core.User'
-
-LOGIN_URL = 'login'
-LOGIN_REDIRECT_URL = 'dashboard'
-LOGOUT_REDIRECT_URL = 'home'
-# Payment Gateway Settings
-ESEWA_MERCHANT_ID = 'your_esewa_merchant_id'
-ESEWA_SECRET_KEY = 'your_esewa_secret_key'
-
-KHALTI_PUBLIC_KEY = 'your_khalti_public_key'
-KHALTI_SECRET_KEY = 'your_khalti_secret_key'
-
-# Payment URLs
-PAYMENT_SUCCESS_URL = 'http://localhost:8000/payment/success/'
-PAYMENT_FAILURE_URL = 'http://localhost:8000/payment/failure/'
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SECRET_KEY = 'django-insecure-your-secret-key-here-change-in-production'
+DEBUG = True
+ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'core',
+]
+
+MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',  # First, so it times the whole stack
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',  # Must come before CSRF
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',  # CSRF middleware
+    'core.access.SnapshotAuthenticationMiddleware',  # AuthenticationMiddleware with a cached user
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'kawadiwala.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',  # DjangoTemplates plus render timing
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'kawadiwala.wsgi.application'
+
+# SQLite production profile: connections are reused for CONN_MAX_AGE seconds,
+# transactions BEGIN IMMEDIATE and wait up to 'timeout' seconds for the write
+# lock, and core.sqlite applies SQLITE_PRAGMAS (WAL etc.) to each new connection
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'memory',
+}
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+LANGUAGE_CODE = 'en-us'
+TIME_ZONE = 'Asia/Kathmandu'
+USE_I18N = True
+USE_TZ = True
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [
+    BASE_DIR / "core/static",
+]
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+AUTH_USER_MODEL = 'core.User'
+
+LOGIN_URL = 'login'
+LOGIN_REDIRECT_URL = 'dashboard'
+LOGOUT_REDIRECT_URL = 'home'
+
+# Change counters behind the stats API ETags live in the default cache, so
+# multi-process deployments need a shared backend (Redis/Memcached) here.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Seconds a signed-in user's snapshot (id, username, role, flags, location) stays cached
+AUTH_SNAPSHOT_TTL = 60 * 60
+# Batch RecyclingImpact updates in memory and write them every
+# IMPACT_FLUSH_INTERVAL seconds in one transaction (core.coalesce)
+IMPACT_WRITE_COALESCING = not DEBUG
+IMPACT_FLUSH_INTERVAL = 1.0
+# Seconds the admin dashboard's rollup-backed counters are cached for
+ADMIN_METRICS_CACHE_TTL = 30
+# Seconds the admin dashboard's table fragments are cached for; entity change
+# counters (core.versions) retire a fragment as soon as its data changes
+FRAGMENT_CACHE_TTL = 60 * 60
+# Anonymous landing page (core.pagecache): served from cache for PAGE_CACHE_SECONDS,
+# then served stale for up to PAGE_CACHE_STALE_SECONDS while one request re-renders it
+PAGE_CACHE_SECONDS = 60
+PAGE_CACHE_STALE_SECONDS = 10 * 60
+# Columnar analytics snapshots (core.analytics): where build_analytics_snapshot
+# writes them (ignored by git; point it at a data volume in production) and how many
+# recent ones it keeps
+ANALYTICS_SNAPSHOT_DIR = BASE_DIR / 'analytics'
+ANALYTICS_SNAPSHOTS_KEPT = 2
+# Seconds before each worker rebuilds its open-pickup geo index from the database
+GEO_INDEX_MAX_AGE = 30
+# Auto-dispatch: open pickups a collector may hold, and the furthest assignment in km
+DISPATCH_COLLECTOR_CAPACITY = 20
+DISPATCH_MAX_KM = 15
+# Request metrics served at /metrics: set METRICS_TOKEN to let a scraper in with
+# 'Authorization: Bearer <token>' (admins can always read it); Server-Timing
+# headers expose per-request app/db/template times to the browser devtools
+METRICS_ENABLED = True
+METRICS_TOKEN = ''
+METRICS_SERVER_TIMING = DEBUG
+# Dashboards checked for N+1 queries: a SELECT repeated this often in one request
+METRICS_N_PLUS_ONE_VIEWS = ['customer_dashboard', 'pickup_history', 'collector_dashboard', 'admin_dashboard']
+METRICS_N_PLUS_ONE_THRESHOLD = 5
+# Payment Gateway Settings
+ESEWA_MERCHANT_ID = 'your_esewa_merchant_id'
+ESEWA_SECRET_KEY = 'your_esewa_secret_key'
+
+KHALTI_PUBLIC_KEY = 'your_khalti_public_key'
+KHALTI_SECRET_KEY = 'your_khalti_secret_key'
+
+ESEWA_PAYMENT_URL = 'https://uat.esewa.com.np/epay/main'
+ESEWA_STATUS_URL = 'https://uat.esewa.com.np/api/epay/transaction/status/'
+KHALTI_LOOKUP_URL = 'https://a.khalti.com/api/v2/epayment/lookup/'
+# Send checkouts to the local stand-in gateway (payment/fake/<gateway>/) instead
+# of eSewa. It settles payments without any money moving, so it is an explicit
+# opt-in for local development, never tied to DEBUG
+PAYMENT_FAKE_GATEWAY = False
+
+# verify_payments worker: parallel gateway lookups, per-request timeout (s),
+# attempts per lookup and the first retry delay (s), doubled each retry
+PAYMENT_VERIFY_CONCURRENCY = 8
+PAYMENT_VERIFY_TIMEOUT = 10
+PAYMENT_VERIFY_MAX_ATTEMPTS = 4
+PAYMENT_VERIFY_BACKOFF = 0.5
+
+# Payment URLs
+PAYMENT_SUCCESS_URL = 'http://localhost:8000/payment/success/'
+PAYMENT_FAILURE_URL = 'http://localhost:8000/payment/failure/'
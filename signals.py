@@ -0,0 +1,318 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .access import forget_user
+from .catalog import invalidate_catalog
+from .coalesce import record_impact_delta
+from .models import (
+    User, WasteCategory, WasteCategoryRate, PickupRequest, RecyclingImpact,
+    DailyPickupRollup, DailyUserRollup
+)
+from .events import publish_pickup_event
+from .geo import sync_open_pickup
+from .sqlite import configure_connection
+from .versions import CATEGORIES_SCOPE, PICKUPS_SCOPE, USERS_SCOPE, bump_version, user_scope
+
+
+def _loaded(instance, *fields):
+    """True when every field is already in memory (not deferred)."""
+    return all(field in instance.__dict__ for field in fields)
+
+
+# ────────────────────────────────────────────────────────────
+# RECYCLING IMPACT LEDGER
+# ────────────────────────────────────────────────────────────
+@receiver(post_init, sender=PickupRequest)
+def remember_impact_weight(sender, instance, **kwargs):
+    """Snapshot the weight a pickup currently counts towards its customer's impact."""
+    if _loaded(instance, 'status', 'actual_weight_kg'):
+        instance._impact_weight = instance.impact_weight()
+    else:
+        # Deferred fields: loading them here would cost a query per row.
+        instance._impact_weight = None
+
+
+@receiver(post_save, sender=PickupRequest)
+def apply_impact_delta(sender, instance, created, raw=False, **kwargs):
+    """Move the customer's impact by the change in this pickup's contribution."""
+    if raw:
+        return
+    previous = Decimal('0.00') if created else instance._impact_weight
+    current = instance.impact_weight()
+    instance._impact_weight = current
+
+    if previous is not None and record_impact_delta(instance.customer_id, current - previous):
+        return
+    impact, _ = RecyclingImpact.objects.get_or_create(user_id=instance.customer_id)
+    impact.update_impact()
+
+
+@receiver(post_delete, sender=PickupRequest)
+def remove_impact_weight(sender, instance, **kwargs):
+    if instance._impact_weight:
+        record_impact_delta(instance.customer_id, -instance._impact_weight)
+
+
+# ────────────────────────────────────────────────────────────
+# DAILY ROLLUPS
+# ────────────────────────────────────────────────────────────
+def _pickup_rollup_state(instance):
+    """(rollup key, weight, value) for a saved pickup, or None when it can't be read cheaply."""
+    if not _loaded(instance, 'created_at', 'status', 'waste_category_id', 'actual_weight_kg', 'price'):
+        return None
+    if instance.created_at is None:
+        return None
+    key = {
+        'date': timezone.localdate(instance.created_at),
+        'status': instance.status,
+        'waste_category_id': instance.waste_category_id,
+    }
+    return key, instance.actual_weight_kg or Decimal('0.00'), instance.price or Decimal('0.00')
+
+
+@receiver(post_init, sender=PickupRequest)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = _pickup_rollup_state(instance)
+
+
+@receiver(post_save, sender=PickupRequest)
+def move_pickup_rollup(sender, instance, created, raw=False, **kwargs):
+    """Shift one pickup between rollup buckets when its status, category, weight or price changes."""
+    if raw:
+        return
+    previous = None if created else instance._rollup_state
+    current = _pickup_rollup_state(instance)
+    instance._rollup_state = current
+    if previous == current:
+        return
+    # A non-created save with an unknown previous state (deferred load) is
+    # left for backfill_rollups to reconcile rather than guessed at.
+    if previous is not None:
+        DailyPickupRollup.bump(previous[0], pickup_count=-1, weight_kg=-previous[1], value=-previous[2])
+    if created or previous is not None:
+        DailyPickupRollup.bump(current[0], pickup_count=1, weight_kg=current[1], value=current[2])
+
+
+@receiver(post_delete, sender=PickupRequest)
+def remove_pickup_rollup(sender, instance, **kwargs):
+    if instance._rollup_state is not None:
+        key, weight, value = instance._rollup_state
+        DailyPickupRollup.bump(key, create=False, pickup_count=-1, weight_kg=-weight, value=-value)
+
+
+def _user_rollup_key(instance):
+    if not _loaded(instance, 'date_joined', 'role'):
+        return None
+    return {'date': timezone.localdate(instance.date_joined), 'role': instance.role}
+
+
+@receiver(post_init, sender=User)
+def remember_user_rollup_key(sender, instance, **kwargs):
+    instance._rollup_key = _user_rollup_key(instance)
+
+
+@receiver(post_save, sender=User)
+def move_user_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else instance._rollup_key
+    current = _user_rollup_key(instance)
+    instance._rollup_key = current
+    if previous == current:
+        return
+    if previous is not None:
+        DailyUserRollup.bump(previous, new_users=-1)
+    if created or previous is not None:
+        DailyUserRollup.bump(current, new_users=1)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_rollup(sender, instance, **kwargs):
+    if instance._rollup_key is not None:
+        DailyUserRollup.bump(instance._rollup_key, create=False, new_users=-1)
+
+
+# ────────────────────────────────────────────────────────────
+# DATA VERSIONS (stats API ETags)
+# ────────────────────────────────────────────────────────────
+def _pickup_version_state(instance):
+    """(collector_id, in the open pool) for a loaded pickup, else None."""
+    if not _loaded(instance, 'collector_id', 'status'):
+        return None
+    return instance.collector_id, instance.status == 'pending' and instance.collector_id is None
+
+
+@receiver(post_init, sender=PickupRequest)
+def remember_version_state(sender, instance, **kwargs):
+    instance._version_state = _pickup_version_state(instance)
+
+
+def _bump_pickup_versions(instance, previous):
+    current = _pickup_version_state(instance)
+    scopes = {user_scope(instance.customer_id)}
+    for state in (previous, current):
+        if state is None:
+            continue
+        collector_id, in_pool = state
+        if collector_id:
+            scopes.add(user_scope(collector_id))
+        if in_pool:
+            scopes.add('pool')
+    # Publish only once the change is visible to other connections.
+    transaction.on_commit(lambda: bump_version(*scopes))
+    return current
+
+
+@receiver(post_save, sender=PickupRequest)
+def bump_pickup_versions(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else instance._version_state
+    instance._version_state = _bump_pickup_versions(instance, previous)
+
+
+@receiver(post_delete, sender=PickupRequest)
+def bump_deleted_pickup_versions(sender, instance, **kwargs):
+    _bump_pickup_versions(instance, instance._version_state)
+
+
+# ────────────────────────────────────────────────────────────
+# LIVE EVENTS (server-sent stream)
+# ────────────────────────────────────────────────────────────
+@receiver(post_init, sender=PickupRequest)
+def remember_event_status(sender, instance, **kwargs):
+    instance._event_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=PickupRequest)
+def publish_pickup_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous, instance._event_status = instance._event_status, instance.status
+    if created:
+        event, previous = 'created', None
+    elif previous != instance.status:
+        event = 'status_changed'
+    else:
+        return
+    args = (event, instance.pk, instance.customer_id, instance.collector_id, instance.status, previous)
+    transaction.on_commit(lambda: publish_pickup_event(*args))
+
+
+# ────────────────────────────────────────────────────────────
+# WASTE CATEGORY CATALOG
+# ────────────────────────────────────────────────────────────
+@receiver(post_save, sender=WasteCategory)
+@receiver(post_delete, sender=WasteCategory)
+def invalidate_category_catalog(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(invalidate_catalog)
+
+
+# ────────────────────────────────────────────────────────────
+# RATE HISTORY AND PICKUP PRICING
+# ────────────────────────────────────────────────────────────
+@receiver(post_init, sender=WasteCategory)
+def remember_rate(sender, instance, **kwargs):
+    instance._saved_rate = instance.__dict__.get('rate_per_kg')
+
+
+@receiver(post_save, sender=WasteCategory)
+def record_rate_version(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.rate_per_kg != instance._saved_rate:
+        WasteCategoryRate.record(instance)
+    instance._saved_rate = instance.rate_per_kg
+
+
+@receiver(post_init, sender=PickupRequest)
+def remember_priced_category(sender, instance, **kwargs):
+    instance._priced_category = instance.__dict__.get('waste_category_id')
+
+
+@receiver(pre_save, sender=PickupRequest)
+def price_pickup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # A category changed before completion (e.g. in the admin) takes the new category's rate.
+    if (
+        instance._priced_category is not None
+        and instance.waste_category_id != instance._priced_category
+        and instance.status != 'completed'
+    ):
+        instance.rate_per_kg = None
+    instance.set_price()
+
+
+@receiver(post_save, sender=PickupRequest)
+def remember_priced_category_after_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._priced_category = instance.waste_category_id
+
+
+# ────────────────────────────────────────────────────────────
+# FRAGMENT CACHE VERSIONS (admin dashboard tables)
+# ────────────────────────────────────────────────────────────
+ENTITY_SCOPES = {
+    PickupRequest: PICKUPS_SCOPE,
+    User:          USERS_SCOPE,
+    WasteCategory: CATEGORIES_SCOPE,
+}
+
+
+@receiver(post_save, sender=PickupRequest)
+@receiver(post_delete, sender=PickupRequest)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=WasteCategory)
+@receiver(post_delete, sender=WasteCategory)
+def bump_entity_version(sender, raw=False, update_fields=None, **kwargs):
+    # A login only touches last_login, which no cached fragment shows.
+    if not raw and update_fields != frozenset({'last_login'}):
+        scope = ENTITY_SCOPES[sender]
+        transaction.on_commit(lambda: bump_version(scope))
+
+
+# ────────────────────────────────────────────────────────────
+# OPEN PICKUP GEO INDEX
+# ────────────────────────────────────────────────────────────
+@receiver(post_save, sender=PickupRequest)
+def sync_geo_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    args = (
+        instance.pk, instance.latitude, instance.longitude,
+        instance.status == 'pending' and instance.collector_id is None,
+    )
+    transaction.on_commit(lambda: sync_open_pickup(*args))
+
+
+@receiver(post_delete, sender=PickupRequest)
+def drop_from_geo_index(sender, instance, **kwargs):
+    pickup_id = instance.pk
+    transaction.on_commit(lambda: sync_open_pickup(pickup_id, None, None, False))
+
+
+# ────────────────────────────────────────────────────────────
+# AUTH SNAPSHOTS (core.access)
+# ────────────────────────────────────────────────────────────
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_snapshot(sender, instance, raw=False, **kwargs):
+    if not raw:
+        user_id = instance.pk
+        transaction.on_commit(lambda: forget_user(user_id))
+
+
+# ────────────────────────────────────────────────────────────
+# SQLITE CONNECTION TUNING (core.sqlite)
+# ────────────────────────────────────────────────────────────
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    configure_connection(connection)
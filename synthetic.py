@@ -0,0 +1,186 @@
+"""Synthetic users, pickups and transactions for load tests and benchmarks.
+
+Everything is written with bulk_create, a batch at a time, so a million
+pickups take minutes rather than hours. bulk_create skips signals, so
+generate() rebuilds the rollup and impact tables afterwards with the same
+commands an operator would run. The same seed gives the same data.
+
+The shape follows production: most pickups are old and completed, a few
+are open around today, and completed pickups carry a cash or gateway
+transaction.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import DateTimeField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .geo import reset_open_pickup_index
+from .models import PickupRequest, Transaction, User, WasteCategory
+from .reports import ADMIN_METRICS_CACHE_KEY
+from .versions import CATEGORIES_SCOPE, PICKUPS_SCOPE, USERS_SCOPE, bump_version
+
+DEFAULT_BATCH_SIZE = 2000
+PASSWORD = 'synthetic-pass'
+
+# Kathmandu valley, roughly.
+BOUNDS = ((27.60, 27.80), (85.20, 85.45))
+
+CATEGORIES = [
+    ('Paper', Decimal('15.00')),
+    ('Plastic', Decimal('25.00')),
+    ('Metal', Decimal('60.00')),
+    ('Glass', Decimal('8.00')),
+    ('E-waste', Decimal('120.00')),
+]
+
+# (status, share) for pickups booked in the past, and for open ones around today.
+HISTORIC_STATUSES = [('completed', 82), ('cancelled', 12), ('failed', 6)]
+OPEN_STATUSES = [('pending', 55), ('assigned', 35), ('in_progress', 10)]
+OPEN_SHARE = 0.15
+HISTORY_DAYS = 365
+SLOTS = [time(hour) for hour in range(8, 18)]
+
+# Completed pickups: how they were paid.
+PAYMENT_MIX = [('cash', 60), ('esewa', 25), ('khalti', 15)]
+GATEWAY_OUTCOMES = [('success', 85), ('pending', 10), ('failed', 5)]
+
+
+def _pick(rng, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _point(rng):
+    (lat_lo, lat_hi), (lng_lo, lng_hi) = BOUNDS
+    return round(rng.uniform(lat_lo, lat_hi), 6), round(rng.uniform(lng_lo, lng_hi), 6)
+
+
+def ensure_categories():
+    for name, rate in CATEGORIES:
+        WasteCategory.objects.get_or_create(name=name, defaults={'rate_per_kg': rate})
+    return list(WasteCategory.objects.filter(is_active=True))
+
+
+def create_users(role, count, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """Add count users of role named syn-<role>-<n>, continuing any earlier numbering."""
+    prefix = f'syn-{role}-'
+    start = User.objects.filter(username__startswith=prefix).count()
+    password = make_password(PASSWORD)  # hashing once keeps 10k users fast
+    now = timezone.now()
+    users = []
+    for n in range(start, start + count):
+        lat, lng = _point(rng)
+        users.append(User(
+            username=f'{prefix}{n}', password=password, role=role,
+            email=f'{prefix}{n}@example.com', address=f'Ward {n % 32 + 1}, Kathmandu',
+            latitude=lat, longitude=lng,
+            date_joined=now - timedelta(days=rng.randrange(HISTORY_DAYS * 2)),
+            is_staff=role == 'admin',
+        ))
+    User.objects.bulk_create(users, batch_size=batch_size)
+    return count
+
+
+def _pickup(rng, customer, collectors, categories, today):
+    open_pickup = rng.random() < OPEN_SHARE
+    category = rng.choice(categories)
+    estimated = Decimal(rng.randint(10, 400)) / 10
+    pickup = PickupRequest(
+        customer_id=customer[0],
+        waste_category=category,
+        estimated_weight_kg=estimated,
+        address=f'Near {customer[0]}, Kathmandu',
+        latitude=round(customer[1] + rng.uniform(-0.002, 0.002), 6),
+        longitude=round(customer[2] + rng.uniform(-0.002, 0.002), 6),
+        pickup_time=rng.choice(SLOTS),
+    )
+    if open_pickup:
+        pickup.status = _pick(rng, OPEN_STATUSES)
+        pickup.pickup_date = today + timedelta(days=rng.randint(-1, 7))
+    else:
+        pickup.status = _pick(rng, HISTORIC_STATUSES)
+        pickup.pickup_date = today - timedelta(days=rng.randint(1, HISTORY_DAYS))
+    if pickup.status != 'pending' and collectors:
+        pickup.collector_id = rng.choice(collectors)
+    if pickup.status == 'completed':
+        pickup.actual_weight_kg = (estimated * Decimal(rng.uniform(0.7, 1.3))).quantize(Decimal('0.01'))
+        pickup.completed_at = timezone.make_aware(datetime.combine(pickup.pickup_date, pickup.pickup_time))
+    pickup.set_price()
+    return pickup
+
+
+def _transaction(rng, pickup):
+    method = _pick(rng, PAYMENT_MIX)
+    txn = Transaction(pickup_request=pickup, amount=pickup.actual_price())
+    if method == 'cash':
+        txn.payment_method, txn.is_paid, txn.payment_status = 'cash', True, 'success'
+    else:
+        txn.payment_method, txn.payment_gateway = 'digital', method
+        txn.payment_status = _pick(rng, GATEWAY_OUTCOMES)
+        txn.is_paid = txn.payment_status == 'success'
+        if txn.is_paid:
+            txn.gateway_transaction_id = f'SYN-{pickup.pk}'
+    return txn
+
+
+def create_pickups(count, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """Add count pickups (and their transactions) for existing synthetic customers."""
+    categories = ensure_categories()
+    customers = list(
+        User.objects.filter(role='customer', username__startswith='syn-')
+        .values_list('id', 'latitude', 'longitude')
+    )
+    collectors = list(
+        User.objects.filter(role='collector', username__startswith='syn-').values_list('id', flat=True)
+    )
+    if not customers:
+        raise ValueError('Create synthetic customers before their pickups.')
+
+    today = timezone.localdate()
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        batch = [_pickup(rng, rng.choice(customers), collectors, categories, today) for _ in range(size)]
+        with transaction.atomic():
+            PickupRequest.objects.bulk_create(batch)
+            # created_at is auto_now_add; move it back to a few days before the pickup.
+            by_lead = defaultdict(list)
+            for pickup in batch:
+                by_lead[rng.randint(0, 6)].append(pickup.pk)
+            for lead, ids in by_lead.items():
+                booked = Cast('pickup_date', DateTimeField()) - timedelta(days=lead, hours=rng.randint(0, 12))
+                PickupRequest.objects.filter(pk__in=ids).update(created_at=booked)
+            Transaction.objects.bulk_create(
+                [_transaction(rng, pickup) for pickup in batch if pickup.status == 'completed']
+            )
+        created += size
+    return created
+
+
+def finish():
+    """Rebuild what signals would have maintained and drop caches that predate the data."""
+    call_command('backfill_rollups', stdout=StringIO())
+    call_command('rebuild_impact', stdout=StringIO())
+    reset_open_pickup_index()
+    bump_version('pool', PICKUPS_SCOPE, USERS_SCOPE, CATEGORIES_SCOPE)
+    cache.delete(ADMIN_METRICS_CACHE_KEY)
+
+
+def generate(customers=0, collectors=0, admins=0, pickups=0, seed=0, batch_size=DEFAULT_BATCH_SIZE):
+    """Add synthetic users and pickups; return {'users': n, 'pickups': n}."""
+    rng = random.Random(seed)
+    users = 0
+    for role, count in (('customer', customers), ('collector', collectors), ('admin', admins)):
+        users += create_users(role, count, rng, batch_size)
+    created = create_pickups(pickups, rng, batch_size) if pickups else 0
+    finish()
+    return {'users': users, 'pickups': created}
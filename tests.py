@@ -1,3 +1,1704 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time as clock
+from collections import defaultdict
+from datetime import date, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .access import snapshot_key
+from .analytics import ORM_REPORTS, REPORTS, build_snapshot, current_snapshot
+from .benchmarks import compare, percentile, run_benchmarks
+from . import catalog
+from .catalog import rate_table_version
+from .coalesce import WriteCoalescer, impact_writes
+from .completion import CompletionError, complete_pickup
+from .dispatch import dispatch
+from .events import COLLECTORS_CHANNEL, get_broker, publish_pickup_event, user_channel
+from .forms import CollectorUpdateForm, CustomUserCreationForm, PickupRequestForm
+from .geo import (
+    KM_PER_DEGREE, MAX_RADIUS_KM, GridIndex, haversine_km, nearest_open_pickups, reset_open_pickup_index,
+)
+from .ingest import ingest_pickups
+from .metrics import REGISTRY, MetricsMiddleware, RequestStats, count_context_query, wrap_new_connection
+from .models import (
+    DailyPickupRollup, PaymentEvent, PickupRequest, RecyclingImpact, Transaction,
+    User, WasteCategory, WasteCategoryRate
+)
+from .pagination import InvalidCursor, paginate_keyset
+from .payments import FakeGateway, parse_callback, process_callback
+from .reports import compute_admin_metrics
+from .routes import Stop, distance_matrix, nearest_neighbour, plan_route
+from .synthetic import generate
+from .versions import CATEGORIES_SCOPE, PICKUPS_SCOPE, USERS_SCOPE, get_version, user_scope
+from .verification import GatewayClient, pending_transactions, verify_pending
+
+
+class PickupFixtureMixin:
+    """Shared users, a category and a pickup factory for the tests below."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('ram', password='pass12345', role='customer')
+        cls.collector = User.objects.create_user('hari', password='pass12345', role='collector')
+        cls.admin = User.objects.create_user('sita', password='pass12345', role='admin')
+        cls.paper = WasteCategory.objects.create(name='Paper', rate_per_kg=Decimal('15.00'))
+
+    def make_pickup(self, **kwargs):
+        fields = {
+            'customer': self.customer,
+            'waste_category': self.paper,
+            'estimated_weight_kg': Decimal('5.00'),
+            'pickup_date': date(2025, 1, 15),
+            'pickup_time': time(10, 0),
+            'address': 'Baneshwor, Kathmandu',
+        }
+        fields.update(kwargs)
+        return PickupRequest.objects.create(**fields)
+
+    def set_location(self, user, latitude, longitude):
+        """Move a user through the model, so the cached auth snapshot is dropped as in production."""
+        user.latitude, user.longitude = latitude, longitude
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['latitude', 'longitude'])
+
+
+class RecyclingImpactLedgerTests(PickupFixtureMixin, TestCase):
+    def impact(self):
+        return RecyclingImpact.objects.get(user=self.customer)
+
+    def test_completion_applies_delta(self):
+        pickup = self.make_pickup()
+        pickup.status = 'completed'
+        pickup.actual_weight_kg = Decimal('4.00')
+        pickup.save()
+
+        impact = self.impact()
+        self.assertEqual(impact.total_weight_recycled, Decimal('4.00'))
+        self.assertEqual(impact.co2_reduced, Decimal('3.28'))
+
+    def test_weight_change_and_reopen_adjust_total(self):
+        pickup = self.make_pickup(status='completed', actual_weight_kg=Decimal('4.00'))
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('1.50'))
+
+        pickup.actual_weight_kg = Decimal('6.00')
+        pickup.save()
+        self.assertEqual(self.impact().total_weight_recycled, Decimal('7.50'))
+
+        pickup.status = 'failed'
+        pickup.save()
+        self.assertEqual(self.impact().total_weight_recycled, Decimal('1.50'))
+
+        pickup.delete()
+        self.assertEqual(self.impact().total_weight_recycled, Decimal('1.50'))
+
+    def test_untouched_save_does_not_write_impact(self):
+        pickup = self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        pickup.refresh_from_db()
+        with self.assertNumQueries(1):
+            pickup.special_instructions = 'Ring the bell'
+            pickup.save()
+
+    def test_rebuild_command_reconciles_drift(self):
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('3.00'))
+        RecyclingImpact.objects.filter(user=self.customer).update(total_weight_recycled=99)
+        RecyclingImpact.objects.filter(user=self.collector).delete()
+
+        out = StringIO()
+        call_command('rebuild_impact', stdout=out)
+
+        self.assertEqual(self.impact().total_weight_recycled, Decimal('3.00'))
+        self.assertIn('Reconciled 1 drifted', out.getvalue())
+
+
+class PickupStatsTests(PickupFixtureMixin, TestCase):
+    def test_stats_is_a_single_query(self):
+        glass = WasteCategory.objects.create(name='Glass', rate_per_kg=Decimal('4.50'))
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('4.00'), waste_category=glass)
+        self.make_pickup(status='pending')
+        self.make_pickup(status='cancelled')
+
+        with self.assertNumQueries(1):
+            stats = PickupRequest.objects.filter(customer=self.customer).stats()
+
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['completed'], 2)
+        self.assertEqual(stats['total_weight'], Decimal('6.00'))
+        self.assertEqual(stats['total_earnings'], Decimal('48.00'))
+
+    def test_stats_on_empty_history(self):
+        stats = PickupRequest.objects.filter(customer=self.collector).stats()
+        self.assertEqual(stats['total'], 0)
+        self.assertEqual(stats['total_earnings'], Decimal('0.00'))
+
+
+class PickupPricingTests(PickupFixtureMixin, TestCase):
+    def change_rate(self, category, rate):
+        category.rate_per_kg = Decimal(rate)
+        category.save()
+
+    def test_rate_edits_do_not_reprice_past_pickups(self):
+        pickup = self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        self.assertEqual((pickup.rate_per_kg, pickup.price), (Decimal('15.00'), Decimal('30.00')))
+        self.change_rate(self.paper, '20.00')
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('1.00'))
+
+        pickup.refresh_from_db()
+        self.assertEqual(pickup.actual_price(), Decimal('30.00'))
+        with CaptureQueriesContext(connection) as ctx:
+            stats = PickupRequest.objects.filter(customer=self.customer).stats()
+        self.assertNotIn('JOIN', ctx.captured_queries[0]['sql'])
+        self.assertEqual(stats['total_earnings'], Decimal('50.00'))
+        self.assertEqual(
+            list(self.paper.rates.order_by('version').values_list('version', 'rate_per_kg')),
+            [(1, Decimal('15.00')), (2, Decimal('20.00'))],
+        )
+
+    def test_price_follows_weight_through_completion(self):
+        pickup = self.make_pickup()
+        self.assertEqual(pickup.price, Decimal('75.00'))
+        self.change_rate(self.paper, '40.00')
+        complete_pickup(pickup, Decimal('4.00'))
+        self.assertEqual((pickup.rate_per_kg, pickup.price), (Decimal('15.00'), Decimal('60.00')))
+
+    def test_category_change_before_completion_takes_the_new_rate(self):
+        glass = WasteCategory.objects.create(name='Glass', rate_per_kg=Decimal('8.00'))
+        pickup = self.make_pickup()
+        pickup.waste_category = glass
+        pickup.save()
+        self.assertEqual((pickup.rate_per_kg, pickup.price), (Decimal('8.00'), Decimal('40.00')))
+
+        complete_pickup(pickup, Decimal('2.00'))
+        pickup.refresh_from_db()
+        pickup.waste_category = self.paper
+        pickup.save()
+        self.assertEqual((pickup.rate_per_kg, pickup.price), (Decimal('8.00'), Decimal('16.00')))
+
+    def test_backfill_prices_at_rate_in_effect_when_created(self):
+        old = self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        new = self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        self.change_rate(self.paper, '20.00')
+        WasteCategoryRate.objects.filter(version=2).update(effective_from=new.created_at)
+        PickupRequest.objects.update(rate_per_kg=None, price=None)
+
+        versions = [get_version(scope) for scope in (PICKUPS_SCOPE, user_scope(self.customer.pk))]
+        out = StringIO()
+        call_command('backfill_pickup_prices', '--batch-size', '1', stdout=out)
+        self.assertIn('Priced 2 pickups', out.getvalue())
+        prices = dict(PickupRequest.objects.values_list('id', 'price'))
+        self.assertEqual(prices, {old.pk: Decimal('30.00'), new.pk: Decimal('40.00')})
+        # Cached earnings and stats ETags from before the backfill are invalidated.
+        self.assertEqual(
+            [get_version(scope) > v for scope, v in zip((PICKUPS_SCOPE, user_scope(self.customer.pk)), versions)],
+            [True, True],
+        )
+
+
+class DailyRollupTests(PickupFixtureMixin, TestCase):
+    def test_metrics_follow_status_transitions(self):
+        pickup = self.make_pickup()
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        pickup.status = 'completed'
+        pickup.actual_weight_kg = Decimal('3.00')
+        pickup.save()
+
+        metrics = compute_admin_metrics()
+        self.assertEqual(metrics['user_stats'], {
+            'total': 3, 'customers': 1, 'collectors': 1, 'admins': 1,
+        })
+        self.assertEqual(metrics['pickup_stats']['total'], 2)
+        self.assertEqual(metrics['pickup_stats']['pending'], 0)
+        self.assertEqual(metrics['pickup_stats']['completed'], 2)
+        self.assertEqual(metrics['pickup_stats']['this_month'], 2)
+        self.assertEqual(metrics['total_transactions'], Decimal('5.00'))
+        self.assertEqual(metrics['category_stats'][0]['value'], Decimal('75.00'))
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        self.make_pickup().delete()
+        self.make_pickup(status='cancelled')
+        expected = compute_admin_metrics()
+
+        DailyPickupRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=StringIO())
+
+        self.assertEqual(compute_admin_metrics(), expected)
+
+    def test_category_value_is_stored_not_repriced(self):
+        pickup = self.make_pickup()
+        PickupRequest.objects.claim(pickup.id, self.collector)
+        pickup.refresh_from_db()
+        complete_pickup(pickup, Decimal('2.00'))
+        self.paper.rate_per_kg = Decimal('50.00')
+        self.paper.save()
+
+        value = compute_admin_metrics()['category_stats'][0]['value']
+        self.assertEqual(value, Decimal('30.00'))  # 2 kg at the 15.00 locked in, not today's 50.00
+        DailyPickupRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=StringIO())
+        self.assertEqual(compute_admin_metrics()['category_stats'][0]['value'], value)
+
+
+# A bare "SCAN <table>" (no USING INDEX) is SQLite reading every row.
+FULL_SCAN = re.compile(r'\bSCAN (core_pickuprequest|core_user|core_transaction)\b(?! USING)')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(PickupFixtureMixin, TestCase):
+    """Every query a dashboard runs must reach hot tables through an index."""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.make_pickup(pickup_date=today)
+        self.make_pickup(collector=self.collector, status='assigned', pickup_date=today)
+        self.make_pickup(collector=self.collector, status='completed', actual_weight_kg=Decimal('3.00'))
+
+    def assertNoFullScans(self, url, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                self.assertNotRegex(plan, FULL_SCAN, msg=f'{sql}\n{plan}')
+
+    def test_customer_dashboard(self):
+        self.assertNoFullScans(reverse('customer_dashboard'), self.customer)
+
+    def test_pickup_history(self):
+        self.assertNoFullScans(reverse('pickup_history'), self.customer)
+
+    def test_collector_dashboard(self):
+        self.assertNoFullScans(reverse('collector_dashboard'), self.collector)
+
+    def test_admin_dashboard(self):
+        self.assertNoFullScans(reverse('admin_dashboard'), self.admin)
+
+
+class PickupClaimTests(PickupFixtureMixin, TestCase):
+    def test_second_claim_loses(self):
+        other = User.objects.create_user('gita', password='pass12345', role='collector')
+        pickup = self.make_pickup()
+
+        self.assertTrue(PickupRequest.objects.claim(pickup.id, self.collector))
+        self.assertFalse(PickupRequest.objects.claim(pickup.id, other))
+
+        pickup.refresh_from_db()
+        self.assertEqual((pickup.collector, pickup.status), (self.collector, 'assigned'))
+        self.assertEqual(compute_admin_metrics()['pickup_stats']['pending'], 0)
+
+    def test_claim_next_takes_earliest(self):
+        late = self.make_pickup(pickup_date=date(2025, 3, 1))
+        early = self.make_pickup(pickup_date=date(2025, 1, 1))
+        self.make_pickup(pickup_date=date(2025, 2, 1), collector=self.collector, status='assigned')
+
+        self.assertEqual(PickupRequest.objects.claim_next(self.collector, 5), [early.id, late.id])
+
+
+class PickupClaimContentionTests(PickupFixtureMixin, TransactionTestCase):
+    """Many collectors hammering the same pickups: each must have exactly one winner."""
+    COLLECTORS = 8
+    PICKUPS = 25
+
+    def setUp(self):
+        self.setUpTestData()
+
+    RETRY_SECONDS = 30
+
+    def claim_with_retry(self, pickup_id, collector):
+        # SQLite reports a busy writer as OperationalError; a real client retries. A deadline
+        # rather than a retry count keeps this independent of how loaded the machine is.
+        deadline = clock.monotonic() + self.RETRY_SECONDS
+        while True:
+            try:
+                return PickupRequest.objects.claim(pickup_id, collector)
+            except OperationalError:
+                if clock.monotonic() > deadline:
+                    raise AssertionError('claim never got the write lock')
+                clock.sleep(random.uniform(0.005, 0.02))
+
+    def test_exactly_one_winner_per_pickup(self):
+        pickup_ids = [self.make_pickup().id for _ in range(self.PICKUPS)]
+        collectors = [
+            User.objects.create(username=f'collector{i}', role='collector')
+            for i in range(self.COLLECTORS)
+        ]
+        winners = defaultdict(list)
+        errors = []
+        barrier = threading.Barrier(len(collectors))
+
+        def worker(collector):
+            order = pickup_ids[:]
+            random.shuffle(order)
+            try:
+                barrier.wait()
+                for pickup_id in order:
+                    if self.claim_with_retry(pickup_id, collector):
+                        winners[pickup_id].append(collector.id)
+            except Exception as exc:  # surfaced on the main thread below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(c,)) for c in collectors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(winners), sorted(pickup_ids))
+        owners = dict(PickupRequest.objects.values_list('id', 'collector_id'))
+        for pickup_id, claimed_by in winners.items():
+            self.assertEqual(len(claimed_by), 1, f'pickup {pickup_id} won by {claimed_by}')
+            self.assertEqual(owners[pickup_id], claimed_by[0])
+
+
+class QueryCountTests(PickupFixtureMixin, TestCase):
+    """Each list page issues a fixed number of queries however much history exists."""
+
+    def setUp(self):
+        cache.clear()
+
+    def add_history(self):
+        for status in ('pending', 'assigned', 'completed', 'cancelled'):
+            collector = None if status == 'pending' else self.collector
+            weight = Decimal('2.00') if status == 'completed' else None
+            pickup = self.make_pickup(status=status, collector=collector, actual_weight_kg=weight)
+            if weight:
+                txn = Transaction.objects.create(pickup_request=pickup, amount=pickup.actual_price())
+                PaymentEvent.objects.create(transaction=txn, gateway='esewa', event='success',
+                                            outcome='applied')
+
+    def assertViewQueries(self, num, url, user):
+        self.client.force_login(user)
+        for _ in range(2):
+            self.add_history()
+            cache.clear()
+            with self.assertNumQueries(num):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_customer_dashboard(self):
+        self.assertViewQueries(5, reverse('customer_dashboard'), self.customer)
+
+    def test_pickup_history(self):
+        self.assertViewQueries(4, reverse('pickup_history'), self.customer)
+
+    def test_collector_dashboard(self):
+        self.assertViewQueries(6, reverse('collector_dashboard'), self.collector)
+
+    def test_admin_dashboard(self):
+        self.assertViewQueries(9, reverse('admin_dashboard'), self.admin)
+
+    def test_admin_changelists(self):
+        superuser = User.objects.create_superuser('root', password='pass12345', role='admin')
+        for model, num in ((PickupRequest, 8), (Transaction, 7), (RecyclingImpact, 5), (PaymentEvent, 7)):
+            with self.subTest(model=model.__name__):
+                opts = model._meta
+                url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+                self.assertViewQueries(num, url, superuser)
+
+
+class SnapshotAuthTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.customer)
+
+    def test_warm_request_skips_session_and_user_queries(self):
+        url = reverse('customer_dashboard')
+        self.client.get(url)
+        # QueryCountTests sees 5 with a cold cache; warm, only the page's own 3 remain.
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_save_drops_snapshot(self):
+        self.client.get(reverse('customer_dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.customer.pk).save()
+        self.assertIsNone(cache.get(snapshot_key(self.customer.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.role = 'collector'
+            self.customer.save()
+        self.assertEqual(self.client.get(reverse('customer_dashboard')).status_code, 403)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse('customer_dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.set_password('new-pass-6789')
+            self.customer.save()
+        response = self.client.get(reverse('customer_dashboard'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('customer_dashboard')}",
+                             fetch_redirect_response=False)
+
+    def test_dashboard_renders_role_view_in_place(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'core/dashboard_customer.html')
+
+    def test_role_required(self):
+        self.assertEqual(self.client.get(reverse('collector_dashboard')).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('collector_dashboard')).status_code, 302)
+
+
+class FragmentCacheTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.make_pickup()
+
+    def test_warm_dashboard_skips_table_queries(self):
+        url = reverse('admin_dashboard')
+        self.client.get(url)
+        # QueryCountTests sees 9 with a cold cache; the three tables were three of them.
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), 'Paper')
+
+    def test_writes_retire_fragments(self):
+        url = reverse('admin_dashboard')
+        self.client.get(url)
+        for scope, write in (
+            (PICKUPS_SCOPE, lambda: self.make_pickup(status='cancelled')),
+            (USERS_SCOPE, lambda: User.objects.create_user('gita', role='customer')),
+            (CATEGORIES_SCOPE, lambda: WasteCategory.objects.create(name='Glass', rate_per_kg=Decimal('4.00'))),
+        ):
+            before = get_version(scope)
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertGreater(get_version(scope), before)
+        response = self.client.get(url)
+        self.assertContains(response, 'Cancelled')
+        self.assertContains(response, 'gita')
+        self.assertContains(response, 'Glass')
+
+    def test_login_does_not_retire_user_fragments(self):
+        before = get_version(USERS_SCOPE)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.login(username='ram', password='pass12345'))
+        self.assertEqual(get_version(USERS_SCOPE), before)
+
+    def test_bulk_paths_bump_pickup_version(self):
+        pickup = self.make_pickup()
+        before = get_version(PICKUPS_SCOPE)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(PickupRequest.objects.claim(pickup.pk, self.collector))
+        self.assertGreater(get_version(PICKUPS_SCOPE), before)
+
+
+@override_settings(PAGE_CACHE_SECONDS=60, PAGE_CACHE_STALE_SECONDS=600)
+class AnonymousPageCacheTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        REGISTRY.reset()
+
+    def test_home_hits_database_once_per_interval(self):
+        url = reverse('home')
+        self.assertContains(self.client.get(url), 'Paper')
+        for _ in range(5):
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), 'Paper')
+        self.assertIn('kawadiwala_page_cache_total{page="home",result="fresh"} 5', REGISTRY.render())
+
+    def test_stale_page_served_while_one_request_revalidates(self):
+        url = reverse('home')
+        self.client.get(url)
+        WasteCategory.objects.create(name='Glass', rate_per_kg=Decimal('4.00'))
+        later = clock.time() + 61
+        with patch('core.pagecache.time.time', return_value=later):
+            # Another worker holds the rebuild lock: everyone else gets the stale copy.
+            cache.add('core:page:home:lock', 1)
+            with self.assertNumQueries(0):
+                self.assertNotContains(self.client.get(url), 'Glass')
+            cache.delete('core:page:home:lock')
+            self.assertContains(self.client.get(url), 'Glass')
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), 'Glass')
+        self.assertIsNone(cache.get('core:page:home:lock'))
+
+    def test_signed_in_users_bypass_the_cache(self):
+        url = reverse('home')
+        self.client.get(url)
+        self.client.force_login(self.customer)
+        self.assertContains(self.client.get(url), reverse('dashboard'))
+        self.assertNotIn('result="fresh"', REGISTRY.render())
+
+
+class SqliteTuningTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+    def test_new_connections_get_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        default = connections['default']
+        other = type(default)({**default.settings_dict, 'NAME': os.path.join(directory, 'tuned.sqlite3')})
+        other.ensure_connection()
+        self.addCleanup(other.close)
+        raw = other.connection
+        self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(raw.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        self.assertEqual(raw.execute('PRAGMA busy_timeout').fetchone()[0], 20000)
+
+
+class WriteCoalescingTests(PickupFixtureMixin, TestCase):
+    def test_coalescer_sums_per_key_and_keeps_failed_batches(self):
+        batches = []
+        coalescer = WriteCoalescer(batches.append)
+        coalescer._thread = object()  # flush by hand only
+        coalescer.add('a', 1)
+        coalescer.add('b', 2)
+        coalescer.add('a', 3)
+        self.assertEqual(coalescer.flush(), 2)
+        self.assertEqual(batches, [{'a': 4, 'b': 2}])
+        self.assertEqual(coalescer.flush(), 0)
+
+        def fail(batch):
+            raise OperationalError('database is locked')
+        coalescer.flush_batch = fail
+        coalescer.add('a', 1)
+        with self.assertRaises(OperationalError):
+            coalescer.flush()
+        coalescer.flush_batch = batches.append
+        coalescer.add('a', 1)
+        coalescer.flush()
+        self.assertEqual(batches[-1], {'a': 2})
+
+    @override_settings(IMPACT_WRITE_COALESCING=True)
+    def test_impact_deltas_wait_for_flush(self):
+        impact = RecyclingImpact.objects.create(user=self.customer)
+        with patch.object(impact_writes, '_thread', object()):
+            for weight in ('2.00', '3.00'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.make_pickup(status='completed', actual_weight_kg=Decimal(weight))
+            impact.refresh_from_db()
+            self.assertEqual(impact.total_weight_recycled, Decimal('0.00'))
+
+            version = get_version(user_scope(self.customer.pk))
+            with self.assertNumQueries(3):  # one UPDATE for both pickups, in one transaction
+                self.assertEqual(impact_writes.flush(), 1)
+        impact.refresh_from_db()
+        self.assertEqual(impact.total_weight_recycled, Decimal('5.00'))
+        self.assertGreater(get_version(user_scope(self.customer.pk)), version)  # stats ETags move on
+
+    @override_settings(IMPACT_WRITE_COALESCING=True)
+    def test_rolled_back_pickups_queue_nothing(self):
+        with patch.object(impact_writes, '_thread', object()):
+            with self.captureOnCommitCallbacks(execute=False):
+                self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+            self.assertEqual(len(impact_writes), 0)
+
+
+class KeysetPaginationTests(PickupFixtureMixin, TestCase):
+    ordering = ('-created_at', '-id')
+
+    def setUp(self):
+        self.pickups = [self.make_pickup() for _ in range(25)]
+        self.queryset = PickupRequest.objects.filter(customer=self.customer)
+
+    def test_walks_forward_and_back(self):
+        expected = list(self.queryset.order_by(*self.ordering))
+        seen, cursor = [], None
+        while True:
+            page = paginate_keyset(self.queryset, self.ordering, cursor, per_page=10)
+            seen.extend(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(page), 5)
+
+        back = paginate_keyset(self.queryset, self.ordering, page.previous_cursor, per_page=10)
+        self.assertEqual(list(back), expected[10:20])
+        first = paginate_keyset(self.queryset, self.ordering, back.previous_cursor, per_page=10)
+        self.assertEqual(list(first), expected[:10])
+        self.assertFalse(first.has_previous)
+
+    def test_deep_pages_cost_one_query(self):
+        page = paginate_keyset(self.queryset, self.ordering, per_page=5)
+        while page.has_next:
+            with self.assertNumQueries(1):
+                page = paginate_keyset(self.queryset, self.ordering, page.next_cursor, per_page=5)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = paginate_keyset(self.queryset, self.ordering).next_cursor
+        with self.assertRaises(InvalidCursor):
+            paginate_keyset(self.queryset, self.ordering, cursor[:-2] + 'xx')
+
+    def test_json_history(self):
+        self.client.force_login(self.customer)
+        url = reverse('pickup_history_api')
+        body = self.client.get(url).json()
+        self.assertEqual(len(body['results']), 10)
+        self.assertIsNone(body['previous'])
+
+        body = self.client.get(url, {'cursor': body['next']}).json()
+        self.assertEqual(body['results'][0]['id'], self.pickups[14].id)
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, 400)
+
+    def test_html_history_ignores_bad_cursor(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('pickup_history'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['pickups']), 10)
+
+
+class PickupIngestTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def row(self, **kwargs):
+        row = {
+            'customer': self.customer.pk,
+            'waste_category': self.paper.pk,
+            'estimated_weight_kg': '4.50',
+            'pickup_date': '2025-02-01',
+            'pickup_time': '09:30',
+            'address': 'Patan, Lalitpur',
+        }
+        row.update(kwargs)
+        return row
+
+    def test_batches_and_reports_row_errors(self):
+        rows = [self.row() for _ in range(7)] + [
+            self.row(waste_category=9999),
+            self.row(estimated_weight_kg='0'),
+            self.row(customer=self.collector.pk),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ingest_pickups(rows, batch_size=3)
+
+        self.assertEqual(result.created, 7)
+        self.assertEqual([e['row'] for e in result.errors], [8, 9, 10])
+        self.assertIn('waste_category', result.errors[0]['errors'])
+        self.assertIn('estimated_weight_kg', result.errors[1]['errors'])
+        self.assertIn('customer', result.errors[2]['errors'])
+        self.assertEqual(PickupRequest.objects.filter(customer=self.customer).count(), 7)
+        rollup = DailyPickupRollup.objects.get(status='pending', waste_category=self.paper)
+        self.assertEqual(rollup.pickup_count, 7)
+
+    def test_ndjson_endpoint_books_rows_for_customer(self):
+        self.client.force_login(self.customer)
+        body = '\n'.join(json.dumps(self.row(customer=self.collector.pk)) for _ in range(3))
+        body += '\n{not json}\n'
+        response = self.client.post(
+            reverse('ingest_pickups_api'), body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(response.json()['errors'][0]['row'], 4)
+        self.assertEqual(PickupRequest.objects.filter(customer=self.customer).count(), 3)
+
+    def test_collectors_cannot_ingest(self):
+        self.client.force_login(self.collector)
+        response = self.client.post(reverse('ingest_pickups_api'), [], content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_command(self):
+        path = self.tmp_path('pickups.ndjson')
+        with open(path, 'w') as handle:
+            for _ in range(5):
+                handle.write(json.dumps(self.row()) + '\n')
+        out = StringIO()
+        call_command('import_pickups', path, '--customer', 'ram', stdout=out)
+        self.assertIn('Created 5 pickups', out.getvalue())
+        self.assertEqual(PickupRequest.objects.count(), 5)
+
+    def tmp_path(self, name):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return os.path.join(directory, name)
+
+
+class ExportTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        for status in ('pending', 'completed', 'completed'):
+            weight = Decimal('2.00') if status == 'completed' else None
+            pickup = self.make_pickup(status=status, collector=self.collector, actual_weight_kg=weight)
+            if weight:
+                Transaction.objects.create(pickup_request=pickup, amount=pickup.actual_price())
+        self.client.force_login(self.admin)
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_pickup_csv_joins_transaction(self):
+        with self.assertNumQueries(1):  # the export; session and user come from the cache
+            lines = self.download('export_pickups', status='completed').splitlines()
+        header = lines[0].split(',')
+        self.assertEqual(header[0], 'pickup_id')
+        self.assertEqual(len(lines), 3)
+        row = dict(zip(header, lines[1].split(',')))
+        self.assertEqual((row['collector'], row['amount']), ('hari', '30.00'))
+
+    def test_transaction_ndjson_filters(self):
+        body = self.download('export_transactions', format='ndjson', collector='hari')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['waste_category'], 'Paper')
+
+        today = timezone.localdate()
+        body = self.download('export_transactions', end=str(today - timedelta(days=1)))
+        self.assertEqual(len(body.splitlines()), 1)
+
+    def test_invalid_filters_and_roles(self):
+        response = self.client.get(reverse('export_pickups'), {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('export_pickups')).status_code, 403)
+
+    def test_export_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'pickups.csv')
+        out = StringIO()
+        call_command('export_pickups', path, '--status', 'completed', stdout=out)
+        self.assertIn('Wrote 2 pickups', out.getvalue())
+        with open(path) as handle:
+            self.assertEqual(len(handle.read().splitlines()), 3)
+
+
+class AnalyticsSnapshotTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        snapshot_dir = override_settings(ANALYTICS_SNAPSHOT_DIR=directory, ANALYTICS_SNAPSHOTS_KEPT=1)
+        snapshot_dir.enable()
+        self.addCleanup(snapshot_dir.disable)
+        self.directory = directory
+
+    def test_numpy_reports_match_the_orm(self):
+        generate(customers=10, collectors=3, pickups=400, seed=1)
+        snapshot = build_snapshot(chunk_size=64)
+        self.assertEqual(len(snapshot), 400)
+        for name, report in REPORTS.items():
+            with self.subTest(report=name):
+                expected = ORM_REPORTS[name](timezone.localdate(), 26)
+                self.assertEqual(report(snapshot, 26), expected)
+                self.assertTrue(any(expected.values()))
+
+    def test_snapshot_is_columnar_and_replaced_whole(self):
+        self.make_pickup(status='completed', collector=self.collector, actual_weight_kg=Decimal('2.00'))
+        first = build_snapshot()
+        self.assertIsInstance(first['status'], np.memmap)
+        self.assertEqual(first['status'].dtype, np.uint8)
+        self.assertEqual(first.meta['status'][first['status'][0]], 'completed')
+        self.assertEqual(first.meta['collector'][first['collector'][0]], 'hari')
+
+        self.make_pickup(status='cancelled')
+        second = build_snapshot()
+        self.assertEqual(current_snapshot().path, second.path)
+        self.assertEqual(len(current_snapshot()), 2)
+        self.assertFalse(first.path.exists())  # ANALYTICS_SNAPSHOTS_KEPT=1
+
+    def test_report_api(self):
+        url = reverse('analytics_report', args=['cancellation_rates'])
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 503)
+
+        self.make_pickup(status='cancelled')
+        self.make_pickup()
+        build_snapshot()
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'weeks': 4})
+        data = response.json()['data']
+        self.assertEqual(data['categories'], [{'key': 'Paper', 'total': 2, 'cancelled': 1, 'rate': 0.5}])
+        self.assertEqual(len(data['weeks']), 1)
+
+        self.assertEqual(self.client.get(url, {'weeks': 'many'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('analytics_report', args=['nope'])).status_code, 404)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class GeoIndexTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()  # auth snapshots and stats from earlier tests hold other locations
+        reset_open_pickup_index()
+        self.addCleanup(reset_open_pickup_index)
+
+    def test_grid_matches_brute_force(self):
+        rng = random.Random(7)
+        points = {i: (rng.uniform(27.6, 27.8), rng.uniform(85.2, 85.45)) for i in range(2000)}
+        index = GridIndex()
+        for item_id, (lat, lng) in points.items():
+            index.add(item_id, lat, lng)
+        index.discard(0)
+        del points[0]
+
+        for _ in range(20):
+            lat, lng = rng.uniform(27.6, 27.8), rng.uniform(85.2, 85.45)
+            expected = sorted(
+                (haversine_km(lat, lng, *point), item_id) for item_id, point in points.items()
+            )
+            expected = [pair for pair in expected if pair[0] <= 3][:15]
+            self.assertEqual(index.nearest(lat, lng, 15, radius_km=3), expected)
+
+    def test_nearest_open_pickups_follow_claims(self):
+        near = self.make_pickup(latitude=27.7000, longitude=85.3000)
+        far = self.make_pickup(latitude=27.7500, longitude=85.3500)
+        self.make_pickup(latitude=27.7001, longitude=85.3001, status='cancelled')
+        self.make_pickup()  # no coordinates
+
+        pickups = nearest_open_pickups(27.7, 85.3, limit=5)
+        self.assertEqual([p.id for p in pickups], [near.id, far.id])
+        self.assertEqual(pickups[0].distance_km, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PickupRequest.objects.claim(near.id, self.collector)
+        self.assertEqual([p.id for p in nearest_open_pickups(27.7, 85.3, limit=5)], [far.id])
+        self.assertEqual(nearest_open_pickups(27.7, 85.3, limit=5, radius_km=1), [])
+
+    def test_dashboard_and_api_sort_by_distance(self):
+        far = self.make_pickup(latitude=27.7500, longitude=85.3500, pickup_date=date(2025, 1, 1))
+        near = self.make_pickup(latitude=27.7010, longitude=85.3010, pickup_date=date(2025, 3, 1))
+        self.set_location(self.collector, 27.7, 85.3)
+        self.client.force_login(self.collector)
+
+        response = self.client.get(reverse('collector_dashboard'))
+        self.assertEqual([p.id for p in response.context['available_pickups']], [near.id, far.id])
+
+        body = self.client.get(reverse('nearby_pickups_api'), {'limit': 1}).json()
+        self.assertEqual([row['id'] for row in body['results']], [near.id])
+        self.assertEqual(
+            self.client.get(reverse('nearby_pickups_api'), {'lat': 'x'}).status_code, 400
+        )
+
+    def test_dashboard_lists_unlocated_pickups_after_nearby_ones(self):
+        near = self.make_pickup(latitude=27.7010, longitude=85.3010)
+        unlocated = self.make_pickup()
+        self.set_location(self.collector, 27.7, 85.3)
+        self.client.force_login(self.collector)
+
+        response = self.client.get(reverse('collector_dashboard'))
+        self.assertEqual([p.id for p in response.context['available_pickups']], [near.id, unlocated.id])
+        self.assertEqual(self.client.get(reverse('collector_stats_api')).json()['available_count'], 2)
+
+    def test_forms_accept_coordinates(self):
+        form = CustomUserCreationForm({
+            'username': 'gita', 'email': 'gita@example.com', 'role': 'collector',
+            'password1': 'S3cure-pass-word', 'password2': 'S3cure-pass-word',
+            'latitude': '27.7', 'longitude': '85.3',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual((form.save().latitude, form.instance.longitude), (27.7, 85.3))
+
+        form = PickupRequestForm({
+            'waste_category': self.paper.pk, 'estimated_weight_kg': '3', 'pickup_date': '2025-03-01',
+            'pickup_time': '09:00', 'address': 'Baneshwor', 'latitude': '95', 'longitude': '85.3',
+        })
+        self.assertIn('latitude', form.errors)
+
+    def test_api_rejects_out_of_range_inputs(self):
+        self.make_pickup(latitude=27.7010, longitude=85.3010)
+        self.client.force_login(self.collector)
+        url = reverse('nearby_pickups_api')
+        for params in (
+            {'lat': 27.7, 'lng': 85.3, 'radius_km': 'inf'},
+            {'lat': 27.7, 'lng': 85.3, 'radius_km': 'nan'},
+            {'lat': 'nan', 'lng': 85.3},
+            {'lat': 91, 'lng': 85.3},
+            {'lat': 27.7, 'lng': -181},
+            {'lat': 27.7, 'lng': 85.3, 'radius_km': 0},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+        body = self.client.get(url, {'lat': 27.7, 'lng': 85.3, 'radius_km': 1e9}).json()
+        self.assertEqual(len(body['results']), 1)
+
+    def test_nearest_caps_the_radius(self):
+        index = GridIndex()
+        index.add(1, 27.7, 85.3)
+        index.add(2, 27.7 + (MAX_RADIUS_KM + 5) / KM_PER_DEGREE, 85.3)
+        self.assertEqual([item for _, item in index.nearest(27.7, 85.3, 5, radius_km=1e6)], [1])
+
+
+class RoutePlanTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_collinear_stops_are_visited_in_line(self):
+        lngs = [85.30 + 0.01 * k for k in range(8)]
+        order = [3, 7, 0, 5, 1, 6, 2, 4]
+        stops = [Stop(k, 27.7, lngs[k], time(9, 0)) for k in order]
+        plan = plan_route(stops, origin=(27.7, 85.29))
+        self.assertEqual(plan.order, list(range(8)))
+        self.assertAlmostEqual(plan.distance_km, sum(plan.legs_km), places=1)
+
+    def test_time_slots_come_first(self):
+        stops = [
+            Stop(1, 27.70, 85.30, time(14, 0)),
+            Stop(2, 27.75, 85.35, time(9, 0)),
+            Stop(3, 27.70, 85.31, time(9, 0)),
+            Stop(4, None, None, time(11, 0)),
+        ]
+        plan = plan_route(stops, origin=(27.70, 85.30))
+        self.assertEqual(plan.order, [3, 2, 1])
+        self.assertEqual(plan.unrouted, [4])
+
+    def test_two_hundred_stops_plan_quickly(self):
+        rng = random.Random(3)
+        stops = [
+            Stop(k, rng.uniform(27.6, 27.8), rng.uniform(85.2, 85.45), time(9 + k % 4, 0))
+            for k in range(200)
+        ]
+        started = clock.perf_counter()
+        plan = plan_route(stops, origin=(27.7, 85.3))
+        self.assertLess(clock.perf_counter() - started, 1.0)
+        self.assertEqual(sorted(plan.order), list(range(200)))
+
+        # 2-opt never does worse than the greedy tour it starts from.
+        slots = [[s for s in stops if s.pickup_time == time(h, 0)] for h in range(9, 13)]
+        points = [(27.7, 85.3)] + [(s.latitude, s.longitude) for slot in slots for s in slot]
+        dist = distance_matrix(*zip(*points))
+        greedy, current, node = 0.0, 0, 1
+        for slot in slots:
+            nodes = list(range(node, node + len(slot)))
+            node += len(slot)
+            for nxt in nearest_neighbour(dist, current, nodes):
+                greedy += dist[current, nxt]
+                current = nxt
+        self.assertLessEqual(plan.distance_km, round(greedy, 2))
+
+    def test_dashboard_lists_todays_route_and_caches_it(self):
+        today = timezone.localdate()
+        far = self.make_pickup(collector=self.collector, status='assigned', pickup_date=today,
+                               latitude=27.75, longitude=85.35)
+        near = self.make_pickup(collector=self.collector, status='assigned', pickup_date=today,
+                                latitude=27.701, longitude=85.301)
+        self.set_location(self.collector, 27.7, 85.3)
+        self.client.force_login(self.collector)
+
+        response = self.client.get(reverse('collector_dashboard'))
+        self.assertEqual([p.id for p in response.context['today_pickups']], [near.id, far.id])
+        with patch('core.routes.plan_route') as plan_route_mock:
+            self.client.get(reverse('collector_dashboard'))
+        plan_route_mock.assert_not_called()
+
+
+class DispatchTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        self.set_location(self.collector, 27.70, 85.30)
+        self.east = User.objects.create(username='gita', role='collector', latitude=27.70, longitude=85.40)
+
+    def test_dry_run_plans_without_assigning(self):
+        self.make_pickup(latitude=27.70, longitude=85.31)
+        report = dispatch(dry_run=True).as_dict()
+        self.assertEqual((report['planned'], report['assigned']), (1, 0))
+        self.assertEqual(PickupRequest.objects.unclaimed().count(), 1)
+
+    def test_assigns_nearest_collector_within_capacity(self):
+        west = [self.make_pickup(latitude=27.70, longitude=85.30 + k / 1000) for k in range(3)]
+        east = self.make_pickup(latitude=27.70, longitude=85.39)
+        self.make_pickup(latitude=28.50, longitude=85.30)  # beyond max_km
+        self.make_pickup()  # no coordinates
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = dispatch(capacity=2, max_km=15).as_dict()
+
+        self.assertEqual(report['assigned'], 4)
+        self.assertEqual(report['skipped'], {'no_location': 1, 'unmatched': 1})
+        self.assertEqual(
+            list(PickupRequest.objects.filter(id__in=[p.id for p in west[:2]])
+                 .values_list('collector', flat=True)),
+            [self.collector.pk] * 2,
+        )
+        # hari is full, so the third western pickup goes to the next collector.
+        west[2].refresh_from_db()
+        self.assertEqual(west[2].collector, self.east)
+        east.refresh_from_db()
+        self.assertEqual((east.collector, east.status), (self.east, 'assigned'))
+
+    def test_hand_claimed_pickups_are_conflicts(self):
+        pickup = self.make_pickup(latitude=27.70, longitude=85.31)
+        plan = [(pickup.id, self.east.pk, 9.0)]
+        PickupRequest.objects.claim(pickup.id, self.collector)
+        with patch('core.dispatch.plan_assignments', return_value=(plan, [])):
+            report = dispatch().as_dict()
+        self.assertEqual((report['assigned'], report['conflicts']), (0, 1))
+
+    def test_each_collector_is_applied_with_one_update(self):
+        pickups = [self.make_pickup(latitude=27.70, longitude=85.30 + k / 1000) for k in range(4)]
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            report = dispatch().as_dict()
+        self.assertEqual(report['assigned'], 4)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_pickuprequest"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            set(PickupRequest.objects.filter(id__in=[p.id for p in pickups]).values_list('collector', 'status')),
+            {(self.collector.pk, 'assigned')},
+        )
+        self.assertEqual(
+            DailyPickupRollup.objects.get(status='assigned').pickup_count, 4,
+        )
+
+    def test_zero_capacity_assigns_nothing(self):
+        self.make_pickup(latitude=27.70, longitude=85.31)
+        report = dispatch(capacity=0).as_dict()
+        self.assertEqual((report['collectors'], report['assigned']), (0, 0))
+
+    def test_command_reports_metrics(self):
+        self.make_pickup(latitude=27.70, longitude=85.31)
+        out = StringIO()
+        call_command('dispatch_pickups', '--dry-run', stdout=out)
+        self.assertIn('Would assign 1 of 1 pickups', out.getvalue())
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])['planned'], 1)
+
+
+class CompletionTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(self.collector)
+
+    def complete(self, rows):
+        return self.client.post(reverse('complete_pickups_api'), json.dumps({'pickups': rows}),
+                                content_type='application/json')
+
+    def test_complete_pickup_settles_everything(self):
+        pickup = self.make_pickup(collector=self.collector, status='assigned')
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_pickup(pickup, Decimal('4.00'))
+
+        pickup.refresh_from_db()
+        self.assertEqual(pickup.status, 'completed')
+        self.assertIsNotNone(pickup.completed_at)
+        self.assertEqual(RecyclingImpact.objects.get(user=self.customer).total_weight_recycled, Decimal('4.00'))
+        txn = Transaction.objects.get(pickup_request=pickup)
+        self.assertEqual((txn.amount, txn.is_paid), (Decimal('60.00'), True))
+
+    def test_complete_pickup_needs_weight(self):
+        pickup = self.make_pickup(collector=self.collector, status='assigned')
+        with self.assertRaises(CompletionError):
+            complete_pickup(pickup)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_update_pickup_form_completes_atomically(self):
+        pickup = self.make_pickup(collector=self.collector, status='assigned')
+        url = reverse('update_pickup', args=[pickup.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'status': 'completed', 'actual_weight_kg': '4.00'})
+        self.assertRedirects(response, reverse('collector_dashboard'), fetch_redirect_response=False)
+
+        pickup.refresh_from_db()
+        self.assertEqual((pickup.status, pickup.price), ('completed', Decimal('60.00')))
+        self.assertIsNotNone(pickup.completed_at)
+        self.assertTrue(Transaction.objects.get(pickup_request=pickup).is_paid)
+
+        form = CollectorUpdateForm({'status': 'completed', 'actual_weight_kg': ''}, instance=pickup)
+        self.assertIn('actual_weight_kg', form.errors)
+
+    def test_bulk_complete_matches_per_row_bookkeeping(self):
+        mine = [self.make_pickup(collector=self.collector, status='assigned') for _ in range(3)]
+        other = User.objects.create(username='gita', role='collector')
+        theirs = self.make_pickup(collector=other, status='assigned')
+        rows = [{'id': p.id, 'actual_weight_kg': '2.50'} for p in mine]
+        rows += [{'id': theirs.id, 'actual_weight_kg': '1.00'}, {'id': 999999, 'actual_weight_kg': '0'}]
+        scope = user_scope(self.customer.pk)
+        version = get_version(scope)
+
+        with patch('core.completion.publish_pickup_event') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(19):
+                    response = self.complete(rows)
+
+        body = response.json()
+        self.assertEqual(body['completed'], sorted(p.id for p in mine))
+        self.assertEqual(set(body['errors']), {str(theirs.id), '999999'})
+        self.assertEqual(publish.call_count, 3)
+        self.assertNotEqual(get_version(scope), version)
+        self.assertEqual(RecyclingImpact.objects.get(user=self.customer).total_weight_recycled, Decimal('7.50'))
+        self.assertEqual(Transaction.objects.filter(is_paid=True, amount=Decimal('37.50')).count(), 3)
+
+        metrics = compute_admin_metrics()
+        self.assertEqual(metrics['pickup_stats']['completed'], 3)
+        DailyPickupRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=StringIO())
+        self.assertEqual(compute_admin_metrics(), metrics)
+
+    def test_bulk_complete_rejects_bad_body(self):
+        self.assertEqual(self.complete([{'id': 1, 'actual_weight_kg': 'heavy'}]).status_code, 400)
+
+
+@override_settings(METRICS_TOKEN='scrape-me', METRICS_SERVER_TIMING=True)
+class MetricsTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        REGISTRY.reset()
+
+    def test_request_is_timed_and_counted(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('customer_dashboard'))
+
+        self.assertRegex(response['Server-Timing'], r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+        text = REGISTRY.render()
+        self.assertIn('kawadiwala_requests_total{method="GET",status="200",view="customer_dashboard"} 1', text)
+        self.assertIn('kawadiwala_request_duration_seconds_count{view="customer_dashboard"} 1', text)
+        self.assertIn('kawadiwala_template_render_seconds_count{view="customer_dashboard"} 1', text)
+        self.assertRegex(text, r'kawadiwala_db_queries_sum\{view="customer_dashboard"\} [1-9]')
+
+    def test_dashboards_have_no_n_plus_one(self):
+        today = timezone.localdate()
+        for _ in range(6):
+            self.make_pickup(pickup_date=today)
+            self.make_pickup(collector=self.collector, status='assigned', pickup_date=today)
+            self.make_pickup(collector=self.collector, status='completed', actual_weight_kg=Decimal('1.00'))
+        for user, name in [(self.customer, 'customer_dashboard'), (self.customer, 'pickup_history'),
+                           (self.collector, 'collector_dashboard'), (self.admin, 'admin_dashboard')]:
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+        self.assertEqual(list(REGISTRY.n_plus_one.samples()), [])
+
+    def test_async_stack_stays_async(self):
+        async def get_response(request):
+            return await sync_to_async(lambda: HttpResponse(str(User.objects.count())))()
+
+        # Connections opened after core.metrics loaded carry the wrapper already; this one may predate it.
+        if count_context_query not in connection.execute_wrappers:
+            wrap_new_connection(None, connection)
+            self.addCleanup(connection.execute_wrappers.remove, count_context_query)
+
+        middleware = MetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/nowhere/'))
+        self.assertEqual(response.content, b'3')
+        text = REGISTRY.render()
+        self.assertIn('kawadiwala_requests_total{method="GET",status="200",view="<unresolved>"} 1', text)
+        self.assertRegex(text, r'kawadiwala_db_queries_sum\{view="<unresolved>"\} 1')
+
+    def test_repeated_select_is_flagged(self):
+        for _ in range(5):
+            self.make_pickup()
+        stats = RequestStats(track_statements=True)
+        with connection.execute_wrapper(stats):
+            names = [pickup.customer.username for pickup in PickupRequest.objects.all()]
+        self.assertEqual(len(names), 5)
+        (sql, count), = stats.repeated(5)
+        self.assertIn('core_user', sql)
+        self.assertEqual((count, stats.queries), (5, 6))
+
+    def test_endpoint_needs_token_or_admin(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE kawadiwala_request_duration_seconds histogram', response.content.decode())
+
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_builds_consistent_data(self):
+        created = generate(customers=5, collectors=2, admins=1, pickups=300, seed=1, batch_size=120)
+
+        self.assertEqual(created, {'users': 8, 'pickups': 300})
+        statuses = set(PickupRequest.objects.values_list('status', flat=True))
+        self.assertLessEqual({'completed', 'pending'}, statuses)
+        self.assertFalse(PickupRequest.objects.filter(status='pending', collector__isnull=False).exists())
+        self.assertEqual(
+            Transaction.objects.count(), PickupRequest.objects.filter(status='completed').count()
+        )
+        self.assertFalse(PickupRequest.objects.filter(created_at__date__gt=F('pickup_date')).exists())
+
+        # Rollups and impact were rebuilt after the bulk inserts.
+        self.assertEqual(compute_admin_metrics()['pickup_stats']['total'], 300)
+        recycled = PickupRequest.objects.filter(status='completed').aggregate(total=Sum('actual_weight_kg'))
+        self.assertEqual(
+            RecyclingImpact.objects.aggregate(total=Sum('total_weight_recycled'))['total'], recycled['total']
+        )
+
+    def test_generate_continues_numbering(self):
+        generate(customers=2)
+        generate(customers=2, pickups=10)
+        self.assertEqual(User.objects.filter(username__startswith='syn-customer-').count(), 4)
+        self.assertTrue(User.objects.filter(username='syn-customer-3').exists())
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+
+    def test_run_and_compare(self):
+        views = ['waste_categories_api', 'customer_dashboard', 'admin_dashboard']
+        results = run_benchmarks([50], requests=2, warmup=1, views=views)
+
+        timings = results['scales']['50']
+        self.assertEqual(sorted(timings), sorted(views))
+        self.assertEqual({row['status'] for row in timings.values()}, {200})
+        self.assertEqual(PickupRequest.objects.count(), 50)
+        json.dumps(results)
+
+        slower = json.loads(json.dumps(results))
+        slower['scales']['50']['admin_dashboard']['queries'] += 1
+        self.assertEqual(compare(results, slower),
+                         [('50', 'admin_dashboard', 'queries', timings['admin_dashboard']['queries'],
+                           timings['admin_dashboard']['queries'] + 1)])
+        self.assertEqual(compare(slower, results), [])
+
+
+class PaymentFixtureMixin(PickupFixtureMixin):
+    def make_transaction(self):
+        pickup = self.make_pickup(status='completed', collector=self.collector,
+                                  actual_weight_kg=Decimal('2.00'))
+        return Transaction.objects.create(pickup_request=pickup, amount=pickup.actual_price(),
+                                          payment_method='digital', payment_gateway='esewa')
+
+
+class PaymentCallbackTests(PaymentFixtureMixin, TestCase):
+    def gateway(self):
+        """A mock gateway the callback views confirm against; set .statuses before posting."""
+        server = MockGatewayServer()
+        urls = self.settings(ESEWA_STATUS_URL=f'{server.url}/esewa/', KHALTI_LOOKUP_URL=f'{server.url}/khalti/')
+        urls.enable()
+        self.addCleanup(urls.disable)
+        self.addCleanup(server.__exit__)
+        return server.__enter__()
+
+    def test_retried_callback_applies_once(self):
+        txn = self.make_transaction()
+        self.gateway().statuses[str(txn.pk)] = {'status': 'COMPLETE', 'ref_id': 'REF-1'}
+        params = FakeGateway('esewa').callback(txn, reference='REF-1')
+        self.client.force_login(self.customer)
+
+        for _ in range(3):
+            response = self.client.post(reverse('payment_success'), params, follow=True)
+        successes = [m for m in response.context['messages'] if 'successful' in str(m)]
+        self.assertLessEqual(len(successes), 1)
+
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.payment_status, txn.gateway_transaction_id),
+                         (True, 'success', 'REF-1'))
+        outcomes = list(PaymentEvent.objects.order_by('id').values_list('outcome', flat=True))
+        self.assertEqual(outcomes, ['applied', 'duplicate', 'duplicate'])
+
+    def test_forged_callbacks_are_rejected(self):
+        txn = self.make_transaction()
+        server = self.gateway()
+        server.statuses[str(txn.pk)] = {'status': 'PENDING'}
+        forged = FakeGateway('esewa').callback(txn, reference='FORGED')  # right amount, no payment
+        self.client.post(reverse('payment_success'), forged)
+        self.client.post(reverse('payment_failure'), forged)
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.payment_status), (False, 'pending'))
+        self.assertFalse(PaymentEvent.objects.exists())
+        self.assertEqual(server.hits, 2)
+
+        # A paid transaction cannot be failed by a forged failure post either.
+        server.statuses[str(txn.pk)] = {'status': 'COMPLETE', 'ref_id': 'E-1'}
+        self.client.post(reverse('payment_failure'), forged)
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.gateway_transaction_id), (True, 'E-1'))
+
+    def test_unreachable_gateway_leaves_payment_pending(self):
+        txn = self.make_transaction()
+        server = self.gateway()
+        server.fail_first = 1
+        self.client.post(reverse('payment_success'), FakeGateway('esewa').callback(txn))
+        txn.refresh_from_db()
+        self.assertEqual(txn.payment_status, 'pending')
+        self.assertIn(txn, pending_transactions())
+
+    def test_khalti_callback_and_conflicting_reference(self):
+        first, second = self.make_transaction(), self.make_transaction()
+        gateway = FakeGateway('khalti')
+        event = process_callback(parse_callback(gateway.callback(first, reference='K-1')), {})
+        self.assertEqual(event.outcome, 'applied')
+
+        # The same gateway reference cannot settle a second transaction.
+        event = process_callback(parse_callback(gateway.callback(second, reference='K-1')), {})
+        self.assertEqual(event.outcome, 'rejected')
+        second.refresh_from_db()
+        self.assertFalse(second.is_paid)
+
+    def test_amount_mismatch_and_failure_callbacks(self):
+        txn = self.make_transaction()
+        params = FakeGateway('esewa').callback(txn, amount=Decimal('1.00'))
+        self.assertEqual(process_callback(parse_callback(params), params).outcome, 'rejected')
+
+        params = FakeGateway('esewa').callback(txn)
+        self.assertEqual(process_callback(parse_callback(params, 'failure'), params).outcome, 'applied')
+        self.assertEqual(process_callback(parse_callback(params, 'failure'), params).outcome, 'duplicate')
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.payment_status), (False, 'failed'))
+
+    def test_browser_returns_change_nothing(self):
+        txn = self.make_transaction()
+        self.client.force_login(self.customer)
+        self.client.get(reverse('payment_success'), {'oid': txn.pk, 'refId': 'FORGED'})
+        self.client.get(reverse('payment_success'), FakeGateway('esewa').callback(txn))
+        self.client.get(reverse('payment_failure'), {'oid': txn.pk, 'refId': 'X'})
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.payment_status), (False, 'pending'))
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_success_callback_requires_an_amount(self):
+        txn = self.make_transaction()
+        params = {'oid': str(txn.pk), 'refId': 'NO-AMT'}
+        event = process_callback(parse_callback(params), params)
+        self.assertEqual((event.outcome, event.detail), ('rejected', 'Missing amount.'))
+        txn.refresh_from_db()
+        self.assertFalse(txn.is_paid)
+
+    def test_fake_gateway_checkout(self):
+        txn = self.make_transaction()
+        self.client.force_login(self.customer)
+        with self.settings(PAYMENT_FAKE_GATEWAY=True):
+            response = self.client.post(reverse('fake_gateway', args=['esewa']), {'pid': txn.pk})
+            self.assertEqual(response.status_code, 302)
+            self.client.get(response['Location'])
+        txn.refresh_from_db()
+        self.assertTrue(txn.is_paid)
+
+        with self.settings(PAYMENT_FAKE_GATEWAY=False):
+            response = self.client.post(reverse('fake_gateway', args=['esewa']), {'pid': txn.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_fake_gateway_only_pays_your_own_transactions(self):
+        txn = self.make_transaction()
+        url = reverse('fake_gateway', args=['esewa'])
+        with self.settings(PAYMENT_FAKE_GATEWAY=True):
+            self.assertEqual(self.client.post(url, {'pid': txn.pk}).status_code, 302)  # to login
+            self.client.force_login(self.collector)
+            self.assertEqual(self.client.post(url, {'pid': txn.pk}).status_code, 404)
+        txn.refresh_from_db()
+        self.assertFalse(txn.is_paid)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+
+class PaymentCallbackConcurrencyTests(PaymentFixtureMixin, TransactionTestCase):
+    """Duplicate callbacks racing each other must settle the transaction exactly once."""
+    DELIVERIES = 8
+
+    def setUp(self):
+        self.setUpTestData()
+
+    def test_parallel_duplicates_apply_once(self):
+        txn = self.make_transaction()
+        params = FakeGateway('esewa').callback(txn, reference='RACE-1')
+        outcomes, errors = [], []
+        barrier = threading.Barrier(self.DELIVERIES)
+
+        def deliver():
+            try:
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        outcomes.append(process_callback(parse_callback(params), params).outcome)
+                        return
+                    except OperationalError:  # SQLite busy writer; the gateway would retry
+                        clock.sleep(0.01)
+                raise AssertionError('callback never got the write lock')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deliver) for _ in range(self.DELIVERIES)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(outcomes), ['applied'] + ['duplicate'] * (self.DELIVERIES - 1))
+        self.assertEqual(PaymentEvent.objects.filter(transaction=txn).count(), self.DELIVERIES)
+        txn.refresh_from_db()
+        self.assertEqual((txn.is_paid, txn.gateway_transaction_id), (True, 'RACE-1'))
+
+
+class MockGatewayServer:
+    """Local HTTP stand-in for the eSewa status and Khalti lookup APIs."""
+
+    def __init__(self, delay=0.0, fail_first=0):
+        self.statuses = {}  # transaction id or pidx -> gateway response body
+        self.delay = delay
+        self.fail_first = fail_first
+        self.hits = 0
+        self.clients = set()
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, key):
+                with server.lock:
+                    server.hits += 1
+                    server.clients.add(self.client_address)
+                    failing = server.hits <= server.fail_first
+                clock.sleep(server.delay)
+                status, body = (503, {}) if failing else (200, server.statuses.get(key, {'status': 'NOT_FOUND'}))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self.reply(parse_qs(urlparse(self.path).query)['transaction_uuid'][0])
+
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                self.reply(json.loads(self.rfile.read(length))['pidx'])
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class PaymentVerificationTests(PaymentFixtureMixin, TestCase):
+    def verify(self, server, **kwargs):
+        urls = {'ESEWA_STATUS_URL': f'{server.url}/esewa/', 'KHALTI_LOOKUP_URL': f'{server.url}/khalti/'}
+        with self.settings(**urls):
+            client = GatewayClient(kwargs.get('concurrency', 4), backoff=0)
+            try:
+                return verify_pending(client=client, **kwargs)
+            finally:
+                client.close()
+
+    def test_settles_completed_and_cancelled_payments(self):
+        paid, cancelled, waiting = (self.make_transaction() for _ in range(3))
+        khalti = self.make_transaction()
+        Transaction.objects.filter(pk=khalti.pk).update(payment_gateway='khalti',
+                                                        gateway_transaction_id='pidx-1')
+        with MockGatewayServer() as server:
+            server.statuses[str(paid.pk)] = {'status': 'COMPLETE', 'ref_id': 'E-1'}
+            server.statuses[str(cancelled.pk)] = {'status': 'CANCELED'}
+            server.statuses[str(waiting.pk)] = {'status': 'PENDING'}
+            server.statuses['pidx-1'] = {'status': 'Completed', 'transaction_id': 'K-9'}
+            totals = self.verify(server)
+
+        self.assertEqual(totals, {'success_applied': 2, 'failure_applied': 1, 'still_pending': 1})
+        states = dict(Transaction.objects.values_list('id', 'payment_status'))
+        self.assertEqual(
+            [states[t.pk] for t in (paid, cancelled, waiting, khalti)],
+            ['success', 'failed', 'pending', 'success'],
+        )
+        self.assertEqual(pending_transactions().count(), 1)
+
+    def test_retries_transient_errors(self):
+        txn = self.make_transaction()
+        with MockGatewayServer(fail_first=2) as server:
+            server.statuses[str(txn.pk)] = {'status': 'COMPLETE', 'ref_id': 'E-2'}
+            totals = self.verify(server)
+        self.assertEqual(totals, {'success_applied': 1})
+        self.assertEqual(server.hits, 3)
+
+    def test_lookups_run_concurrently_over_pooled_connections(self):
+        for _ in range(8):
+            self.make_transaction()
+        with MockGatewayServer(delay=0.2) as server:
+            started = clock.perf_counter()
+            totals = self.verify(server, concurrency=8)
+            elapsed = clock.perf_counter() - started
+        self.assertEqual(totals, {'still_pending': 8})
+        self.assertLess(elapsed, 1.0)  # 1.6 s one after another
+        self.assertLessEqual(len(server.clients), 8)
+
+    def test_command_reports_outcomes(self):
+        self.make_transaction()
+        out = StringIO()
+        with MockGatewayServer() as server, self.settings(ESEWA_STATUS_URL=server.url):
+            call_command('verify_payments', stdout=out)
+        self.assertIn('still_pending=1', out.getvalue())
+
+
+class StatsApiTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_poll_is_not_modified(self):
+        self.make_pickup(status='completed', actual_weight_kg=Decimal('2.00'))
+        self.client.force_login(self.customer)
+        url = reverse('customer_stats_api')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pickup_stats']['completed'], 1)
+        self.assertEqual(response.json()['total_earnings'], '30.00')
+        etag = response['ETag']
+
+        # Session and user come from the cache: no queries at all behind a 304.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pickup_change_invalidates_etag(self):
+        self.client.force_login(self.collector)
+        url = reverse('collector_stats_api')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup = self.make_pickup()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['available_count'], 1)
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PickupRequest.objects.claim(pickup.id, self.collector)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['available_count'], 0)
+        self.assertEqual(response.json()['assigned'], 1)
+
+    def test_admin_stats_etag_tracks_metrics(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin_stats_api')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['user_stats']['total'], 3)
+        with patch('core.views.compute_admin_metrics') as compute:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        compute.assert_not_called()  # a 304 comes from version counters alone
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_pickup()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['pickup_stats']['total'], 1)
+
+    def test_wrong_role_is_forbidden(self):
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('admin_stats_api')).status_code, 403)
+
+
+class PickupEventTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.broker = get_broker()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def receive(self, subscription):
+        return self.loop.run_until_complete(subscription.get(timeout=1))
+
+    def test_transitions_reach_customer_and_collectors(self):
+        customer_sub = self.broker.subscribe([user_channel(self.customer.pk)], loop=self.loop)
+        pool_sub = self.broker.subscribe([COLLECTORS_CHANNEL], loop=self.loop)
+        self.addCleanup(self.broker.unsubscribe, customer_sub)
+        self.addCleanup(self.broker.unsubscribe, pool_sub)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup = self.make_pickup()
+        self.assertEqual(self.receive(customer_sub)['event'], 'created')
+        self.assertEqual(self.receive(pool_sub)['pickup_id'], pickup.id)
+
+        collector_sub = self.broker.subscribe([user_channel(self.collector.pk)], loop=self.loop)
+        self.addCleanup(self.broker.unsubscribe, collector_sub)
+        with self.captureOnCommitCallbacks(execute=True):
+            PickupRequest.objects.claim(pickup.id, self.collector)
+        for subscription in (customer_sub, pool_sub, collector_sub):
+            message = self.receive(subscription)
+            self.assertEqual((message['status'], message['previous_status']), ('assigned', 'pending'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup.refresh_from_db()
+            pickup.status = 'cancelled'
+            pickup.save()
+        self.assertEqual(self.receive(collector_sub)['status'], 'cancelled')
+        self.assertIsNone(self.receive(pool_sub))
+
+    def test_stream_delivers_events(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('pickup_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        async def first_event():
+            chunks = aiter(response.streaming_content)
+            self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+            publish_pickup_event('created', 7, self.customer.pk, None, 'pending')
+            return await anext(chunks)
+
+        chunk = async_to_sync(first_event)()
+        self.assertTrue(chunk.startswith(b'event: pickup\ndata: '))
+        self.assertEqual(json.loads(chunk.split(b'data: ')[1])['pickup_id'], 7)
+
+
+class WasteCategoryApiTests(PickupFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_and_conditional(self):
+        url = '/api/waste-categories/'  # as fetched by main.js
+        response = self.client.get(url)
+        self.assertEqual(response.json()[0]['rate_per_kg'], '15.00')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(response['X-Rate-Table-Version'], str(rate_table_version()))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(since.status_code, 304)
+
+    def test_rate_change_invalidates(self):
+        url = '/api/waste-categories/'  # as fetched by main.js
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paper.rate_per_kg = Decimal('18.00')
+            self.paper.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['rate_per_kg'], '18.00')
+
+    def test_last_modified_is_shared_between_workers(self):
+        url = '/api/waste-categories/'  # as fetched by main.js
+        first = self.client.get(url)['Last-Modified']
+        catalog._catalog = None  # a second worker building its own copy
+        self.assertEqual(self.client.get(url)['Last-Modified'], first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paper.rate_per_kg = Decimal('18.00')
+            self.paper.save()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], first)
@@ -1,7 +1,24 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/collector/claim/', views.claim_pickups, name='claim_pickups'),
+    path('api/collector/complete/', views.complete_pickups_api, name='complete_pickups_api'),
+    path('api/stats/customer/', views.customer_stats_api, name='customer_stats_api'),
+    path('api/stats/collector/', views.collector_stats_api, name='collector_stats_api'),
+    path('api/stats/admin/', views.admin_stats_api, name='admin_stats_api'),
+    path('api/analytics/<str:report>/', views.analytics_report, name='analytics_report'),
+    path('events/pickups/', views.pickup_events, name='pickup_events'),
+    path('api/pickups/history/', views.pickup_history_api, name='pickup_history_api'),
+    path('api/collector/pickups/', views.collector_pickups_api, name='collector_pickups_api'),
+    path('api/collector/nearby/', views.nearby_pickups_api, name='nearby_pickups_api'),
+    path('api/pickups/ingest/', views.ingest_pickups_api, name='ingest_pickups_api'),
+    path('export/pickups/', views.export_pickups, name='export_pickups'),
+    path('export/transactions/', views.export_transactions, name='export_transactions'),
+    path('payment/fake/<str:gateway>/', views.fake_gateway, name='fake_gateway'),
+    path('metrics/', views.metrics, name='metrics'),
     path('', include('core.urls')),
 ]
@@ -0,0 +1,169 @@
+"""Background verification of pending digital payments.
+
+A transaction whose callback never arrived (closed tab, lost redirect) stays
+'pending' until this worker asks the gateway for its status. Callbacks that
+do arrive are unsigned form posts, so the callback views confirm them here
+too, with one lookup through confirm_transaction(), before anything settles.
+
+Pending rows are read from the database a batch at a time. Each batch's
+status lookups run on a thread pool, sharing one keep-alive requests.Session
+whose connection pool matches the concurrency limit. Transient failures
+(connection errors, timeouts, 429 and 5xx) are retried with exponential
+backoff. The threads only do network I/O. Results are applied on the calling
+thread through core.payments, so a verification and a late callback for the
+same payment still settle it exactly once.
+"""
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .models import Transaction
+from .payments import Callback, process_callback
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 100
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+ESEWA_PAID = {'COMPLETE'}
+ESEWA_FAILED = {'CANCELED', 'FULL_REFUND', 'PARTIAL_REFUND'}
+KHALTI_PAID = {'Completed'}
+KHALTI_FAILED = {'Expired', 'User canceled', 'Refunded'}
+
+
+class TransientGatewayError(Exception):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class GatewayClient:
+    """Pooled HTTP client for gateway status lookups."""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=None, max_attempts=None, backoff=None):
+        self.timeout = timeout or _setting('PAYMENT_VERIFY_TIMEOUT', 10)
+        self.max_attempts = max_attempts or _setting('PAYMENT_VERIFY_MAX_ATTEMPTS', 4)
+        self.backoff = backoff if backoff is not None else _setting('PAYMENT_VERIFY_BACKOFF', 0.5)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method, url, **kwargs):
+        for attempt in range(self.max_attempts):
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = TransientGatewayError(f'{url} answered {response.status_code}')
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = TransientGatewayError(str(exc))
+            if attempt + 1 < self.max_attempts:
+                # Exponential backoff with jitter so retries from many threads spread out.
+                time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        raise error
+
+    def esewa_status(self, txn):
+        body = self._request('GET', settings.ESEWA_STATUS_URL, params={
+            'product_code': settings.ESEWA_MERCHANT_ID,
+            'total_amount': str(txn.amount),
+            'transaction_uuid': str(txn.pk),
+        })
+        status = body.get('status')
+        if status in ESEWA_PAID:
+            return Callback('esewa', 'success', txn.pk, body.get('ref_id') or '', txn.amount), body
+        if status in ESEWA_FAILED:
+            return Callback('esewa', 'failure', txn.pk, body.get('ref_id') or '', None), body
+        return None, body
+
+    def khalti_status(self, txn):
+        if not txn.gateway_transaction_id:
+            return None, {'status': 'no pidx to look up'}
+        body = self._request(
+            'POST', settings.KHALTI_LOOKUP_URL,
+            json={'pidx': txn.gateway_transaction_id},
+            headers={'Authorization': f'Key {settings.KHALTI_SECRET_KEY}'},
+        )
+        status = body.get('status')
+        if status in KHALTI_PAID:
+            reference = body.get('transaction_id') or txn.gateway_transaction_id
+            return Callback('khalti', 'success', txn.pk, reference, txn.amount), body
+        if status in KHALTI_FAILED:
+            return Callback('khalti', 'failure', txn.pk, txn.gateway_transaction_id, None), body
+        return None, body
+
+    def status(self, txn):
+        """(Callback or None while still pending, raw gateway body)."""
+        lookup = getattr(self, f'{txn.payment_gateway}_status', None)
+        if lookup is None:
+            return None, {'status': f'unsupported gateway {txn.payment_gateway!r}'}
+        return lookup(txn)
+
+
+LOOKUP_ERRORS = (TransientGatewayError, requests.RequestException, ValueError)
+
+
+def confirm_transaction(txn):
+    """Ask the gateway about one transaction now: (Callback or None, raw body).
+
+    One attempt only, as a web request is waiting; whatever this cannot confirm
+    stays pending for verify_pending() to retry.
+    """
+    client = GatewayClient(concurrency=1, max_attempts=1)
+    try:
+        return client.status(txn)
+    except LOOKUP_ERRORS:
+        return None, {'status': 'unreachable'}
+    finally:
+        client.close()
+
+
+def pending_transactions():
+    return (
+        Transaction.objects
+        .filter(payment_status='pending', is_paid=False)
+        .exclude(payment_gateway='')
+        .order_by('id')
+    )
+
+
+def verify_pending(concurrency=None, batch_size=DEFAULT_BATCH_SIZE, client=None):
+    """Look up every pending transaction once; return a Counter of outcomes."""
+    concurrency = concurrency or _setting('PAYMENT_VERIFY_CONCURRENCY', DEFAULT_CONCURRENCY)
+    owns_client = client is None
+    client = client or GatewayClient(concurrency)
+    totals = Counter()
+    last_id = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                batch = list(pending_transactions().filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+                futures = [(txn, pool.submit(client.status, txn)) for txn in batch]
+                for txn, future in futures:
+                    try:
+                        callback, body = future.result()
+                    except LOOKUP_ERRORS:
+                        totals['unreachable'] += 1
+                        continue
+                    if callback is None:
+                        totals['still_pending'] += 1
+                        continue
+                    event = process_callback(callback, {'source': 'verification', **body})
+                    totals[f'{callback.event}_{event.outcome}'] += 1
+    finally:
+        if owns_client:
+            client.close()
+    return totals
@@ -0,0 +1,38 @@
+"""Monotonic change counters used to build ETags and cache keys.
+
+Counters live in the default cache. A missing counter (cold cache, eviction)
+restarts from the current time in milliseconds, which is always larger than
+any value handed out before, so an old ETag can never match again.
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'core:version:'
+
+
+def _seed():
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    return cache.get_or_set(KEY_PREFIX + scope, _seed, None)
+
+
+def bump_version(*scopes):
+    for scope in scopes:
+        key = KEY_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), None)
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+# Whole-table counters for rendered fragments: any write to the model bumps them.
+PICKUPS_SCOPE = 'entity:pickups'
+USERS_SCOPE = 'entity:users'
+CATEGORIES_SCOPE = 'entity:categories'
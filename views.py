@@ -1,402 +1,768 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden, JsonResponse
-from django.utils import timezone
-from django.core.paginator import Paginator
-from django.db.models import Sum
-
-from .models import (
-    User, WasteCategory, PickupRequest,
-    Transaction, RecyclingImpact
-)
-from .forms import (
-    CustomUserCreationForm, PickupRequestForm, CollectorUpdateForm
-)
-
-
-# ────────────────────────────────────────────────────────────
-# PUBLIC VIEWS
-# ────────────────────────────────────────────────────────────
-def home(request):
-    """Landing page with high-level statistics."""
-    context = {
-        'total_users': User.objects.count(),
-        'total_pickups': PickupRequest.objects.count(),
-        'completed_pickups': PickupRequest.objects.filter(status='completed').count(),
-        'waste_categories': WasteCategory.objects.filter(is_active=True)[:4],
-    }
-    return render(request, 'core/home.html', context)
-
-
-def register(request):
-    """Sign-up page that lets a visitor create a Customer, Collector or Admin."""
-    if request.method == 'POST':
-        form = CustomUserCreationForm(request.POST)
-        if form.is_valid():
-            user = form.save()
-            if user.role == 'customer':
-                RecyclingImpact.objects.create(user=user)
-            login(request, user)
-            messages.success(request, f'Welcome {user.username}! Your account is ready.')
-            return redirect('dashboard')
-        messages.error(request, 'Please correct the form errors.')
-    else:
-        form = CustomUserCreationForm()
-    return render(request, 'core/register.html', {'form': form})
-
-
-def user_login(request):
-    """Session-based authentication."""
-    if request.user.is_authenticated:
-        return redirect('dashboard')
-
-    if request.method == 'POST':
-        user = authenticate(
-            request,
-            username=request.POST.get('username'),
-            password=request.POST.get('password')
-        )
-        if user:
-            login(request, user)
-            messages.success(request, f'Welcome back, {user.username}!')
-            return redirect('dashboard')
-        messages.error(request, 'Invalid username or password.')
-    return render(request, 'core/login.html')
-
-
-def user_logout(request):
-    """
-    TERMINATE the session cleanly, add a toast message and
-    always return the visitor to the home page.
-    """
-    if request.user.is_authenticated:
-        username = request.user.username
-        request.session.flush()          # purge every session key
-        logout(request)
-        messages.success(request, f'Good-bye {username}! You have been logged out.')
-    return redirect('home')
-
-
-# ────────────────────────────────────────────────────────────
-# GENERIC DASHBOARD REDIRECT
-# ────────────────────────────────────────────────────────────
-@login_required
-def dashboard(request):
-    """Redirect an authenticated user to the role-specific dashboard."""
-    role_redirects = {
-        'customer':  'customer_dashboard',
-        'collector': 'collector_dashboard',
-        'admin':     'admin_dashboard',
-    }
-    target = role_redirects.get(request.user.role)
-    if target:
-        return redirect(target)
-    messages.error(request, 'Invalid user role.')
-    return redirect('home')
-
-
-# ────────────────────────────────────────────────────────────
-# CUSTOMER VIEWS
-# ────────────────────────────────────────────────────────────
-@login_required
-def customer_dashboard(request):
-    if request.user.role != 'customer':
-        return HttpResponseForbidden('Access denied.')
-
-    recent_pickups = (
-        PickupRequest.objects
-        .filter(customer=request.user)
-        .order_by('-created_at')[:5]
-    )
-    pickup_stats = {
-        'pending':   PickupRequest.objects.filter(customer=request.user, status='pending').count(),
-        'completed': PickupRequest.objects.filter(customer=request.user, status='completed').count(),
-        'total':     PickupRequest.objects.filter(customer=request.user).count(),
-    }
-
-    impact, created = RecyclingImpact.objects.get_or_create(user=request.user)
-    if not created:
-        impact.update_impact()
-
-    completed = PickupRequest.objects.filter(
-        customer=request.user,
-        status='completed',
-        actual_weight_kg__isnull=False
-    )
-    total_earnings = sum(p.actual_price() for p in completed)
-
-    context = {
-        'recent_pickups': recent_pickups,
-        'pickup_stats':   pickup_stats,
-        'impact':         impact,
-        'total_earnings': total_earnings,
-    }
-    return render(request, 'core/dashboard_customer.html', context)
-
-
-@login_required
-def request_pickup(request):
-    if request.user.role != 'customer':
-        return HttpResponseForbidden('Only customers can request pickups.')
-
-    if request.method == 'POST':
-        form = PickupRequestForm(request.POST)
-        if form.is_valid():
-            pickup = form.save(commit=False)
-            pickup.customer = request.user
-            pickup.save()
-            messages.success(request, 'Pickup request submitted. We will notify you once assigned.')
-            return redirect('pickup_history')
-        messages.error(request, 'Please correct the errors below.')
-    else:
-        form = PickupRequestForm()
-
-    context = {
-        'form':            form,
-        'waste_categories': WasteCategory.objects.filter(is_active=True),
-    }
-    return render(request, 'core/request_pickup.html', context)
-
-
-@login_required
-def pickup_history(request):
-    if request.user.role != 'customer':
-        return HttpResponseForbidden('Only customers can view history.')
-
-    pickups_all = (
-        PickupRequest.objects
-        .filter(customer=request.user)
-        .order_by('-created_at')
-    )
-    paginator = Paginator(pickups_all, 10)
-    pickups_page = paginator.get_page(request.GET.get('page'))
-
-    total_earnings = sum(
-        p.actual_price() for p in pickups_all
-        if p.status == 'completed' and p.actual_weight_kg
-    )
-
-    context = {
-        'pickups':        pickups_page,
-        'total_pickups':  pickups_all.count(),
-        'total_earnings': total_earnings,
-    }
-    return render(request, 'core/pickup_history.html', context)
-
-
-@login_required
-def cancel_pickup(request, pickup_id):
-    if request.user.role != 'customer':
-        return HttpResponseForbidden('Only customers can cancel pickups.')
-
-    pickup = get_object_or_404(PickupRequest, id=pickup_id, customer=request.user)
-    if pickup.status in ('pending', 'assigned'):
-        pickup.status = 'cancelled'
-        pickup.save()
-        messages.success(request, 'Pickup request cancelled.')
-    else:
-        messages.error(request, 'Cannot cancel a pickup in its current status.')
-    return redirect('pickup_history')
-
-
-# ────────────────────────────────────────────────────────────
-# COLLECTOR VIEWS
-# ────────────────────────────────────────────────────────────
-@login_required
-def collector_dashboard(request):
-    if request.user.role != 'collector':
-        return HttpResponseForbidden('Access denied.')
-
-    assigned = PickupRequest.objects.filter(collector=request.user).order_by('pickup_date')
-    available = (
-        PickupRequest.objects
-        .filter(status='pending', collector__isnull=True)
-        .order_by('pickup_date')[:10]
-    )
-    today_pickups = assigned.filter(pickup_date=timezone.now().date())
-
-    completed = assigned.filter(status='completed')
-    total_earnings = sum(p.actual_price() * 0.10 for p in completed)  # 10 % commission
-
-    context = {
-        'assigned_pickups':  assigned,
-        'available_pickups': available,
-        'today_pickups':     today_pickups,
-        'total_earnings':    total_earnings,
-        'completion_rate':   completed.count(),
-    }
-    return render(request, 'core/dashboard_collector.html', context)
-
-
-@login_required
-def assign_pickup(request, pickup_id):
-    if request.user.role != 'collector':
-        return HttpResponseForbidden('Only collectors can assign pickups.')
-
-    pickup = get_object_or_404(
-        PickupRequest,
-        id=pickup_id,
-        status='pending',
-        collector__isnull=True
-    )
-    pickup.collector = request.user
-    pickup.status = 'assigned'
-    pickup.save()
-    messages.success(request, f'Pickup assigned. Contact customer at {pickup.customer.phone or pickup.customer.email}.')
-    return redirect('collector_dashboard')
-
-
-@login_required
-def update_pickup(request, pickup_id):
-    if request.user.role != 'collector':
-        return HttpResponseForbidden('Only collectors can update pickups.')
-
-    pickup = get_object_or_404(PickupRequest, id=pickup_id, collector=request.user)
-
-    if request.method == 'POST':
-        form = CollectorUpdateForm(request.POST, instance=pickup)
-        if form.is_valid():
-            updated = form.save()
-            if updated.status == 'completed' and updated.actual_weight_kg:
-                Transaction.objects.update_or_create(
-                    pickup_request=updated,
-                    defaults={
-                        'amount':     updated.actual_price(),
-                        'is_paid':    True,
-                    }
-                )
-                impact, _ = RecyclingImpact.objects.get_or_create(user=updated.customer)
-                impact.update_impact()
-
-                updated.completed_at = timezone.now()
-                updated.save()
-                messages.success(request, f'Pickup completed! Customer payment: Rs.{updated.actual_price():.2f}')
-            else:
-                messages.success(request, 'Pickup updated.')
-            return redirect('collector_dashboard')
-        messages.error(request, 'Please fix the form errors.')
-    else:
-        form = CollectorUpdateForm(instance=pickup)
-
-    return render(request, 'core/update_pickup.html', {'form': form, 'pickup': pickup})
-
-
-# ────────────────────────────────────────────────────────────
-# ADMIN DASHBOARD
-# ────────────────────────────────────────────────────────────
-@login_required
-def admin_dashboard(request):
-    if request.user.role != 'admin':
-        return HttpResponseForbidden('Access denied.')
-
-    user_stats = {
-        'total':     User.objects.count(),
-        'customers': User.objects.filter(role='customer').count(),
-        'collectors': User.objects.filter(role='collector').count(),
-        'admins':    User.objects.filter(role='admin').count(),
-    }
-
-    pickup_stats = {
-        'total':      PickupRequest.objects.count(),
-        'pending':    PickupRequest.objects.filter(status='pending').count(),
-        'completed':  PickupRequest.objects.filter(status='completed').count(),
-        'this_month': PickupRequest.objects.filter(
-            created_at__month=timezone.now().month
-        ).count(),
-    }
-
-    completed_pickups = PickupRequest.objects.filter(
-        status='completed',
-        actual_weight_kg__isnull=False
-    )
-    total_transactions = completed_pickups.aggregate(
-        total=Sum('actual_weight_kg')
-    )['total'] or 0
-
-    context = {
-        'user_stats':         user_stats,
-        'pickup_stats':       pickup_stats,
-        'total_transactions': total_transactions,
-        'recent_pickups':     PickupRequest.objects.order_by('-created_at')[:10],
-        'recent_users':       User.objects.order_by('-date_joined')[:5],
-        'waste_categories':   WasteCategory.objects.all(),
-    }
-    return render(request, 'core/dashboard_admin.html', context)
-
-
-# ────────────────────────────────────────────────────────────
-# API ENDPOINT
-# ────────────────────────────────────────────────────────────
-def waste_categories_api(request):
-    data = WasteCategory.objects.filter(is_active=True).values(
-        'id', 'name', 'rate_per_kg', 'description'
-    )
-    return JsonResponse(list(data), safe=False)
-
-import json
-import requests
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-
-@login_required
-def initiate_payment(request, pickup_id):
-    """Initiate payment for completed pickup"""
-    pickup = get_object_or_404(PickupRequest, id=pickup_id, customer=request.user)
-    
-    if pickup.status != 'completed':
-        messages.error(request, 'Payment can only be made for completed pickups.')
-        return redirect('pickup_history')
-    
-    # Create or get transaction
-    transaction, created = Transaction.objects.get_or_create(
-        pickup_request=pickup,
-        defaults={
-            'amount': pickup.actual_price(),
-            'payment_method': 'digital',
-            'payment_gateway': 'esewa'  # or user's choice
-        }
-    )
-    
-    context = {
-        'transaction': transaction,
-        'pickup': pickup,
-        'esewa_merchant_id': settings.ESEWA_MERCHANT_ID,
-        'success_url': settings.PAYMENT_SUCCESS_URL,
-        'failure_url': settings.PAYMENT_FAILURE_URL,
-    }
-    
-    return render(request, 'core/payment_form.html', context)
-
-@csrf_exempt
-def payment_success(request):
-    """Handle successful payment callback"""
-    if request.method == 'POST':
-        # Get transaction details from POST data
-        transaction_id = request.POST.get('oid')  # eSewa transaction ID
-        ref_id = request.POST.get('refId')  # eSewa reference ID
-        
-        try:
-            transaction = Transaction.objects.get(id=transaction_id)
-            transaction.is_paid = True
-            transaction.payment_status = 'success'
-            transaction.gateway_transaction_id = ref_id
-            transaction.gateway_response = request.POST.dict()
-            transaction.save()
-            
-            messages.success(request, f'Payment successful! Amount: Rs.{transaction.amount}')
-            return redirect('pickup_history')
-            
-        except Transaction.DoesNotExist:
-            messages.error(request, 'Invalid transaction.')
-            return redirect('pickup_history')
-    
-    return redirect('pickup_history')
-
-@csrf_exempt
-def payment_failure(request):
-    """Handle failed payment callback"""
-    messages.error(request, 'Payment failed. Please try again.')
-    return redirect('pickup_history')
-from django.conf import settings
\ No newline at end of file
+import hmac
+import json
+import math
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
+from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.db.models import Q
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
+
+from .models import (
+    User, WasteCategory, PickupRequest,
+    Transaction, RecyclingImpact
+)
+from .forms import (
+    CustomUserCreationForm, PickupRequestForm, CollectorUpdateForm, ExportFilterForm
+)
+from .access import role_required
+from .analytics import DEFAULT_WEEKS, MAX_WEEKS, REPORTS, current_snapshot
+from .catalog import category_catalog, rate_table_version
+from .completion import complete_pickup, complete_pickups
+from .events import COLLECTORS_CHANNEL, get_broker, user_channel
+from .exports import FORMATS, export_lines
+from .geo import DEFAULT_RADIUS_KM, MAX_RADIUS_KM, nearest_open_pickups
+from .ingest import ingest_pickups, iter_ndjson
+from .metrics import REGISTRY
+from .pagecache import cache_anonymous_page
+from .pagination import InvalidCursor, paginate_keyset
+from .payments import FakeGateway, InvalidCallback, parse_callback, process_callback
+from .reports import admin_metrics, compute_admin_metrics
+from .routes import collector_route
+from .verification import confirm_transaction
+from .versions import CATEGORIES_SCOPE, PICKUPS_SCOPE, USERS_SCOPE, get_version, user_scope
+
+MAX_CLAIM_BATCH = 20
+MAX_COMPLETE_BATCH = 200
+COLLECTOR_COMMISSION = Decimal('0.10')
+EVENT_KEEPALIVE_SECONDS = 15
+CATEGORY_API_MAX_AGE = 60
+HISTORY_ORDERING = ('-created_at', '-id')
+ASSIGNED_ORDERING = ('pickup_date', 'id')
+NEARBY_LIMIT = 10
+MAX_NEARBY_LIMIT = 50
+ROUTE_STATUSES = ('assigned', 'in_progress')
+
+
+# ────────────────────────────────────────────────────────────
+# PUBLIC VIEWS
+# ────────────────────────────────────────────────────────────
+@cache_anonymous_page('home')
+def home(request):
+    """Landing page with high-level statistics."""
+    context = {
+        'total_users': User.objects.count(),
+        'total_pickups': PickupRequest.objects.count(),
+        'completed_pickups': PickupRequest.objects.filter(status='completed').count(),
+        'waste_categories': WasteCategory.objects.filter(is_active=True)[:4],
+    }
+    return render(request, 'core/home.html', context)
+
+
+def register(request):
+    """Sign-up page that lets a visitor create a Customer, Collector or Admin."""
+    if request.method == 'POST':
+        form = CustomUserCreationForm(request.POST)
+        if form.is_valid():
+            user = form.save()
+            if user.role == 'customer':
+                RecyclingImpact.objects.create(user=user)
+            login(request, user)
+            messages.success(request, f'Welcome {user.username}! Your account is ready.')
+            return redirect('dashboard')
+        messages.error(request, 'Please correct the form errors.')
+    else:
+        form = CustomUserCreationForm()
+    return render(request, 'core/register.html', {'form': form})
+
+
+def user_login(request):
+    """Session-based authentication."""
+    if request.user.is_authenticated:
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        user = authenticate(
+            request,
+            username=request.POST.get('username'),
+            password=request.POST.get('password')
+        )
+        if user:
+            login(request, user)
+            messages.success(request, f'Welcome back, {user.username}!')
+            return redirect('dashboard')
+        messages.error(request, 'Invalid username or password.')
+    return render(request, 'core/login.html')
+
+
+def user_logout(request):
+    """
+    TERMINATE the session cleanly, add a toast message and
+    always return the visitor to the home page.
+    """
+    if request.user.is_authenticated:
+        username = request.user.username
+        request.session.flush()          # purge every session key
+        logout(request)
+        messages.success(request, f'Good-bye {username}! You have been logged out.')
+    return redirect('home')
+
+
+# ────────────────────────────────────────────────────────────
+# GENERIC DASHBOARD
+# ────────────────────────────────────────────────────────────
+@login_required
+def dashboard(request):
+    """Render the signed-in user's role dashboard in place (no redirect hop)."""
+    view = ROLE_DASHBOARDS.get(request.user.role)
+    if view:
+        return view(request)
+    messages.error(request, 'Invalid user role.')
+    return redirect('home')
+
+
+# ────────────────────────────────────────────────────────────
+# CUSTOMER VIEWS
+# ────────────────────────────────────────────────────────────
+@role_required('customer')
+def customer_dashboard(request):
+    recent_pickups = (
+        PickupRequest.objects
+        .filter(customer=request.user)
+        .select_related('waste_category')
+        .order_by('-created_at')[:5]
+    )
+    stats = PickupRequest.objects.filter(customer=request.user).stats()
+    pickup_stats = {
+        'pending':   stats['pending'],
+        'completed': stats['completed'],
+        'total':     stats['total'],
+    }
+
+    # Impact is maintained incrementally by signals; only seed a missing row.
+    impact, created = RecyclingImpact.objects.get_or_create(user=request.user)
+    if created:
+        impact.update_impact()
+
+    context = {
+        'recent_pickups': recent_pickups,
+        'pickup_stats':   pickup_stats,
+        'impact':         impact,
+        'total_earnings': stats['total_earnings'],
+    }
+    return render(request, 'core/dashboard_customer.html', context)
+
+
+@role_required('customer', message='Only customers can request pickups.')
+def request_pickup(request):
+    if request.method == 'POST':
+        form = PickupRequestForm(request.POST)
+        if form.is_valid():
+            pickup = form.save(commit=False)
+            pickup.customer = request.user
+            if pickup.latitude is None or pickup.longitude is None:
+                pickup.latitude, pickup.longitude = request.user.latitude, request.user.longitude
+            pickup.save()
+            messages.success(request, 'Pickup request submitted. We will notify you once assigned.')
+            return redirect('pickup_history')
+        messages.error(request, 'Please correct the errors below.')
+    else:
+        form = PickupRequestForm()
+
+    context = {
+        'form':            form,
+        'waste_categories': WasteCategory.objects.filter(is_active=True),
+        'rate_table_version': rate_table_version(),
+    }
+    return render(request, 'core/request_pickup.html', context)
+
+
+@role_required('customer', message='Only customers can view history.')
+def pickup_history(request):
+    pickups_all = (
+        PickupRequest.objects
+        .filter(customer=request.user)
+        .select_related('waste_category', 'transaction')
+    )
+    try:
+        pickups_page = paginate_keyset(pickups_all, HISTORY_ORDERING, request.GET.get('cursor'))
+    except InvalidCursor:
+        pickups_page = paginate_keyset(pickups_all, HISTORY_ORDERING)
+
+    stats = pickups_all.stats()
+
+    context = {
+        'pickups':        pickups_page,
+        'total_pickups':  stats['total'],
+        'total_earnings': stats['total_earnings'],
+    }
+    return render(request, 'core/pickup_history.html', context)
+
+
+@role_required('customer', message='Only customers can cancel pickups.')
+def cancel_pickup(request, pickup_id):
+    pickup = get_object_or_404(PickupRequest, id=pickup_id, customer=request.user)
+    if pickup.status in ('pending', 'assigned'):
+        pickup.status = 'cancelled'
+        pickup.save()
+        messages.success(request, 'Pickup request cancelled.')
+    else:
+        messages.error(request, 'Cannot cancel a pickup in its current status.')
+    return redirect('pickup_history')
+
+
+# ────────────────────────────────────────────────────────────
+# COLLECTOR VIEWS
+# ────────────────────────────────────────────────────────────
+def _available_pickups(collector, open_pickups):
+    """The open pickups listed for a collector: nearest first when they have a location."""
+    if collector.latitude is None or collector.longitude is None:
+        return list(open_pickups.unclaimed().order_by('pickup_date')[:NEARBY_LIMIT])
+    available = nearest_open_pickups(
+        collector.latitude, collector.longitude, NEARBY_LIMIT, queryset=open_pickups
+    )
+    # Pickups booked without coordinates are never in the index; list them after the nearby ones.
+    if len(available) < NEARBY_LIMIT:
+        available += open_pickups.unclaimed().filter(
+            Q(latitude__isnull=True) | Q(longitude__isnull=True)
+        ).order_by('pickup_date')[:NEARBY_LIMIT - len(available)]
+    return available
+
+
+@role_required('collector')
+def collector_dashboard(request):
+    assigned = (
+        PickupRequest.objects
+        .filter(collector=request.user)
+        .select_related('customer', 'waste_category')
+        .order_by('pickup_date')
+    )
+    available = _available_pickups(
+        request.user, PickupRequest.objects.select_related('customer', 'waste_category')
+    )
+    today = timezone.localdate()
+    todays = {p.id: p for p in assigned.filter(pickup_date=today, status__in=ROUTE_STATUSES)}
+    route = collector_route(request.user, today, todays.values())
+    for pickup_id, leg_km in zip(route.order, route.legs_km):
+        todays[pickup_id].leg_km = leg_km
+    today_pickups = [todays[i] for i in route.order + route.unrouted if i in todays]
+
+    stats = assigned.stats()
+
+    try:
+        assigned_page = paginate_keyset(assigned, ASSIGNED_ORDERING, request.GET.get('cursor'))
+    except InvalidCursor:
+        assigned_page = paginate_keyset(assigned, ASSIGNED_ORDERING)
+
+    context = {
+        'assigned_pickups':  assigned_page,
+        'available_pickups': available,
+        'today_pickups':     today_pickups,
+        'route_distance_km': route.distance_km,
+        'total_earnings':    stats['total_earnings'] * COLLECTOR_COMMISSION,
+        'completion_rate':   stats['completed'],
+    }
+    return render(request, 'core/dashboard_collector.html', context)
+
+
+@role_required('collector', message='Only collectors can assign pickups.')
+def assign_pickup(request, pickup_id):
+    if not PickupRequest.objects.claim(pickup_id, request.user):
+        messages.error(request, 'This pickup is no longer available.')
+        return redirect('collector_dashboard')
+
+    pickup = PickupRequest.objects.select_related('customer').get(id=pickup_id)
+    messages.success(request, f'Pickup assigned. Contact customer at {pickup.customer.phone or pickup.customer.email}.')
+    return redirect('collector_dashboard')
+
+
+@role_required('collector', message='Only collectors can claim pickups.')
+@require_POST
+def claim_pickups(request):
+    """Claim the next N earliest open pickups in one call (JSON)."""
+    try:
+        count = int(request.POST.get('count', 1))
+    except ValueError:
+        return JsonResponse({'error': 'count must be an integer'}, status=400)
+    count = max(1, min(count, MAX_CLAIM_BATCH))
+
+    claimed = PickupRequest.objects.claim_next(request.user, count)
+    return JsonResponse({'claimed': claimed, 'requested': count})
+
+
+@role_required('collector', message='Only collectors can complete pickups.')
+@require_POST
+def complete_pickups_api(request):
+    """Close out many pickups at once: {"pickups": [{"id": 1, "actual_weight_kg": "2.5"}, ...]}."""
+    try:
+        rows = json.loads(request.body)['pickups']
+        weights = {int(row['id']): Decimal(str(row['actual_weight_kg'])) for row in rows}
+    except (ValueError, KeyError, TypeError, ArithmeticError):
+        return JsonResponse({'error': 'Expected {"pickups": [{"id": ..., "actual_weight_kg": ...}]}.'},
+                            status=400)
+    if len(weights) > MAX_COMPLETE_BATCH:
+        return JsonResponse({'error': f'At most {MAX_COMPLETE_BATCH} pickups per request.'}, status=400)
+
+    completed, errors = complete_pickups(request.user, weights)
+    return JsonResponse({'completed': completed, 'errors': errors})
+
+
+@role_required('collector', message='Only collectors can update pickups.')
+def update_pickup(request, pickup_id):
+    pickup = get_object_or_404(PickupRequest, id=pickup_id, collector=request.user)
+
+    if request.method == 'POST':
+        form = CollectorUpdateForm(request.POST, instance=pickup)
+        if form.is_valid():
+            updated = form.save(commit=False)
+            if updated.status == 'completed' and updated.actual_weight_kg:
+                complete_pickup(updated)
+                messages.success(request, f'Pickup completed! Customer payment: Rs.{updated.actual_price():.2f}')
+            else:
+                updated.save()
+                messages.success(request, 'Pickup updated.')
+            return redirect('collector_dashboard')
+        messages.error(request, 'Please fix the form errors.')
+    else:
+        form = CollectorUpdateForm(instance=pickup)
+
+    return render(request, 'core/update_pickup.html', {'form': form, 'pickup': pickup})
+
+
+# ────────────────────────────────────────────────────────────
+# ADMIN DASHBOARD
+# ────────────────────────────────────────────────────────────
+@role_required('admin')
+def admin_dashboard(request):
+    metrics = admin_metrics()
+
+    context = {
+        **metrics,
+        'recent_pickups':     (
+            PickupRequest.objects
+            .select_related('customer', 'waste_category')
+            .order_by('-created_at')[:10]
+        ),
+        'recent_users':       User.objects.order_by('-date_joined')[:5],
+        'waste_categories':   WasteCategory.objects.all(),
+        # The querysets above stay lazy: the template only runs them when their
+        # {% cache %} fragment is missing for the current entity versions.
+        'fragment_ttl':       getattr(settings, 'FRAGMENT_CACHE_TTL', 60 * 60),
+        'pickups_version':    get_version(PICKUPS_SCOPE),
+        'users_version':      get_version(USERS_SCOPE),
+        'categories_version': get_version(CATEGORIES_SCOPE),
+        'analytics_reports':  [(name, name.replace('_', ' ').capitalize()) for name in REPORTS],
+    }
+    return render(request, 'core/dashboard_admin.html', context)
+
+
+# /dashboard/ renders one of these directly.
+ROLE_DASHBOARDS = {
+    'customer':  customer_dashboard,
+    'collector': collector_dashboard,
+    'admin':     admin_dashboard,
+}
+
+
+# ────────────────────────────────────────────────────────────
+# API ENDPOINT
+# ────────────────────────────────────────────────────────────
+def _category_etag(request):
+    return category_catalog().etag
+
+
+def _category_last_modified(request):
+    return category_catalog().last_modified
+
+
+@cache_control(public=True, max_age=CATEGORY_API_MAX_AGE)
+@condition(etag_func=_category_etag, last_modified_func=_category_last_modified)
+def waste_categories_api(request):
+    """Active categories, served from the process-local catalog cache."""
+    catalog = category_catalog()
+    response = HttpResponse(catalog.body, content_type='application/json')
+    response['X-Rate-Table-Version'] = catalog.version
+    return response
+
+
+# ────────────────────────────────────────────────────────────
+# PICKUP LIST API (cursor-paginated)
+# ────────────────────────────────────────────────────────────
+def _pickup_json(pickup):
+    return {
+        'id':                  pickup.id,
+        'status':              pickup.status,
+        'waste_category':      pickup.waste_category.name,
+        'estimated_weight_kg': pickup.estimated_weight_kg,
+        'actual_weight_kg':    pickup.actual_weight_kg,
+        'pickup_date':         pickup.pickup_date,
+        'pickup_time':         pickup.pickup_time,
+        'address':             pickup.address,
+        'latitude':            pickup.latitude,
+        'longitude':           pickup.longitude,
+        'created_at':          pickup.created_at,
+    }
+
+
+def _pickup_page_json(request, queryset, ordering):
+    try:
+        page = paginate_keyset(queryset, ordering, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+    return JsonResponse({
+        'results':  [_pickup_json(p) for p in page],
+        'next':     page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@role_required('customer', message='Only customers can view history.')
+def pickup_history_api(request):
+    pickups = PickupRequest.objects.filter(customer=request.user).select_related('waste_category')
+    return _pickup_page_json(request, pickups, HISTORY_ORDERING)
+
+
+@role_required('collector')
+def collector_pickups_api(request):
+    pickups = PickupRequest.objects.filter(collector=request.user).select_related('waste_category')
+    return _pickup_page_json(request, pickups, ASSIGNED_ORDERING)
+
+
+@role_required('collector')
+def nearby_pickups_api(request):
+    """Nearest open pickups to ?lat=&lng= (default: the collector's own location)."""
+    try:
+        lat = float(request.GET.get('lat', request.user.latitude))
+        lng = float(request.GET.get('lng', request.user.longitude))
+        limit = max(1, min(int(request.GET.get('limit', NEARBY_LIMIT)), MAX_NEARBY_LIMIT))
+        radius_km = float(request.GET.get('radius_km', DEFAULT_RADIUS_KM))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'lat, lng, limit and radius_km must be numbers.'}, status=400)
+    if not all(math.isfinite(value) for value in (lat, lng, radius_km)):
+        return JsonResponse({'error': 'lat, lng and radius_km must be finite.'}, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return JsonResponse({'error': 'lat must be within ±90 and lng within ±180.'}, status=400)
+    if radius_km <= 0:
+        return JsonResponse({'error': 'radius_km must be positive.'}, status=400)
+    radius_km = min(radius_km, MAX_RADIUS_KM)
+
+    pickups = nearest_open_pickups(
+        lat, lng, limit, radius_km,
+        queryset=PickupRequest.objects.select_related('waste_category'),
+    )
+    results = []
+    for pickup in pickups:
+        row = _pickup_json(pickup)
+        row['distance_km'] = pickup.distance_km
+        results.append(row)
+    return JsonResponse({'results': results})
+
+
+# ────────────────────────────────────────────────────────────
+# BULK INGEST API (partner / kiosk uploads)
+# ────────────────────────────────────────────────────────────
+@role_required('admin', 'customer')
+@require_POST
+def ingest_pickups_api(request):
+    """Create many pickups from a JSON array or an NDJSON stream.
+
+    Admins book each row for the customer id it names; customers can only
+    upload pickups for themselves.
+    """
+    if request.content_type == 'application/x-ndjson':
+        rows = iter_ndjson(request)
+    else:
+        try:
+            rows = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON.'}, status=400)
+        if isinstance(rows, dict):
+            rows = rows.get('pickups')
+        if not isinstance(rows, list):
+            return JsonResponse({'error': 'Expected a list of pickups.'}, status=400)
+
+    customer = request.user if request.user.role == 'customer' else None
+    result = ingest_pickups(rows, customer=customer)
+    return JsonResponse(result.as_dict(), status=201 if result.created else 400)
+
+
+# ────────────────────────────────────────────────────────────
+# FINANCE EXPORTS (streamed)
+# ────────────────────────────────────────────────────────────
+def _export_response(request, kind):
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    fmt = form.cleaned_data['format'] or 'csv'
+
+    response = StreamingHttpResponse(
+        export_lines(kind, fmt, **form.filters()), content_type=FORMATS[fmt][1]
+    )
+    stamp = timezone.localdate().isoformat()
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{stamp}.{fmt}"'
+    return response
+
+
+@role_required('admin')
+def export_pickups(request):
+    return _export_response(request, 'pickups')
+
+
+@role_required('admin')
+def export_transactions(request):
+    return _export_response(request, 'transactions')
+
+
+# ────────────────────────────────────────────────────────────
+# STATS API (polled by the dashboards)
+# ────────────────────────────────────────────────────────────
+# ETags come from change counters, so an unchanged poll is answered with
+# 304 Not Modified before any aggregate query runs.
+def _customer_stats_etag(request):
+    return f'customer-{request.user.pk}-{get_version(user_scope(request.user.pk))}'
+
+
+def _collector_stats_etag(request):
+    return (
+        f'collector-{request.user.pk}-{get_version(user_scope(request.user.pk))}'
+        f'-{get_version("pool")}'
+    )
+
+
+def _admin_stats_etag(request):
+    # Every write the metrics read bumps one of these; the day covers 'this_month' rolling over.
+    versions = '-'.join(str(get_version(scope)) for scope in (PICKUPS_SCOPE, USERS_SCOPE, CATEGORIES_SCOPE))
+    return f'admin-{versions}-{timezone.localdate().isoformat()}'
+
+
+@role_required('customer')
+@condition(etag_func=_customer_stats_etag)
+def customer_stats_api(request):
+    stats = PickupRequest.objects.filter(customer=request.user).stats()
+    impact = RecyclingImpact.objects.filter(user=request.user).values(
+        'total_weight_recycled', 'trees_saved', 'co2_reduced', 'water_saved'
+    ).first()
+    return JsonResponse({
+        'pickup_stats': {
+            'pending':   stats['pending'],
+            'completed': stats['completed'],
+            'total':     stats['total'],
+        },
+        'total_earnings': stats['total_earnings'],
+        'impact':         impact or {},
+    })
+
+
+@role_required('collector')
+@condition(etag_func=_collector_stats_etag)
+def collector_stats_api(request):
+    stats = PickupRequest.objects.filter(collector=request.user).stats()
+    return JsonResponse({
+        'total_earnings':  stats['total_earnings'] * COLLECTOR_COMMISSION,
+        'completion_rate': stats['completed'],
+        'assigned':        stats['assigned'] + stats['in_progress'],
+        'available_count': len(_available_pickups(request.user, PickupRequest.objects.all())),  # as listed on the dashboard
+    })
+
+
+@role_required('admin')
+@condition(etag_func=_admin_stats_etag)
+def admin_stats_api(request):
+    # Fresh, not the 30 s admin_metrics() cache: a new ETag must never carry older figures.
+    metrics = compute_admin_metrics()
+    return JsonResponse({
+        'user_stats':         metrics['user_stats'],
+        'pickup_stats':       metrics['pickup_stats'],
+        'total_transactions': metrics['total_transactions'],
+    })
+
+
+# ────────────────────────────────────────────────────────────
+# ANALYTICS REPORTS (columnar snapshot, see core.analytics)
+# ────────────────────────────────────────────────────────────
+@role_required('admin')
+def analytics_report(request, report):
+    if report not in REPORTS:
+        raise Http404('Unknown report.')
+    try:
+        weeks = max(1, min(int(request.GET.get('weeks', DEFAULT_WEEKS)), MAX_WEEKS))
+    except ValueError:
+        return JsonResponse({'error': 'weeks must be a whole number.'}, status=400)
+
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return JsonResponse({'error': 'No analytics snapshot yet; run build_analytics_snapshot.'}, status=503)
+    return JsonResponse({
+        'report':   report,
+        'weeks':    weeks,
+        'snapshot': snapshot.describe(),
+        'data':     REPORTS[report](snapshot, weeks),
+    })
+
+
+# ────────────────────────────────────────────────────────────
+# LIVE EVENTS (server-sent events, served through asgi.py)
+# ────────────────────────────────────────────────────────────
+@login_required
+async def pickup_events(request):
+    """Push the signed-in user's pickup changes (and open-pool changes to collectors)."""
+    user = await request.auser()
+    channels = [user_channel(user.pk)]
+    if user.role == 'collector':
+        channels.append(COLLECTORS_CHANNEL)
+
+    async def stream():
+        broker = get_broker()
+        subscription = broker.subscribe(channels)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                message = await subscription.get(timeout=EVENT_KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield f'event: pickup\ndata: {json.dumps(message)}\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# ────────────────────────────────────────────────────────────
+# METRICS (Prometheus text format)
+# ────────────────────────────────────────────────────────────
+def metrics(request):
+    """Request latency, query and template timings recorded by core.metrics."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = (
+        (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'))
+        or (request.user.is_authenticated and (request.user.role == 'admin' or request.user.is_staff))
+    )
+    if not authorized:
+        return HttpResponseForbidden('Metrics are restricted.')
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@login_required
+def initiate_payment(request, pickup_id):
+    """Initiate payment for completed pickup"""
+    pickup = get_object_or_404(PickupRequest, id=pickup_id, customer=request.user)
+    
+    if pickup.status != 'completed':
+        messages.error(request, 'Payment can only be made for completed pickups.')
+        return redirect('pickup_history')
+    
+    # Create or get transaction
+    transaction, created = Transaction.objects.get_or_create(
+        pickup_request=pickup,
+        defaults={
+            'amount': pickup.actual_price(),
+            'payment_method': 'digital',
+            'payment_gateway': 'esewa'  # or user's choice
+        }
+    )
+    
+    if getattr(settings, 'PAYMENT_FAKE_GATEWAY', False):
+        gateway_url = reverse('fake_gateway', args=['esewa'])
+    else:
+        gateway_url = settings.ESEWA_PAYMENT_URL
+
+    context = {
+        'transaction': transaction,
+        'pickup': pickup,
+        'esewa_merchant_id': settings.ESEWA_MERCHANT_ID,
+        'gateway_url': gateway_url,
+        'success_url': settings.PAYMENT_SUCCESS_URL,
+        'failure_url': settings.PAYMENT_FAILURE_URL,
+    }
+    
+    return render(request, 'core/payment_form.html', context)
+
+def _payment_return(request, event):
+    """The browser coming back from the gateway: report the state, change nothing.
+
+    Anyone can forge these query strings. Payments are settled by POSTed
+    callbacks and by verify_payments asking the gateway itself.
+    """
+    try:
+        callback = parse_callback(request.GET.dict(), event)
+    except InvalidCallback as exc:
+        messages.error(request, f'Invalid payment callback: {exc}')
+        return redirect('pickup_history')
+
+    txn = Transaction.objects.filter(
+        id=callback.order_id, pickup_request__customer_id=request.user.pk
+    ).first()
+    if txn is not None and txn.is_paid:
+        messages.success(request, f'Payment successful! Amount: Rs.{txn.amount}')
+    elif callback.event == 'failure':
+        messages.error(request, 'Payment failed. Please try again.')
+    else:
+        messages.info(request, 'Your payment is being confirmed with the gateway and will show as paid shortly.')
+    return redirect('pickup_history')
+
+def _payment_callback(request, event):
+    """Confirm a posted gateway callback with the gateway, then log and apply its answer once."""
+    if request.method != 'POST':
+        return _payment_return(request, event)
+    params = request.POST.dict()
+    try:
+        callback = parse_callback(params, event)
+    except InvalidCallback as exc:
+        messages.error(request, f'Invalid payment callback: {exc}')
+        return redirect('pickup_history')
+    txn = Transaction.objects.filter(id=callback.order_id).first()
+    if txn is None:
+        messages.error(request, 'Invalid payment callback: Unknown transaction.')
+        return redirect('pickup_history')
+
+    # The posted fields are unsigned; only what the gateway itself reports settles anything.
+    confirmed, body = confirm_transaction(txn)
+    if confirmed is None:
+        messages.info(request, 'Your payment is being confirmed with the gateway and will show as paid shortly.')
+        return redirect('pickup_history')
+    payment_event = process_callback(confirmed, {'source': 'callback', 'posted': params, **body})
+    if payment_event.outcome == 'applied':
+        if confirmed.event == 'success':
+            messages.success(request, f'Payment successful! Amount: Rs.{payment_event.transaction.amount}')
+        else:
+            messages.error(request, 'Payment failed. Please try again.')
+    elif payment_event.outcome == 'rejected':
+        messages.error(request, f'Payment could not be recorded: {payment_event.detail}')
+    return redirect('pickup_history')
+
+@csrf_exempt
+def payment_success(request):
+    """Handle successful payment callback"""
+    return _payment_callback(request, 'success')
+
+@csrf_exempt
+def payment_failure(request):
+    """Handle failed payment callback"""
+    return _payment_callback(request, 'failure')
+
+@csrf_exempt
+@login_required
+@require_POST
+def fake_gateway(request, gateway):
+    """Local gateway stand-in: 'pays' at once, notifies us server-side, then returns the browser."""
+    if not getattr(settings, 'PAYMENT_FAKE_GATEWAY', False):
+        raise Http404
+    txn = get_object_or_404(Transaction, id=request.POST.get('pid'), pickup_request__customer=request.user)
+    try:
+        params = FakeGateway(gateway).callback(txn)
+    except ValueError:
+        raise Http404
+    # What a real gateway's server-to-server notification would do.
+    process_callback(parse_callback(params), params)
+    return redirect(f"{reverse('payment_success')}?{urlencode(params)}")